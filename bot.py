@@ -2,12 +2,37 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 import aiohttp
+from aiohttp import web
 import random
 import asyncio
 import os
 import sys
-from datetime import datetime
-from typing import Dict, List
+import json
+import re
+import hashlib
+import heapq
+import math
+import signal
+import contextvars
+import unicodedata
+import zlib
+import cProfile
+import pstats
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict, defaultdict, deque
+from itertools import islice
+from contextlib import asynccontextmanager, contextmanager
+import time
+import threading
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+BOOT_STARTED = time.perf_counter()  # Référence des durées de démarrage
+
+# Les extensions de cogs/ importent ce module sous le nom `bot`, y compris quand il est lancé avec `python bot.py`
+if __name__ == "__main__":
+    sys.modules.setdefault("bot", sys.modules[__name__])
 
 print("=" * 50)
 print("🎩 Démarrage d'Audrey Hall Bot")
@@ -21,6 +46,7 @@ DISCORD_TOKEN = os.getenv("DISCORD_TOKEN")
 ROUTWAY_API_KEY = os.getenv("ROUTWAY_API_KEY")
 ROUTWAY_API_URL = os.getenv("ROUTWAY_API_URL", "https://api.routeway.ai/v1/chat/completions")
 BOT_COLOR = int(os.getenv("BOT_COLOR", "0x2E8B57"), 16)  # Vert forêt par défaut
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))  # Persona, cartes, énigmes
 
 # Pour le développement local, chargez depuis .env.local
 if not DISCORD_TOKEN and os.path.exists(".env.local"):
@@ -45,556 +71,4228 @@ if not ROUTWAY_API_KEY:
     print("ℹ️  L'IA conversationnelle ne fonctionnera pas sans clé API Routway")
     print("ℹ️  Obtenez une clé sur https://routway.ai")
 
-print(f"✅ Token Discord : {'Défini' if DISCORD_TOKEN else 'Non défini'}")
-print(f"✅ Clé Routway : {'Défini' if ROUTWAY_API_KEY else 'Non défini'}")
-print(f"✅ Couleur du bot : #{BOT_COLOR:06X}")
+print(f"✅ Token Discord : {'Défini' if DISCORD_TOKEN else 'Non défini'}")
+print(f"✅ Clé Routway : {'Défini' if ROUTWAY_API_KEY else 'Non défini'}")
+print(f"✅ Couleur du bot : #{BOT_COLOR:06X}")
+
+# -----------------------------
+# Configuration - Pool HTTP (API Routway)
+# -----------------------------
+HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))  # Connexions simultanées max (0 = illimité)
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("HTTP_POOL_LIMIT_PER_HOST", "20"))  # Connexions max vers Routway
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "60"))  # Secondes avant fermeture d'une connexion inactive
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))  # Durée de vie du cache DNS (secondes)
+HTTP_REQUEST_TIMEOUT = float(os.getenv("HTTP_REQUEST_TIMEOUT", "30"))
+
+# Serveur web intégré (santé, métriques, administration)
+WEB_SERVER_ENABLED = os.getenv("WEB_SERVER_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+WEB_HOST = os.getenv("WEB_HOST", "0.0.0.0")
+WEB_PORT = int(os.getenv("PORT", "8080"))  # Render fournit PORT
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # Jeton Bearer des routes /admin (désactivées s'il est absent)
+
+# Streaming des réponses (édition progressive du message Discord)
+STREAMING_ENABLED = os.getenv("STREAMING_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+STREAM_FIRST_CHUNK_CHARS = int(os.getenv("STREAM_FIRST_CHUNK_CHARS", "40"))  # Caractères avant le premier envoi
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", "1.2"))  # Secondes min entre deux éditions
+
+# Envoi des messages Discord : une file par salon, cadencée sous les limites de l'API
+OUTBOUND_CHANNEL_RATE = int(os.getenv("OUTBOUND_CHANNEL_RATE", "5"))  # Messages max par salon...
+OUTBOUND_CHANNEL_PER = float(os.getenv("OUTBOUND_CHANNEL_PER", "5"))  # ...sur cette durée en secondes (Discord : 5 / 5 s)
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "40"))  # Envois par seconde, tous salons (Discord : 50)
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))  # Nouvelles tentatives après une erreur 5xx ou réseau
+
+# File d'attente des requêtes IA
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # Appels simultanés max vers Routway
+LLM_MAX_CONCURRENCY_PER_GUILD = int(os.getenv("LLM_MAX_CONCURRENCY_PER_GUILD", "3"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "50"))  # Requêtes en attente max avant refus
+LLM_QUEUE_MAX_WAIT = float(os.getenv("LLM_QUEUE_MAX_WAIT", "20"))  # Secondes avant d'abandonner un message périmé
+
+# Regroupement des messages envoyés en rafale par un même utilisateur
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "1.5"))  # Silence attendu avant de répondre (s)
+COALESCE_MAX_DELAY = float(os.getenv("COALESCE_MAX_DELAY", "6"))  # Attente max depuis le premier message (s)
+
+# Scènes de groupe : un seul appel à l'IA par tour de salon
+SCENE_TURN_WINDOW = float(os.getenv("SCENE_TURN_WINDOW", "4"))  # Silence attendu avant qu'Audrey réponde (s)
+SCENE_TURN_MAX_DELAY = float(os.getenv("SCENE_TURN_MAX_DELAY", "12"))  # Durée max d'un tour (s)
+
+# Stockage persistant des conversations
+STATE_DIR = os.getenv("STATE_DIR", "state")  # Dossier des données persistantes du bot
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", os.path.join(STATE_DIR, "conversations.db"))
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", "1000"))  # Conversations gardées en mémoire
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", "1800"))  # Secondes avant de décharger une conversation inactive
+CONVERSATION_SESSION_TTL = float(os.getenv("CONVERSATION_SESSION_TTL", "86400"))  # Secondes sans message avant fin automatique
+CONVERSATION_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_FLUSH_INTERVAL", "0.5"))  # Regroupement des écritures (s)
+CONVERSATION_RETENTION_DAYS = int(os.getenv("CONVERSATION_RETENTION_DAYS", "30"))  # Historique terminé conservé sur disque
+CONVERSATION_BACKEND = os.getenv("CONVERSATION_BACKEND", "sqlite").lower()  # "sqlite" ou "redis" (partagé entre workers)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_PREFIX = os.getenv("REDIS_PREFIX", "audrey")
+
+# Déploiement multi-shards / multi-processus
+SHARDING_ENABLED = os.getenv("SHARDING_ENABLED", "false").lower() in ("1", "true", "yes", "on")
+SHARD_COUNT = int(os.getenv("SHARD_COUNT")) if os.getenv("SHARD_COUNT") else None  # None = nombre recommandé par Discord
+SHARD_IDS = os.getenv("SHARD_IDS")  # Shards gérés par ce processus, ex. "0-3" ou "0,2,4"
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))  # >1 : ce processus lance les workers
+# Santé de la boucle asyncio (retard, rappels lents) et profilage à la demande
+LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.25"))  # Période de mesure du retard (s)
+LOOP_SLOW_CALLBACK_MS = float(os.getenv("LOOP_SLOW_CALLBACK_MS", "0"))  # Rappel signalé au-delà (0 = chronométré seulement pendant /profiler)
+LOOP_HISTORY_MINUTES = int(os.getenv("LOOP_HISTORY_MINUTES", "60"))  # Historique glissant (une entrée par tranche de 10 s)
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(STATE_DIR, "profiles"))  # Rapports de /profiler
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))  # Durée max d'un profilage
+# Enregistrement anonymisé du trafic, rejouable avec tools/replay.py (vide = désactivé)
+TRAFFIC_RECORD_PATH = os.getenv("TRAFFIC_RECORD_PATH", "")  # Fichier JSONL, complété à chaque démarrage
+TRAFFIC_RECORD_MAX_EVENTS = int(os.getenv("TRAFFIC_RECORD_MAX_EVENTS", "500000"))  # Enregistrement arrêté au-delà
+
+# Cache Discord : Audrey n'a besoin que de son propre membre (commandes de rôles) et des auteurs des messages
+MEMBER_CACHE = os.getenv("MEMBER_CACHE", "minimal").lower()  # minimal, lazy (sans découpage au démarrage), full
+MESSAGE_CACHE_SIZE = int(os.getenv("MESSAGE_CACHE_SIZE", "1000"))  # Messages gardés par discord.py (0 = aucun)
+# Synchronisation de l'index des sessions actives entre workers (0 = désactivée)
+CONVERSATION_SYNC_INTERVAL = float(os.getenv(
+    "CONVERSATION_SYNC_INTERVAL",
+    "2" if SHARDING_ENABLED or WORKER_PROCESSES > 1 or CONVERSATION_BACKEND == "redis" else "0"))
+
+# Arrêt propre (SIGTERM envoyé par Render lors d'un déploiement)
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "25"))  # Attente max des réponses en cours (s)
+
+# Synchronisation des commandes slash au démarrage
+COMMAND_SYNC = os.getenv("COMMAND_SYNC", "auto").lower()  # auto (si l'arbre a changé), always, never
+DEV_GUILD_IDS = [int(g) for g in os.getenv("DEV_GUILD_IDS", "").replace(" ", "").split(",") if g]  # Sync instantanée sur ces serveurs
+COMMAND_SYNC_STATE_PATH = os.getenv("COMMAND_SYNC_STATE_PATH", os.path.join(STATE_DIR, "command_tree.json"))
+
+# Fenêtre de contexte envoyée à l'IA
+HISTORY_MAX_MESSAGES = int(os.getenv("HISTORY_MAX_MESSAGES", "40"))  # Messages gardés par conversation
+HISTORY_COMPRESS = os.getenv("HISTORY_COMPRESS", "false").lower() in ("1", "true", "yes", "on")  # Compresser les anciens messages
+HISTORY_HOT_TURNS = int(os.getenv("HISTORY_HOT_TURNS", "6"))  # Messages récents jamais compressés
+HISTORY_COMPRESS_MIN_CHARS = int(os.getenv("HISTORY_COMPRESS_MIN_CHARS", "300"))  # Messages plus courts : gardés tels quels
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))  # Tokens max du prompt (persona + historique + message)
+CONTEXT_PROMPT_MAX_TOKENS = int(os.getenv("CONTEXT_PROMPT_MAX_TOKENS", "800"))  # Au-delà, le message est tronqué
+CONTEXT_SUMMARY_TOKENS = int(os.getenv("CONTEXT_SUMMARY_TOKENS", "250"))  # Taille max du résumé des anciens échanges
+
+# Modèle IA
+ROUTWAY_MODEL = os.getenv("ROUTWAY_MODEL", "kimi-k2-0905:free")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.8"))
+# Liste ordonnée de repli : "modèle" ou "modèle@url", séparés par des virgules (le premier est le principal)
+ROUTWAY_ENDPOINTS = os.getenv("ROUTWAY_ENDPOINTS", ROUTWAY_MODEL)
+
+# Résilience des appels à l'API (réessais, disjoncteur)
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "3"))  # Tentatives par modèle/endpoint
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))  # Délai de base entre tentatives (s)
+UPSTREAM_BACKOFF_MAX = float(os.getenv("UPSTREAM_BACKOFF_MAX", "8"))  # Délai max entre tentatives (s)
+UPSTREAM_ATTEMPT_TIMEOUT = float(os.getenv("UPSTREAM_ATTEMPT_TIMEOUT", "20"))  # Timeout d'une tentative (s)
+UPSTREAM_DEADLINE = float(os.getenv("UPSTREAM_DEADLINE", "45"))  # Temps total max, réessais compris (s)
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # Échecs consécutifs avant ouverture
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))  # Secondes avant une requête de test
+
+# Cache des réponses pour les messages courants (salutations, questions fréquentes...)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "500"))  # Entrées max en mémoire
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "21600"))  # Durée de vie d'une entrée (s)
+RESPONSE_CACHE_VARIANTS = int(os.getenv("RESPONSE_CACHE_VARIANTS", "3"))  # Réponses différentes gardées par question
+RESPONSE_CACHE_MAX_PROMPT_CHARS = int(os.getenv("RESPONSE_CACHE_MAX_PROMPT_CHARS", "200"))  # Messages plus longs : jamais en cache
+RESPONSE_CACHE_DB_PATH = os.getenv("RESPONSE_CACHE_DB_PATH", os.path.join(STATE_DIR, "response_cache.db"))  # "" = mémoire seule
+
+# Répondeur local (sans API) appris sur les réponses passées d'Audrey : pannes, quotas épuisés, messages simples
+LOCAL_FALLBACK_ENABLED = os.getenv("LOCAL_FALLBACK_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+LOCAL_FALLBACK_DB_PATH = os.getenv("LOCAL_FALLBACK_DB_PATH", os.path.join(STATE_DIR, "local_replies.db"))  # "" = mémoire seule
+LOCAL_FALLBACK_MAX_REPLIES = int(os.getenv("LOCAL_FALLBACK_MAX_REPLIES", "5000"))  # Réponses gardées (les plus récentes)
+LOCAL_FALLBACK_MIN_SCORE = float(os.getenv("LOCAL_FALLBACK_MIN_SCORE", "0.3"))  # Similarité min en repli (0 à 1)
+LOCAL_CHEAP_PROMPTS = os.getenv("LOCAL_CHEAP_PROMPTS", "false").lower() in ("1", "true", "yes", "on")  # Même API disponible
+LOCAL_CHEAP_MAX_CHARS = int(os.getenv("LOCAL_CHEAP_MAX_CHARS", "120"))  # Messages courts et sans contexte seulement
+LOCAL_CHEAP_MIN_SCORE = float(os.getenv("LOCAL_CHEAP_MIN_SCORE", "0.6"))  # Similarité min pour ne pas appeler l'API
+
+# Limitation de débit (seaux à jetons) et quotas de tokens IA ; 0 = illimité.
+# Valeurs par défaut, ajustables serveur par serveur avec /limites
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+RATE_USER_PER_MINUTE = float(os.getenv("RATE_USER_PER_MINUTE", "8"))  # Messages par minute et par utilisateur
+RATE_USER_BURST = float(os.getenv("RATE_USER_BURST", "5"))  # Rafale tolérée avant limitation
+RATE_CHANNEL_PER_MINUTE = float(os.getenv("RATE_CHANNEL_PER_MINUTE", "30"))
+RATE_CHANNEL_BURST = float(os.getenv("RATE_CHANNEL_BURST", "15"))
+RATE_GUILD_PER_MINUTE = float(os.getenv("RATE_GUILD_PER_MINUTE", "90"))
+RATE_GUILD_BURST = float(os.getenv("RATE_GUILD_BURST", "40"))
+LLM_QUOTA_WINDOW = float(os.getenv("LLM_QUOTA_WINDOW", "3600"))  # Fenêtre glissante des quotas de tokens (s)
+LLM_USER_TOKEN_QUOTA = int(os.getenv("LLM_USER_TOKEN_QUOTA", "30000"))  # Tokens IA par utilisateur et par fenêtre
+LLM_GUILD_TOKEN_QUOTA = int(os.getenv("LLM_GUILD_TOKEN_QUOTA", "300000"))  # Tokens IA par serveur et par fenêtre
+RATE_LIMITS_PATH = os.getenv("RATE_LIMITS_PATH", os.path.join(STATE_DIR, "rate_limits.json"))  # Réglages par serveur
+
+# Lectures du jour (tarot, prédiction, lune) pré-générées en tâche de fond
+DAILY_READINGS_ENABLED = os.getenv("DAILY_READINGS_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+DAILY_READINGS_HOUR = int(os.getenv("DAILY_READINGS_HOUR", "4"))  # Heure creuse de génération (heure locale)
+DAILY_READINGS_VARIANTS = int(os.getenv("DAILY_READINGS_VARIANTS", "3"))  # Interprétations par carte et par jour
+DAILY_READINGS_CONCURRENCY = int(os.getenv("DAILY_READINGS_CONCURRENCY", "2"))  # Appels simultanés max du lot
+DAILY_READINGS_DB_PATH = os.getenv("DAILY_READINGS_DB_PATH", os.path.join(STATE_DIR, "daily_readings.db"))
+
+# -----------------------------
+# Contenus : persona, cartes du tarot, énigmes (fichiers de data/)
+# -----------------------------
+class ContentLibrary:
+    """Contenus éditables chargés à la demande depuis DATA_DIR puis gardés en mémoire.
+
+    `reload()` relit tous les fichiers (commande /recharger) sans redémarrer le bot ;
+    si l'un d'eux est invalide, aucun n'est remplacé et l'ancienne version reste servie.
+    """
+
+    FILES = {"persona": "persona.txt", "tarot_cards": "tarot_cards.json", "riddles": "riddles.json"}
+
+    def __init__(self, data_dir: str = DATA_DIR):
+        self.data_dir = data_dir
+        self._cache: Dict[str, object] = {}
+        self.version = 0
+
+    def _load(self, name: str):
+        path = os.path.join(self.data_dir, self.FILES[name])
+        with open(path, encoding="utf-8") as f:
+            value = f.read().strip() if path.endswith(".txt") else json.load(f)
+        if name == "persona" and not value:
+            raise ValueError(f"{path} est vide")
+        if name == "tarot_cards" and not all(isinstance(c, dict) and c.get("name") and c.get("meaning") for c in value or [None]):
+            raise ValueError(f"{path} : chaque carte doit avoir un « name » et un « meaning »")
+        if name == "riddles" and not all(isinstance(r, dict) and r.get("riddle") and r.get("answer") for r in value or [None]):
+            raise ValueError(f"{path} : chaque énigme doit avoir un « riddle » et un « answer »")
+        return value
+
+    def _get(self, name: str):
+        value = self._cache.get(name)
+        if value is None:
+            value = self._cache[name] = self._load(name)
+        return value
+
+    @property
+    def persona(self) -> str:
+        return self._get("persona")
+
+    @property
+    def tarot_cards(self) -> List[dict]:
+        return self._get("tarot_cards")
+
+    @property
+    def riddles(self) -> List[dict]:
+        return self._get("riddles")
+
+    def reload(self) -> List[str]:
+        """Relire tous les fichiers ; renvoie les contenus modifiés (ValueError/OSError si invalide)"""
+        fresh = {name: self._load(name) for name in self.FILES}
+        changed = [name for name, value in fresh.items() if name in self._cache and self._cache[name] != value]
+        self._cache = fresh
+        self.version += 1
+        return changed
+
+library = ContentLibrary()
+
+# -----------------------------
+# Métriques (format Prometheus)
+# -----------------------------
+def _format_labels(names: Tuple[str, ...], values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{str(value)}"'.replace("\n", " ") for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value) -> str:
+    value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return f"{value:g}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] += amount
+
+    def total(self) -> float:
+        with self._lock:
+            return sum(self._values.values())
+
+    def snapshot(self) -> Dict[tuple, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self.snapshot().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+class Histogram:
+    """Histogramme Prometheus + échantillon des dernières valeurs pour les percentiles"""
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, sample_size: int = 1024):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}  # {labels: [compteurs par seau..., somme, nombre]}
+        self._recent = deque(maxlen=sample_size)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+            self._recent.append(value)
+
+    @asynccontextmanager
+    async def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(series[-1] for series in self._series.values())
+
+    def percentile(self, p: float) -> float:
+        with self._lock:
+            values = sorted(self._recent)
+        return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in series_items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                le = 'le="%g"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}")
+        return lines
+
+class MetricsRegistry:
+    """Registre des métriques du bot, exposées au format texte Prometheus.
+
+    Les jauges sont calculées à la demande par des fonctions (état de la file,
+    du pool HTTP, des caches...) pour ne rien coûter sur les chemins chauds.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._gauges = []  # [(nom, aide, fonction → valeur ou {(étiquette,): valeur}, noms d'étiquettes)]
+        self.started_at = time.time()
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help_text, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), **kwargs) -> Histogram:
+        metric = Histogram(name, help_text, labelnames, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, help_text: str, func, labelnames: Tuple[str, ...] = ()):
+        self._gauges.append((name, help_text, func, labelnames))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, help_text, func, labelnames in self._gauges:
+            try:
+                value = func()
+            except Exception as e:
+                lines.append(f"# {name}: erreur {type(e).__name__}")
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, dict):
+                for labels, item in sorted(value.items()):
+                    labels = labels if isinstance(labels, tuple) else (labels,)
+                    lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(item)}")
+            else:
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+UPSTREAM_LATENCY = metrics.histogram(
+    "audrey_upstream_request_seconds", "Durée des appels HTTP à l'API Routway (par tentative)", ("endpoint", "status"))
+LLM_REQUESTS = metrics.counter(
+    "audrey_llm_requests_total", "Réponses d'Audrey demandées, par issue", ("mode", "outcome"))
+LLM_TOKENS = metrics.counter("audrey_llm_tokens_total", "Tokens consommés", ("kind",))
+RATE_LIMITED = metrics.counter("audrey_rate_limited_total", "Messages refusés par les limites de débit ou les quotas",
+                               ("scope",))
+MESSAGE_HANDLING = metrics.histogram(
+    "audrey_on_message_seconds", "Temps de traitement de on_message", ("path",))
+REPLY_LATENCY = metrics.histogram(
+    "audrey_reply_seconds", "Délai entre le dernier message de l'utilisateur et la réponse complète d'Audrey", ("source",))
+COMMAND_LATENCY = metrics.histogram(
+    "audrey_command_seconds", "Durée d'exécution des commandes", ("command", "status"))
+OUTBOUND_MESSAGES = metrics.counter(
+    "audrey_outbound_messages_total", "Messages Discord envoyés par la file de sortie, par issue", ("outcome",))
+OUTBOUND_WAIT = metrics.histogram(
+    "audrey_outbound_wait_seconds", "Attente dans la file de sortie (cadence des salons comprise)")
+LOOP_LAG = metrics.histogram(
+    "audrey_event_loop_lag_seconds", "Retard de réveil d'une tâche dans la boucle asyncio",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+SLOW_CALLBACKS = metrics.counter(
+    "audrey_event_loop_slow_callbacks_total", "Rappels de la boucle asyncio plus longs que LOOP_SLOW_CALLBACK_MS")
+DISCORD_API_LATENCY = metrics.histogram(
+    "audrey_discord_api_seconds", "Durée des envois/éditions de messages Discord", ("operation",))
+
+# -----------------------------
+# Stockage des conversations
+# -----------------------------
+_ROLES = {role: role for role in ("system", "user", "assistant")}
+
+class Turn:
+    """Message de l'historique, en mémoire compacte.
+
+    Pas de dict par message : rôle partagé (chaîne internée), tokens estimés
+    une seule fois, texte éventuellement compressé (zlib) une fois le message
+    devenu ancien ; il n'est alors décompressé que s'il entre dans le contexte.
+    """
+    __slots__ = ("role", "tokens", "_text")
+
+    def __init__(self, role: str, content: str):
+        self.role = _ROLES.get(role) or sys.intern(role)
+        self.tokens = estimate_tokens(content)
+        self._text = content
+
+    @property
+    def content(self) -> str:
+        text = self._text
+        return text if type(text) is str else zlib.decompress(text).decode("utf-8")
+
+    @property
+    def compressed(self) -> bool:
+        return type(self._text) is bytes
+
+    def compress(self, min_chars: int = HISTORY_COMPRESS_MIN_CHARS):
+        """Compresser le texte si c'est rentable (les messages courts ne gagnent rien)"""
+        text = self._text
+        if type(text) is str and len(text) >= min_chars:
+            packed = zlib.compress(text.encode("utf-8"), 6)
+            if len(packed) < len(text):
+                self._text = packed
+
+    def as_message(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+class Conversation:
+    """Conversation d'un utilisateur avec Audrey (une session /parler → /stop)"""
+    __slots__ = ("user_id", "session_id", "channel_id", "active", "history", "last_seen",
+                 "summary", "turns_total", "context_summary")
+
+    def __init__(self, user_id: int, session_id: str, channel_id: int, history: List[Tuple[str, str]] = None,
+                 last_seen: float = None, summary: str = "", history_max: int = HISTORY_MAX_MESSAGES):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.channel_id = channel_id
+        self.active = True
+        # File bornée (tampon circulaire) : les messages les plus anciens sortent seuls, sans recopier la liste
+        self.history = deque((Turn(role, content) for role, content in history or ()), maxlen=history_max)
+        self.last_seen = last_seen if last_seen is not None else time.time()
+        self.summary = summary  # Résumé des messages sortis de l'historique
+        self.turns_total = len(self.history)
+        self.context_summary = None  # (clé, texte) : résumé mis en cache par build_context
+
+class SQLiteConversationBackend:
+    """Stockage SQLite (mode WAL) des sessions, de l'historique et des énigmes en cours.
+
+    Les méthodes sont synchrones : ConversationStore les exécute dans un thread
+    dédié pour ne jamais bloquer la boucle asyncio. L'historique est en ajout seul
+    (une ligne par message), les sessions sont mises à jour sur place. Plusieurs
+    processus d'une même machine peuvent partager le fichier.
+    """
+
+    def __init__(self, path: str = CONVERSATION_DB_PATH):
+        self.path = path
+        self._db = None
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                active INTEGER NOT NULL DEFAULT 1,
+                started_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_active ON sessions (active, user_id);
+            CREATE TABLE IF NOT EXISTS turns (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, id);
+            CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at);
+            CREATE TABLE IF NOT EXISTS riddles (
+                channel_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                riddle_index INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (channel_id, user_id)
+            );
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(sessions)")}
+        if "summary" not in columns:
+            self._db.execute("ALTER TABLE sessions ADD COLUMN summary TEXT NOT NULL DEFAULT ''")
+        self._db.commit()
+
+    def prune(self, retention_days: int):
+        """Supprimer l'historique des sessions terminées depuis plus de `retention_days` jours"""
+        cutoff = time.time() - retention_days * 86400
+        with self._db:
+            self._db.execute(
+                "DELETE FROM turns WHERE session_id IN (SELECT session_id FROM sessions WHERE active = 0 AND updated_at < ?)",
+                (cutoff,))
+            self._db.execute("DELETE FROM sessions WHERE active = 0 AND updated_at < ?", (cutoff,))
+
+    def load_active_sessions(self) -> List[tuple]:
+        """[(user_id, session_id, channel_id, updated_at)] des sessions actives"""
+        return self._db.execute(
+            "SELECT user_id, session_id, channel_id, updated_at FROM sessions WHERE active = 1").fetchall()
+
+    def changes_since(self, since: float) -> List[tuple]:
+        """[(user_id, session_id, channel_id, active, updated_at)] modifiées depuis `since`"""
+        return self._db.execute(
+            "SELECT user_id, session_id, channel_id, active, updated_at FROM sessions WHERE updated_at > ?",
+            (since,)).fetchall()
+
+    def load_riddles(self, now: float) -> List[tuple]:
+        """[(channel_id, user_id, riddle_index, expires_at)] des énigmes non expirées"""
+        self._db.execute("DELETE FROM riddles WHERE expires_at <= ?", (now,))
+        self._db.commit()
+        return self._db.execute("SELECT channel_id, user_id, riddle_index, expires_at FROM riddles").fetchall()
+
+    def load_session(self, session_id: str, limit: int) -> Tuple[List[Tuple[str, str]], str]:
+        """([(rôle, texte)] des derniers messages, résumé des plus anciens) d'une session"""
+        rows = self._db.execute(
+            "SELECT role, content FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit)).fetchall()
+        rows.reverse()
+        summary = self._db.execute("SELECT summary FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return rows, summary[0] if summary else ""
+
+    def write_batch(self, ops: List[tuple]):
+        """Appliquer un lot d'écritures dans une seule transaction"""
+        with self._db:
+            for op in ops:
+                kind = op[0]
+                if kind == "start":
+                    _, session_id, user_id, channel_id, ts = op
+                    self._db.execute("UPDATE sessions SET active = 0, updated_at = ? WHERE user_id = ? AND active = 1",
+                                     (ts, user_id))
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO sessions (session_id, user_id, channel_id, active, started_at, updated_at) "
+                        "VALUES (?, ?, ?, 1, ?, ?)", (session_id, user_id, channel_id, ts, ts))
+                elif kind == "turn":
+                    _, session_id, role, content, ts = op
+                    self._db.execute("INSERT INTO turns (session_id, role, content, created_at) VALUES (?, ?, ?, ?)",
+                                     (session_id, role, content, ts))
+                    self._db.execute("UPDATE sessions SET updated_at = ? WHERE session_id = ?", (ts, session_id))
+                elif kind == "summary":
+                    _, session_id, summary = op
+                    self._db.execute("UPDATE sessions SET summary = ? WHERE session_id = ?", (summary, session_id))
+                elif kind == "end":
+                    _, session_id, ts = op
+                    self._db.execute("UPDATE sessions SET active = 0, updated_at = ? WHERE session_id = ?",
+                                     (ts, session_id))
+                elif kind == "riddle":
+                    _, channel_id, user_id, riddle_index, expires_at = op
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO riddles (channel_id, user_id, riddle_index, expires_at) VALUES (?, ?, ?, ?)",
+                        (channel_id, user_id, riddle_index, expires_at))
+                elif kind == "riddle_end":
+                    _, channel_id, user_id = op
+                    self._db.execute("DELETE FROM riddles WHERE channel_id = ? AND user_id = ?", (channel_id, user_id))
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+class RedisConversationBackend:
+    """Stockage Redis partagé entre plusieurs workers/machines (même interface que SQLite).
+
+    Clés utilisées (préfixe REDIS_PREFIX) :
+    - session:<id>   hash {user_id, channel_id, active, started_at, updated_at, summary}
+    - turns:<id>     liste JSON des messages (ajout seul)
+    - active         hash {user_id: session_id}
+    - updates        zset des sessions par date de mise à jour
+    - riddle:<salon>:<utilisateur>  énigme en cours (expire d'elle-même)
+
+    Nécessite le paquet `redis` ; `REDIS_URL=fakeredis://` utilise `fakeredis`
+    (substitut en mémoire, pratique pour les tests sans serveur).
+    """
+
+    def __init__(self, url: str = REDIS_URL, prefix: str = REDIS_PREFIX):
+        self.url = url
+        self.prefix = prefix
+        self._redis = None
+
+    def _key(self, *parts) -> str:
+        return ":".join((self.prefix,) + tuple(str(p) for p in parts))
+
+    def open(self):
+        if self.url.startswith("fakeredis"):
+            import fakeredis
+            self._redis = fakeredis.FakeRedis(decode_responses=True)
+        else:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("CONVERSATION_BACKEND=redis nécessite le paquet `redis` (pip install redis)") from e
+            self._redis = redis.Redis.from_url(self.url, decode_responses=True)
+        self._redis.ping()
+
+    def prune(self, retention_days: int):
+        cutoff = time.time() - retention_days * 86400
+        for session_id in self._redis.zrangebyscore(self._key("updates"), "-inf", cutoff):
+            if self._redis.hget(self._key("session", session_id), "active") != "1":
+                self._redis.delete(self._key("session", session_id), self._key("turns", session_id))
+                self._redis.zrem(self._key("updates"), session_id)
+
+    def _sessions(self, session_ids) -> List[tuple]:
+        pipe = self._redis.pipeline()
+        for session_id in session_ids:
+            pipe.hgetall(self._key("session", session_id))
+        rows = []
+        for session_id, data in zip(session_ids, pipe.execute()):
+            if data:
+                rows.append((int(data["user_id"]), session_id, int(data["channel_id"]),
+                             int(data["active"]), float(data["updated_at"])))
+        return rows
+
+    def load_active_sessions(self) -> List[tuple]:
+        session_ids = list(self._redis.hgetall(self._key("active")).values())
+        return [(user_id, session_id, channel_id, updated_at)
+                for user_id, session_id, channel_id, active, updated_at in self._sessions(session_ids) if active]
+
+    def changes_since(self, since: float) -> List[tuple]:
+        return self._sessions(self._redis.zrangebyscore(self._key("updates"), f"({since}", "+inf"))
+
+    def load_riddles(self, now: float) -> List[tuple]:
+        rows = []
+        for key in self._redis.scan_iter(self._key("riddle", "*")):
+            data = self._redis.hgetall(key)
+            if data and float(data["expires_at"]) > now:
+                rows.append((int(data["channel_id"]), int(data["user_id"]),
+                             int(data["riddle_index"]), float(data["expires_at"])))
+        return rows
+
+    def load_session(self, session_id: str, limit: int) -> Tuple[List[Tuple[str, str]], str]:
+        turns = self._redis.lrange(self._key("turns", session_id), -limit, -1)
+        summary = self._redis.hget(self._key("session", session_id), "summary") or ""
+        return [tuple(json.loads(raw)[:2]) for raw in turns], summary
+
+    def write_batch(self, ops: List[tuple]):
+        pipe = self._redis.pipeline()
+        for op in ops:
+            kind = op[0]
+            if kind == "start":
+                _, session_id, user_id, channel_id, ts = op
+                previous = self._redis.hget(self._key("active"), user_id)
+                if previous and previous != session_id:
+                    pipe.hset(self._key("session", previous), mapping={"active": 0, "updated_at": ts})
+                    pipe.zadd(self._key("updates"), {previous: ts})
+                pipe.hset(self._key("session", session_id), mapping={
+                    "user_id": user_id, "channel_id": channel_id, "active": 1,
+                    "started_at": ts, "updated_at": ts, "summary": ""})
+                pipe.hset(self._key("active"), user_id, session_id)
+                pipe.zadd(self._key("updates"), {session_id: ts})
+            elif kind == "turn":
+                _, session_id, role, content, ts = op
+                pipe.rpush(self._key("turns", session_id), json.dumps([role, content, ts], ensure_ascii=False))
+                pipe.hset(self._key("session", session_id), "updated_at", ts)
+                pipe.zadd(self._key("updates"), {session_id: ts})
+            elif kind == "summary":
+                _, session_id, summary = op
+                pipe.hset(self._key("session", session_id), "summary", summary)
+            elif kind == "end":
+                _, session_id, ts = op
+                user_id = self._redis.hget(self._key("session", session_id), "user_id")
+                pipe.hset(self._key("session", session_id), mapping={"active": 0, "updated_at": ts})
+                pipe.zadd(self._key("updates"), {session_id: ts})
+                if user_id is not None and self._redis.hget(self._key("active"), user_id) == session_id:
+                    pipe.hdel(self._key("active"), user_id)
+            elif kind == "riddle":
+                _, channel_id, user_id, riddle_index, expires_at = op
+                key = self._key("riddle", channel_id, user_id)
+                pipe.hset(key, mapping={"channel_id": channel_id, "user_id": user_id,
+                                        "riddle_index": riddle_index, "expires_at": expires_at})
+                pipe.expireat(key, int(expires_at) + 1)
+            elif kind == "riddle_end":
+                _, channel_id, user_id = op
+                pipe.delete(self._key("riddle", channel_id, user_id))
+        pipe.execute()
+
+    def close(self):
+        if self._redis is not None:
+            self._redis.close()
+            self._redis = None
+
+def make_conversation_backend(kind: str = CONVERSATION_BACKEND):
+    if kind == "redis":
+        return RedisConversationBackend()
+    if kind != "sqlite":
+        print(f"[💾] CONVERSATION_BACKEND inconnu ({kind}), utilisation de SQLite")
+    return SQLiteConversationBackend()
+
+_EMPTY_SET = frozenset()
+
+class ConversationStore:
+    """Conversations des utilisateurs : cache mémoire borné + stockage persistant.
+
+    - l'index des sessions actives {user_id: (session_id, channel_id)} reste en
+      mémoire, doublé d'un index par salon, pour que on_message sache en O(1)
+      à qui répondre et ignore les autres salons ;
+    - les historiques vivent dans un cache LRU borné (taille + durée d'inactivité)
+      et sont rechargés depuis le disque à la demande ;
+    - les écritures sont regroupées et appliquées hors de la boucle asyncio ;
+    - avec un stockage partagé (plusieurs workers), l'index est resynchronisé
+      toutes les `sync_interval` secondes depuis le stockage.
+    La mémoire reste donc stable quel que soit le nombre d'utilisateurs passés par
+    le bot, et les sessions actives reprennent après un redémarrage.
+    """
+
+    def __init__(self, backend=None, cache_size: int = CONVERSATION_CACHE_SIZE,
+                 idle_ttl: float = CONVERSATION_IDLE_TTL, session_ttl: float = CONVERSATION_SESSION_TTL,
+                 flush_interval: float = CONVERSATION_FLUSH_INTERVAL, history_max: int = HISTORY_MAX_MESSAGES,
+                 sync_interval: float = CONVERSATION_SYNC_INTERVAL):
+        self.backend = backend if backend is not None else make_conversation_backend()
+        self.sync_interval = sync_interval
+        self._synced_at = 0.0
+        self.cache_size = cache_size
+        self.idle_ttl = idle_ttl
+        self.session_ttl = session_ttl
+        self.flush_interval = flush_interval
+        self.history_max = history_max
+        self._active: Dict[int, tuple] = {}  # {user_id: (session_id, channel_id, last_seen)}
+        self._by_channel: Dict[int, set] = {}  # {channel_id: {user_id actifs}}
+        self._scenes = 0  # Sessions de scène de groupe dans _active (clés négatives)
+        self._cache: "OrderedDict[int, Conversation]" = OrderedDict()
+        self._pending: List[tuple] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="conversation-store")
+        self._flush_task = None
+        self._opened = False
+        self.loads = 0
+        self.evictions = 0
+        self.writes = 0
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self):
+        if self._opened:
+            return
+        await self._run(self.backend.open)
+        await self._run(self.backend.prune, CONVERSATION_RETENTION_DAYS)
+        self._synced_at = time.time()
+        for user_id, session_id, channel_id, updated_at in await self._run(self.backend.load_active_sessions):
+            self._activate(user_id, session_id, channel_id, updated_at)
+        self._opened = True
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        print(f"[💾] Stockage des conversations prêt ({len(self._active)} session(s) active(s) reprise(s))")
+
+    # --- Lecture ---
+    def is_active(self, user_id: int) -> bool:
+        return user_id in self._active
+
+    def active_channel(self, user_id: int) -> Optional[int]:
+        entry = self._active.get(user_id)
+        return entry[1] if entry else None
+
+    def active_count(self) -> int:
+        """Conversations /parler actives (sans les scènes de groupe)"""
+        return len(self._active) - self._scenes
+
+    def scene_count(self) -> int:
+        """Scènes de groupe actives"""
+        return self._scenes
+
+    def active_sessions(self) -> List[Tuple[int, int]]:
+        """[(utilisateur ou scène, salon)] des conversations actives"""
+        return [(user_id, entry[1]) for user_id, entry in self._active.items()]
+
+    def channel_users(self, channel_id: int):
+        """Utilisateurs ayant une conversation active dans ce salon (ne pas modifier)"""
+        return self._by_channel.get(channel_id, _EMPTY_SET)
+
+    def _activate(self, user_id: int, session_id: str, channel_id: int, last_seen: float):
+        previous = self._active.get(user_id)
+        if previous is None and user_id < 0:
+            self._scenes += 1
+        if previous is not None and previous[1] != channel_id:
+            self._unindex(user_id, previous[1])
+        self._active[user_id] = (session_id, channel_id, last_seen)
+        self._by_channel.setdefault(channel_id, set()).add(user_id)
+
+    def _deactivate(self, user_id: int) -> Optional[tuple]:
+        entry = self._active.pop(user_id, None)
+        if entry is not None:
+            if user_id < 0:
+                self._scenes -= 1
+            self._unindex(user_id, entry[1])
+        return entry
+
+    def _unindex(self, user_id: int, channel_id: int):
+        users = self._by_channel.get(channel_id)
+        if users is not None:
+            users.discard(user_id)
+            if not users:
+                del self._by_channel[channel_id]
+
+    def get(self, user_id: int) -> Optional[Conversation]:
+        """Conversation active si elle est déjà en mémoire (sans accès disque)"""
+        conversation = self._cache.get(user_id)
+        if conversation is not None:
+            self._cache.move_to_end(user_id)
+        return conversation
+
+    async def load(self, user_id: int) -> Optional[Conversation]:
+        """Conversation active, rechargée depuis le disque si elle a été déchargée"""
+        conversation = self.get(user_id)
+        if conversation is not None or user_id not in self._active:
+            return conversation
+        session_id, channel_id, last_seen = self._active[user_id]
+        history, summary = await self._run(self.backend.load_session, session_id, self.history_max)
+        self.loads += 1
+        # La session a pu être terminée ou remplacée pendant la lecture
+        if self._active.get(user_id, (None,))[0] != session_id:
+            return self.get(user_id)
+        conversation = Conversation(user_id, session_id, channel_id, history, last_seen, summary, self.history_max)
+        if HISTORY_COMPRESS:
+            for turn in islice(conversation.history, 0, max(0, len(conversation.history) - HISTORY_HOT_TURNS)):
+                turn.compress()
+        self._remember(conversation)
+        return conversation
+
+    # --- Écriture ---
+    def start(self, user_id: int, channel_id: int) -> Conversation:
+        """Démarrer (ou redémarrer) la conversation d'un utilisateur"""
+        self.end(user_id)
+        now = time.time()
+        conversation = Conversation(user_id, f"{user_id}-{time.time_ns()}", channel_id, last_seen=now,
+                                    history_max=self.history_max)
+        self._activate(user_id, conversation.session_id, channel_id, now)
+        self._remember(conversation)
+        self._pending.append(("start", conversation.session_id, user_id, channel_id, now))
+        return conversation
+
+    def append(self, conversation: Conversation, role: str, content: str):
+        """Ajouter un message à l'historique (mémoire immédiatement, disque en différé)"""
+        if not conversation.active:
+            return
+        if self._active.get(conversation.user_id, (None,))[0] != conversation.session_id:
+            # Session terminée ou remplacée pendant la réponse (objet déjà sorti du cache) : rien à écrire
+            conversation.active = False
+            return
+        now = time.time()
+        history = conversation.history
+        if len(history) == history.maxlen:
+            # Le plus ancien message va sortir de la file : on le garde en résumé
+            conversation.summary = roll_summary(conversation.summary, history[0])
+            self._pending.append(("summary", conversation.session_id, conversation.summary))
+        history.append(Turn(role, content))
+        if HISTORY_COMPRESS and len(history) > HISTORY_HOT_TURNS:
+            history[-HISTORY_HOT_TURNS - 1].compress()  # Ce message devient ancien
+        conversation.turns_total += 1
+        conversation.last_seen = now
+        self._active[conversation.user_id] = (conversation.session_id, conversation.channel_id, now)
+        if conversation.user_id in self._cache:
+            self._cache.move_to_end(conversation.user_id)
+        self._pending.append(("turn", conversation.session_id, role, content, now))
+
+    def end(self, user_id: int) -> bool:
+        """Terminer la conversation d'un utilisateur et libérer sa mémoire"""
+        entry = self._deactivate(user_id)
+        conversation = self._cache.pop(user_id, None)
+        if conversation is not None:
+            conversation.active = False
+        if entry is None:
+            return False
+        self._pending.append(("end", entry[0], time.time()))
+        return True
+
+    def _remember(self, conversation: Conversation):
+        self._cache[conversation.user_id] = conversation
+        self._cache.move_to_end(conversation.user_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def _expire(self):
+        """Décharger les conversations inactives et clore les sessions abandonnées"""
+        now = time.time()
+        for user_id, conversation in list(self._cache.items()):
+            # L'ordre du cache suit les lectures, pas last_seen (dernier message) : tout parcourir
+            if now - conversation.last_seen < self.idle_ttl:
+                continue
+            del self._cache[user_id]
+            self.evictions += 1
+        for user_id, (_, _, last_seen) in list(self._active.items()):
+            if now - last_seen > self.session_ttl:
+                self.end(user_id)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        ops, self._pending = self._pending, []
+        try:
+            await self._run(self.backend.write_batch, ops)
+            self.writes += len(ops)
+        except Exception as e:
+            print(f"[💾] Erreur d'écriture des conversations : {e}")
+            self._pending[:0] = ops  # Réessayer au prochain passage
+
+    async def sync(self):
+        """Appliquer les sessions démarrées ou terminées par les autres workers"""
+        since = self._synced_at - 1.0  # Marge pour les horloges légèrement décalées
+        self._synced_at = time.time()
+        try:
+            changes = await self._run(self.backend.changes_since, since)
+        except Exception as e:
+            print(f"[💾] Erreur de synchronisation des sessions : {e}")
+            return
+        for user_id, session_id, channel_id, active, updated_at in changes:
+            entry = self._active.get(user_id)
+            if active:
+                if entry is None or (entry[0] != session_id and updated_at > entry[2]):
+                    self._activate(user_id, session_id, channel_id, updated_at)
+                    self._cache.pop(user_id, None)
+            elif entry is not None and entry[0] == session_id:
+                self._deactivate(user_id)
+                conversation = self._cache.pop(user_id, None)
+                if conversation is not None:
+                    conversation.active = False
+
+    async def _flush_loop(self):
+        last_expire = time.monotonic()
+        last_sync = time.monotonic()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if self.sync_interval and time.monotonic() - last_sync >= self.sync_interval:
+                await self.sync()
+                last_sync = time.monotonic()
+            if time.monotonic() - last_expire >= 60:
+                self._expire()
+                last_expire = time.monotonic()
+
+    # --- Énigmes en cours (partagées entre workers) ---
+    def save_riddle(self, channel_id: int, user_id: int, riddle_index: int, expires_at: float):
+        self._pending.append(("riddle", channel_id, user_id, riddle_index, expires_at))
+
+    def end_riddle(self, channel_id: int, user_id: int):
+        self._pending.append(("riddle_end", channel_id, user_id))
+
+    async def load_riddles(self) -> List[tuple]:
+        await self.flush()
+        return await self._run(self.backend.load_riddles, time.time())
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._opened:
+            await self.flush()
+            await self._run(self.backend.close)
+            self._opened = False
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active_sessions": len(self._active),
+            "active_scenes": self._scenes,
+            "active_channels": len(self._by_channel),
+            "cached": len(self._cache),
+            "pending_writes": len(self._pending),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "writes": self.writes,
+        }
+
+conversations = ConversationStore()
+
+# -----------------------------
+# Fenêtre de contexte (budget de tokens)
+# -----------------------------
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s")
+
+def estimate_tokens(text: str) -> int:
+    """Estimation rapide du nombre de tokens (~3,5 caractères par token en français, +4 de structure)"""
+    return len(text) * 2 // 7 + 4
+
+def _summary_line(turn: Turn) -> str:
+    speaker = "Audrey" if turn.role == "assistant" else "Interlocuteur"
+    first_sentence = _SENTENCE_END.split(turn.content.strip(), 1)[0]
+    if len(first_sentence) > 160:
+        first_sentence = first_sentence[:157].rstrip() + "..."
+    return f"{speaker} : {first_sentence}"
+
+def _trim_summary(lines: List[str], max_tokens: int) -> str:
+    """Garder les lignes les plus récentes qui tiennent dans le budget"""
+    kept = []
+    used = 0
+    for line in reversed(lines):
+        used += estimate_tokens(line)
+        if used > max_tokens:
+            break
+        kept.append(line)
+    return "\n".join(reversed(kept))
+
+def roll_summary(summary: str, turn: Turn, max_tokens: int = CONTEXT_SUMMARY_TOKENS) -> str:
+    """Ajouter au résumé un message qui sort de l'historique"""
+    lines = summary.split("\n") if summary else []
+    lines.append(_summary_line(turn))
+    return _trim_summary(lines, max_tokens)
+
+def _context_summary(conversation: Conversation, excluded: int) -> str:
+    """Résumé des messages hors budget, mis en cache tant que l'historique ne bouge pas"""
+    key = (conversation.turns_total, excluded, conversation.summary)
+    cached = conversation.context_summary
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    lines = conversation.summary.split("\n") if conversation.summary else []
+    lines.extend(_summary_line(turn) for turn in islice(conversation.history, excluded))
+    text = _trim_summary(lines, CONTEXT_SUMMARY_TOKENS)
+    conversation.context_summary = (key, text)
+    return text
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    max_chars = max(0, (max_tokens - 4) * 7 // 2)
+    return text if len(text) <= max_chars else text[:max_chars].rstrip() + " [...]"
+
+def build_context(prompt: str, conversation: Optional[Conversation] = None,
+                  budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[List[dict], int]:
+    """Construire les messages envoyés à l'IA dans un budget de tokens.
+
+    L'historique est rempli du plus récent au plus ancien tant que le budget le
+    permet ; les messages plus anciens sont remplacés par un résumé. Renvoie
+    (messages, estimation des tokens du prompt).
+    """
+    prompt = _truncate_to_tokens(prompt, CONTEXT_PROMPT_MAX_TOKENS)
+    persona = library.persona
+    used = estimate_tokens(persona) + estimate_tokens(prompt)
+    
+    history = ()
+    excluded = 0  # Messages les plus anciens laissés hors du budget
+    summary = ""
+    if conversation is not None and conversation.active and conversation.history:
+        history = conversation.history
+        remaining = budget - used
+        if conversation.summary or sum(turn.tokens for turn in history) > remaining:
+            remaining -= CONTEXT_SUMMARY_TOKENS  # Place réservée au résumé
+        excluded = len(history)
+        for turn in reversed(history):
+            if turn.tokens > remaining:
+                break
+            remaining -= turn.tokens
+            excluded -= 1
+        summary = _context_summary(conversation, excluded)
+    elif conversation is not None and conversation.active:
+        summary = conversation.summary
+    
+    messages = [{"role": "system", "content": persona}]
+    if summary:
+        summary_text = f"Résumé des échanges précédents avec cet interlocuteur :\n{summary}"
+        messages.append({"role": "system", "content": summary_text})
+        used += estimate_tokens(summary_text)
+    # Les messages retenus sont lus directement dans l'historique, sans liste intermédiaire
+    for turn in islice(history, excluded, None):
+        messages.append(turn.as_message())
+        used += turn.tokens
+    messages.append({"role": "user", "content": prompt})
+    return messages, used
+
+class TokenUsage:
+    """Comptage des tokens par requête (valeurs de l'API si disponibles, sinon estimations)"""
+
+    def __init__(self, recent: int = 500):
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated_prompt_tokens = 0
+        self.recent = deque(maxlen=recent)  # [(tokens prompt, tokens réponse)]
+
+    def record(self, estimated_prompt: int, usage: Optional[dict], completion: str) -> Tuple[int, int]:
+        usage = usage or {}
+        prompt_tokens = usage.get("prompt_tokens") or estimated_prompt
+        completion_tokens = usage.get("completion_tokens") or estimate_tokens(completion)
+        self.requests += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+        self.estimated_prompt_tokens += estimated_prompt
+        self.recent.append((prompt_tokens, completion_tokens))
+        LLM_TOKENS.inc("prompt", amount=prompt_tokens)
+        LLM_TOKENS.inc("completion", amount=completion_tokens)
+        rate_limiter.charge(prompt_tokens + completion_tokens)
+        return prompt_tokens, completion_tokens
+
+    @property
+    def last(self) -> Tuple[int, int]:
+        return self.recent[-1] if self.recent else (0, 0)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "avg_prompt_tokens": self.prompt_tokens / self.requests if self.requests else 0.0,
+            "avg_completion_tokens": self.completion_tokens / self.requests if self.requests else 0.0,
+        }
+
+token_usage = TokenUsage()
+
+# -----------------------------
+# Limitation de débit et quotas de tokens
+# -----------------------------
+class TokenBucket:
+    """Seau à jetons : se remplit de `rate` jetons par seconde, jusqu'à `burst`"""
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, rate: float, burst: float, now: float) -> float:
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        return self.tokens
+
+class RollingCounter:
+    """Somme glissante découpée en tranches de temps (ajout et lecture en O(1) amorti)"""
+    __slots__ = ("slots", "total")
+
+    def __init__(self):
+        self.slots = deque()  # [indice de tranche, montant]
+        self.total = 0
+
+    def add(self, amount: int, slot: int):
+        if self.slots and self.slots[-1][0] == slot:
+            self.slots[-1][1] += amount
+        else:
+            self.slots.append([slot, amount])
+        self.total += amount
+
+    def expire(self, oldest_slot: int) -> int:
+        """Oublier les tranches sorties de la fenêtre ; renvoie le total restant"""
+        while self.slots and self.slots[0][0] < oldest_slot:
+            self.total -= self.slots.popleft()[1]
+        return self.total
+
+class RateLimits:
+    """Limites d'un serveur : valeurs par défaut (variables d'environnement) et réglages propres"""
+    FIELDS = ("user_per_minute", "user_burst", "channel_per_minute", "channel_burst",
+              "guild_per_minute", "guild_burst", "user_token_quota", "guild_token_quota")
+    __slots__ = FIELDS
+
+    def __init__(self, overrides: Optional[dict] = None):
+        self.user_per_minute = RATE_USER_PER_MINUTE
+        self.user_burst = RATE_USER_BURST
+        self.channel_per_minute = RATE_CHANNEL_PER_MINUTE
+        self.channel_burst = RATE_CHANNEL_BURST
+        self.guild_per_minute = RATE_GUILD_PER_MINUTE
+        self.guild_burst = RATE_GUILD_BURST
+        self.user_token_quota = LLM_USER_TOKEN_QUOTA
+        self.guild_token_quota = LLM_GUILD_TOKEN_QUOTA
+        for name, value in (overrides or {}).items():
+            if name in self.FIELDS:
+                setattr(self, name, value)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+# Consommateur des appels à l'IA en cours (utilisateurs, serveur), lu par TokenUsage.record
+_llm_consumer: contextvars.ContextVar = contextvars.ContextVar("llm_consumer", default=None)
+
+class RateLimiter:
+    """Seaux à jetons par utilisateur, salon et serveur, et quotas glissants de tokens IA.
+
+    `check()` est appelé sur le chemin de on_message avant tout appel à l'API :
+    quelques recherches dans des dictionnaires, sans I/O. Les tokens réellement
+    consommés (champ `usage` de l'API, sinon estimation) sont imputés par
+    TokenUsage.record aux utilisateurs déclarés avec `consumer()`. Avec le
+    répondeur local, un quota épuisé ne refuse plus les messages : `over_quota()`
+    fait servir des réponses locales à la place des appels à l'API. L'état est
+    propre à chaque processus : un serveur Discord étant toujours servi par le
+    même shard, ses limites restent cohérentes en multi-workers.
+    """
+
+    SCOPE_SLOTS = 60  # Tranches par fenêtre de quota
+    SWEEP_INTERVAL = 60.0  # Secondes entre deux nettoyages des compteurs inactifs
+    BUCKET_IDLE_TTL = 600.0  # Un seau inactif depuis 10 min est oublié (il serait plein)
+
+    def __init__(self, path: str = RATE_LIMITS_PATH, window: float = LLM_QUOTA_WINDOW,
+                 enabled: bool = RATE_LIMIT_ENABLED, quota_fallback: bool = LOCAL_FALLBACK_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self.quota_fallback = quota_fallback  # Quota épuisé : réponses locales au lieu d'un refus
+        self.slot_seconds = max(1.0, window / self.SCOPE_SLOTS)
+        self._overrides: Dict[str, dict] = {}  # Réglages par serveur (clé : identifiant en texte, comme en JSON)
+        self._limits: Dict[Optional[int], RateLimits] = {}
+        self._buckets: Dict[str, Dict[int, TokenBucket]] = {"user": {}, "channel": {}, "guild": {}}
+        self._usage: Dict[str, Dict[int, RollingCounter]] = {"user": {}, "guild": {}}
+        self._warned: Dict[Tuple[str, int], float] = {}  # Avertissement envoyé jusqu'à cette échéance
+        self._last_sweep = time.monotonic()
+        self.throttled: Dict[str, int] = defaultdict(int)
+
+    # Réglages par serveur ------------------------------------------------
+    def open(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self._overrides = json.load(f)
+        except FileNotFoundError:
+            self._overrides = {}
+        except (OSError, ValueError) as e:
+            print(f"[🚦] Réglages de limites illisibles ({e}) : valeurs par défaut")
+            self._overrides = {}
+        self._limits.clear()
+
+    def limits(self, guild_id: Optional[int]) -> RateLimits:
+        limits = self._limits.get(guild_id)
+        if limits is None:
+            limits = self._limits[guild_id] = RateLimits(self._overrides.get(str(guild_id)))
+        return limits
+
+    def configure(self, guild_id: int, **values) -> RateLimits:
+        """Modifier les limites d'un serveur (None = inchangé) et les enregistrer"""
+        overrides = self._overrides.setdefault(str(guild_id), {})
+        overrides.update({name: value for name, value in values.items()
+                          if value is not None and name in RateLimits.FIELDS})
+        self._save()
+        self._limits.pop(guild_id, None)
+        return self.limits(guild_id)
+
+    def reset(self, guild_id: int) -> RateLimits:
+        """Revenir aux valeurs par défaut pour ce serveur"""
+        if self._overrides.pop(str(guild_id), None) is not None:
+            self._save()
+        self._limits.pop(guild_id, None)
+        return self.limits(guild_id)
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._overrides, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    # Contrôle des messages ------------------------------------------------
+    def check(self, user_id: int, channel_id: int, guild_id: Optional[int]) -> Optional[Tuple[str, float, bool]]:
+        """Admettre un message destiné à l'IA.
+
+        Renvoie None s'il est admis (un jeton est pris dans chaque seau), sinon
+        (portée dépassée, secondes avant de réessayer, premier refus de l'épisode).
+        Seul le premier refus doit être signalé à l'utilisateur, pour que la
+        limitation ne devienne pas elle-même une source de spam.
+        """
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        if now - self._last_sweep >= self.SWEEP_INTERVAL:
+            self._sweep(now)
+        limits = self.limits(guild_id)
+
+        if not self.quota_fallback:
+            for scope, key, quota in (("user", user_id, limits.user_token_quota),
+                                      ("guild", guild_id, limits.guild_token_quota)):
+                retry_after = self._quota_exceeded(scope, key, quota, now)
+                if retry_after is not None:
+                    return self._deny(f"{scope}_quota", key, retry_after, now)
+
+        buckets = []
+        for scope, key, per_minute, burst in (("user", user_id, limits.user_per_minute, limits.user_burst),
+                                              ("channel", channel_id, limits.channel_per_minute, limits.channel_burst),
+                                              ("guild", guild_id, limits.guild_per_minute, limits.guild_burst)):
+            if per_minute <= 0 or key is None:
+                continue
+            rate = per_minute / 60
+            burst = max(1.0, burst)
+            bucket = self._buckets[scope].get(key)
+            if bucket is None:
+                bucket = self._buckets[scope][key] = TokenBucket(burst, now)
+            if bucket.refill(rate, burst, now) < 1:
+                return self._deny(scope, key, (1 - bucket.tokens) / rate, now)
+            buckets.append(bucket)
+        # Jetons pris seulement si tous les niveaux acceptent
+        for bucket in buckets:
+            bucket.tokens -= 1
+        return None
+
+    def _deny(self, scope: str, key: int, retry_after: float, now: float) -> Tuple[str, float, bool]:
+        self.throttled[scope] += 1
+        RATE_LIMITED.inc(scope)
+        notify = self._warned.get((scope, key), 0.0) <= now
+        if notify:
+            self._warned[(scope, key)] = now + retry_after
+        return scope, retry_after, notify
+
+    def _quota_exceeded(self, scope: str, key: Optional[int], quota: int, now: float) -> Optional[float]:
+        """Secondes avant que le quota de tokens de `key` se libère, ou None s'il reste du quota"""
+        counter = self._usage[scope].get(key) if quota > 0 and key is not None else None
+        if counter is None or counter.expire(self._slot(now) - self.SCOPE_SLOTS + 1) < quota:
+            return None
+        return max(1.0, (counter.slots[0][0] + self.SCOPE_SLOTS) * self.slot_seconds - now)
+
+    def over_quota(self) -> Optional[Tuple[str, float]]:
+        """Quota épuisé par le consommateur en cours (voir consumer()) : (portée, secondes) ou None.
+
+        Une scène de groupe ne bascule que si tous ses participants ont épuisé leur quota.
+        """
+        consumer = _llm_consumer.get()
+        if not self.enabled or consumer is None:
+            return None
+        user_ids, guild_id = consumer
+        if not self.quota_fallback:
+            return None  # Quotas appliqués par check() : message refusé avant l'appel
+        now = time.monotonic()
+        limits = self.limits(guild_id)
+        verdict = None
+        retry_after = self._quota_exceeded("guild", guild_id, limits.guild_token_quota, now)
+        if retry_after is not None:
+            verdict = ("guild_quota", retry_after)
+        elif user_ids:
+            waits = [self._quota_exceeded("user", user_id, limits.user_token_quota, now) for user_id in user_ids]
+            if None not in waits:
+                verdict = ("user_quota", min(waits))
+        if verdict is not None:
+            self.throttled[verdict[0]] += 1
+            RATE_LIMITED.inc(verdict[0])
+        return verdict
+
+    def _slot(self, now: float) -> int:
+        return int(now // self.slot_seconds)
+
+    def _sweep(self, now: float):
+        """Oublier les seaux, compteurs et avertissements devenus inutiles"""
+        self._last_sweep = now
+        for buckets in self._buckets.values():
+            for key in [key for key, bucket in buckets.items() if now - bucket.updated >= self.BUCKET_IDLE_TTL]:
+                del buckets[key]
+        oldest = self._slot(now) - self.SCOPE_SLOTS + 1
+        for counters in self._usage.values():
+            for key in [key for key, counter in counters.items() if not counter.expire(oldest)]:
+                del counters[key]
+        for key in [key for key, until in self._warned.items() if until <= now]:
+            del self._warned[key]
+
+    # Comptage des tokens ------------------------------------------------
+    @contextmanager
+    def consumer(self, user_ids, guild_id: Optional[int]):
+        """Imputer les tokens des appels à l'IA faits dans ce bloc à ces utilisateurs et à ce serveur"""
+        token = _llm_consumer.set((tuple(user_ids), guild_id))
+        try:
+            yield
+        finally:
+            _llm_consumer.reset(token)
+
+    def charge(self, tokens: int):
+        consumer = _llm_consumer.get()
+        if consumer is None or tokens <= 0:
+            return
+        user_ids, guild_id = consumer
+        slot = self._slot(time.monotonic())
+        if user_ids:
+            share = -(-tokens // len(user_ids))  # Scène de groupe : partage entre les participants du tour
+            for user_id in user_ids:
+                self._counter("user", user_id).add(share, slot)
+        if guild_id is not None:
+            self._counter("guild", guild_id).add(tokens, slot)
+
+    def _counter(self, scope: str, key: int) -> RollingCounter:
+        counter = self._usage[scope].get(key)
+        if counter is None:
+            counter = self._usage[scope][key] = RollingCounter()
+        return counter
+
+    def top(self, scope: str, limit: int = 10) -> List[Tuple[int, int]]:
+        """Plus gros consommateurs de tokens sur la fenêtre : [(identifiant, tokens)]"""
+        oldest = self._slot(time.monotonic()) - self.SCOPE_SLOTS + 1
+        usage = ((key, counter.expire(oldest)) for key, counter in self._usage[scope].items())
+        return heapq.nlargest(limit, (item for item in usage if item[1] > 0), key=lambda item: item[1])
+
+    def usage(self, scope: str, key: int) -> int:
+        counter = self._usage[scope].get(key)
+        return counter.expire(self._slot(time.monotonic()) - self.SCOPE_SLOTS + 1) if counter else 0
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "window_seconds": self.slot_seconds * self.SCOPE_SLOTS,
+            "throttled": dict(self.throttled),
+            "tracked_buckets": {scope: len(buckets) for scope, buckets in self._buckets.items()},
+            "configured_guilds": len(self._overrides),
+            "top_users": self.top("user", 5),
+            "top_guilds": self.top("guild", 5),
+        }
+
+rate_limiter = RateLimiter()
+
+def format_wait(seconds: float) -> str:
+    if seconds < 60:
+        return f"{max(1, int(seconds + 0.999))} s"
+    return f"{int(seconds / 60 + 0.999)} min"
+
+def throttled_reply(scope: str, retry_after: float) -> str:
+    """Réponse d'Audrey à un message refusé par les limites (aucun appel à l'API)"""
+    wait = format_wait(retry_after)
+    if scope == "user":
+        return f"⏳ Doucement, chère amie... Vos paroles vont plus vite que mes visions. Accordez-moi {wait}."
+    if scope in ("channel", "guild"):
+        return f"⏳ Tant de voix s'élèvent ici en même temps... Laissez-moi {wait} pour reprendre mon souffle."
+    return f"🌙 Mes visions se sont épuisées pour le moment. Elles reviendront d'ici {wait}, chère amie."
+
+# -----------------------------
+# Cache des réponses
+# -----------------------------
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_SPACES = re.compile(r"\s+")
+
+def normalize_prompt(prompt: str) -> str:
+    """Forme canonique d'un message : minuscules, sans accents, mentions ni ponctuation"""
+    text = re.sub(r"<[@#][!&]?\d+>", " ", prompt)
+    text = unicodedata.normalize("NFKD", text.casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = _PUNCTUATION.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+class ResponseCache:
+    """Cache LRU des réponses d'Audrey aux messages sans contexte.
+
+    La clé combine le message normalisé, la persona, le modèle et la température.
+    Chaque clé garde jusqu'à `variants` réponses différentes : tant que la réserve
+    n'est pas pleine, on interroge l'API pour l'enrichir, ensuite on sert l'une
+    d'elles au hasard pour que les réponses ne semblent pas figées. Un second niveau
+    optionnel sur disque (SQLite) survit aux redémarrages.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL,
+                 variants: int = RESPONSE_CACHE_VARIANTS, db_path: str = RESPONSE_CACHE_DB_PATH):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.variants = variants
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # {clé: (créée_à, [réponses])}
+        self._db = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache") if db_path else None
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    @staticmethod
+    def key(prompt: str, model: str = ROUTWAY_MODEL, temperature: float = LLM_TEMPERATURE) -> str:
+        raw = "\x1f".join((normalize_prompt(prompt), library.persona, model, f"{temperature:g}"))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self):
+        if not self.db_path or self._db is not None:
+            return
+        await self._run(self._open_db)
+
+    def _open_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created_at REAL NOT NULL, variants TEXT NOT NULL)")
+        self._db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        self._db.commit()
+
+    def _disk_get(self, key: str):
+        row = self._db.execute("SELECT created_at, variants FROM responses WHERE key = ?", (key,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _disk_put(self, key: str, created_at: float, variants: List[str]):
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO responses (key, created_at, variants) VALUES (?, ?, ?)",
+                             (key, created_at, json.dumps(variants, ensure_ascii=False)))
+
+    async def _entry(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None and self._db is not None:
+            entry = await self._run(self._disk_get, key)
+            if entry is not None:
+                self.disk_hits += 1
+                self._store(key, entry)
+        if entry is not None and time.time() - entry[0] > self.ttl:
+            self._entries.pop(key, None)
+            return None
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _store(self, key: str, entry: tuple):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Une réponse en cache, ou None s'il faut (encore) interroger l'API"""
+        entry = await self._entry(key)
+        if entry is None or len(entry[1]) < self.variants:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return random.choice(entry[1])
+
+    async def put(self, key: str, response: str):
+        entry = await self._entry(key)
+        if entry is None:
+            entry = (time.time(), [])
+        variants = entry[1]
+        if response in variants or len(variants) >= self.variants:
+            return
+        variants.append(response)
+        self._store(key, entry)
+        if self._db is not None:
+            await self._run(self._disk_put, key, entry[0], list(variants))
+
+    async def close(self):
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+response_cache = ResponseCache()
+
+def has_context(user_id: int = None) -> bool:
+    """La réponse dépend-elle d'échanges précédents (historique ou résumé d'une conversation active) ?"""
+    conversation = conversations.get(user_id) if user_id else None
+    return conversation is not None and conversation.active and bool(conversation.history or conversation.summary)
+
+def response_cache_key(prompt: str, user_id: int = None) -> Optional[str]:
+    """Clé de cache si la réponse ne dépend pas d'un contexte de conversation, sinon None"""
+    if not RESPONSE_CACHE_ENABLED or len(prompt) > RESPONSE_CACHE_MAX_PROMPT_CHARS:
+        return None
+    if has_context(user_id):
+        return None
+    if not normalize_prompt(prompt):
+        return None
+    return ResponseCache.key(prompt)
+
+# -----------------------------
+# Répondeur local (repli sans API)
+# -----------------------------
+_STOPWORDS = frozenset(
+    "le la les l un une des du de d et ou a au aux en y je j tu il elle on nous vous ils elles me m te t se s "
+    "ce c ca cela cet cette ces est es suis sont etes que qu qui quoi ne n pas plus mon ma mes ton ta tes son sa "
+    "ses votre vos notre nos leur leurs moi toi lui pour par sur dans avec mais donc si tres bien oui non".split())
+
+_SUFFIXES = ("ements", "ement", "ations", "ation", "euses", "euse", "eux", "ees", "ee", "ez", "er", "es", "e", "s", "x")
+
+def stem(word: str) -> str:
+    """Racine grossière d'un mot français (pluriels, féminins, infinitifs) : « tirez », « tirer » → « tir »"""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+def prompt_terms(normalized: str) -> Tuple[str, ...]:
+    """Termes d'un message normalisé : racines des mots porteurs de sens et paires de racines consécutives"""
+    words = [stem(word) for word in normalized.split() if len(word) > 1 and word not in _STOPWORDS]
+    return tuple(dict.fromkeys(words + [f"{a} {b}" for a, b in zip(words, words[1:])]))
+
+class LocalResponder:
+    """Réponses d'Audrey sans l'API : plus proche voisin TF-IDF parmi ses réponses passées.
+
+    Chaque réponse obtenue de l'API est indexée avec le message qui l'a demandée.
+    Pour un nouveau message, les réponses passées sont classées par similarité
+    cosinus TF-IDF de leurs messages (mots et paires de mots, index inversé en
+    mémoire) et l'une des meilleures est servie si elle dépasse le seuil. Le tout
+    prend quelques millisecondes de CPU, sans I/O : de quoi rester dans le
+    personnage pendant une panne de l'API, quand un quota est épuisé, ou pour les
+    messages simples (LOCAL_CHEAP_PROMPTS). Le corpus est borné aux réponses les
+    plus récentes et conservé dans SQLite (messages normalisés, sans identifiants).
+    """
+    MAX_PROMPT_CHARS = 500  # Messages plus longs : trop particuliers pour resservir leur réponse
+    NORM_REFRESH = 0.1  # Normes recalculées quand la taille du corpus a varié de 10 % (l'IDF a changé)
+    TOP = 3  # Réponses tirées au hasard parmi les meilleures, pour varier
+
+    def __init__(self, db_path: str = LOCAL_FALLBACK_DB_PATH, max_replies: int = LOCAL_FALLBACK_MAX_REPLIES,
+                 min_score: float = LOCAL_FALLBACK_MIN_SCORE, enabled: bool = LOCAL_FALLBACK_ENABLED or LOCAL_CHEAP_PROMPTS):
+        self.db_path = db_path
+        self.max_replies = max(1, max_replies)
+        self.min_score = min_score
+        self.enabled = enabled
+        self._docs: "OrderedDict[int, tuple]" = OrderedDict()  # {id: (termes, réponse, empreinte)}
+        self._postings: Dict[str, set] = {}  # {terme: {id des réponses dont le message le contient}}
+        self._norms: Dict[int, float] = {}
+        self._norms_size = 0
+        self._seen: set = set()  # Empreintes (message, réponse) déjà indexées
+        self._next_id = 1
+        self._db = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-replies") if db_path else None
+        self.learned = 0
+        self.misses = 0
+        self.served: Dict[str, int] = defaultdict(int)
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self):
+        if not self.enabled or not self.db_path or self._db is not None:
+            return
+        rows = await self._run(self._open_db)
+        for doc_id, normalized, reply in rows:
+            self._index(doc_id, normalized, reply)
+        print(f"[🪞] Répondeur local prêt ({len(self._docs)} réponse(s), {len(self._postings)} terme(s))")
+
+    def _open_db(self) -> list:
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS replies (id INTEGER PRIMARY KEY, prompt TEXT NOT NULL, reply TEXT NOT NULL)")
+        rows = self._db.execute("SELECT id, prompt, reply FROM replies ORDER BY id DESC LIMIT ?",
+                                (self.max_replies,)).fetchall()
+        rows.reverse()
+        if rows:
+            with self._db:
+                self._db.execute("DELETE FROM replies WHERE id < ?", (rows[0][0],))
+        return rows
+
+    def _disk_put(self, doc_id: int, normalized: str, reply: str, oldest: int):
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO replies (id, prompt, reply) VALUES (?, ?, ?)", (doc_id, normalized, reply))
+            self._db.execute("DELETE FROM replies WHERE id < ?", (oldest,))
+
+    def _index(self, doc_id: int, normalized: str, reply: str) -> bool:
+        fingerprint = hash((normalized, reply))
+        terms = prompt_terms(normalized)
+        if not terms or fingerprint in self._seen:
+            return False
+        self._seen.add(fingerprint)
+        self._docs[doc_id] = (terms, reply, fingerprint)
+        for term in terms:
+            self._postings.setdefault(term, set()).add(doc_id)
+        self._next_id = max(self._next_id, doc_id + 1)
+        while len(self._docs) > self.max_replies:
+            old_id, (old_terms, _, old_fingerprint) = self._docs.popitem(last=False)
+            self._seen.discard(old_fingerprint)
+            self._norms.pop(old_id, None)
+            for term in old_terms:
+                postings = self._postings[term]
+                postings.discard(old_id)
+                if not postings:
+                    del self._postings[term]
+        return True
+
+    async def learn(self, prompt: str, reply: str):
+        """Indexer une réponse de l'API (hors scènes et messages générés, sans mentions)"""
+        if not self.enabled or len(prompt) > self.MAX_PROMPT_CHARS or prompt.startswith("[") or "<@" in reply:
+            return
+        doc_id = self._next_id
+        normalized = normalize_prompt(prompt)
+        if not self._index(doc_id, normalized, reply):
+            return
+        self.learned += 1
+        if self._db is not None:
+            await self._run(self._disk_put, doc_id, normalized, reply, next(iter(self._docs)))
+
+    def _idf(self, term: str) -> float:
+        return math.log((len(self._docs) + 1) / (len(self._postings.get(term, ())) + 1)) + 1.0
+
+    def _norm(self, doc_id: int) -> float:
+        size = len(self._docs)
+        if abs(size - self._norms_size) > self._norms_size * self.NORM_REFRESH:
+            self._norms.clear()
+            self._norms_size = size
+        norm = self._norms.get(doc_id)
+        if norm is None:
+            norm = self._norms[doc_id] = math.sqrt(sum(self._idf(term) ** 2 for term in self._docs[doc_id][0]))
+        return norm
+
+    def match(self, prompt: str) -> List[Tuple[float, str]]:
+        """Meilleures réponses passées pour ce message : [(similarité, réponse)], de la plus proche"""
+        started = time.perf_counter()
+        terms = prompt_terms(normalize_prompt(prompt))
+        weights = {term: self._idf(term) for term in terms}
+        query_norm = math.sqrt(sum(weight * weight for weight in weights.values()))
+        # Un terme présent dans plus de la moitié du corpus discrimine peu et coûte cher à parcourir
+        common = max(50, len(self._docs) // 2)
+        scores: Dict[int, float] = defaultdict(float)
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings and len(postings) <= common:
+                for doc_id in postings:
+                    scores[doc_id] += weight * weight
+        ranked = heapq.nlargest(self.TOP, ((score / (query_norm * self._norm(doc_id)), doc_id)
+                                           for doc_id, score in scores.items()))
+        self.lookups += 1
+        self.lookup_seconds += time.perf_counter() - started
+        return [(round(score, 3), self._docs[doc_id][1]) for score, doc_id in ranked]
+
+    def reply(self, prompt: str, reason: str, min_score: Optional[float] = None) -> Optional[str]:
+        """Une réponse passée assez proche (tirée parmi les meilleures), ou None"""
+        ranked = self.match(prompt) if self._docs else []
+        threshold = self.min_score if min_score is None else min_score
+        if ranked:
+            threshold = max(threshold, ranked[0][0] * 0.9)
+        candidates = [reply for score, reply in ranked if score >= threshold]
+        if not candidates:
+            self.misses += 1
+            return None
+        self.served[reason] += 1
+        return random.choice(candidates)
+
+    async def close(self):
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "replies": len(self._docs),
+            "terms": len(self._postings),
+            "learned": self.learned,
+            "served": dict(self.served),
+            "misses": self.misses,
+            "avg_lookup_ms": round(self.lookup_seconds / self.lookups * 1000, 3) if self.lookups else 0.0,
+        }
+
+local_responder = LocalResponder()
+
+def local_reply(prompt: str, reason: str) -> Optional[str]:
+    """Réponse du répondeur local en repli (panne, quota, pas de clé), ou None"""
+    if not LOCAL_FALLBACK_ENABLED or not prompt:
+        return None
+    return local_responder.reply(prompt, reason)
+
+def cheap_local_reply(prompt: str, user_id: int = None) -> Optional[str]:
+    """Réponse locale à un message simple, même API disponible (LOCAL_CHEAP_PROMPTS), ou None"""
+    if not LOCAL_CHEAP_PROMPTS or len(prompt) > LOCAL_CHEAP_MAX_CHARS or has_context(user_id):
+        return None
+    return local_responder.reply(prompt, "cheap", LOCAL_CHEAP_MIN_SCORE)
+
+# -----------------------------
+# Mini-jeux LOTM
+# -----------------------------
+RIDDLE_DURATION = 30  # Secondes pour répondre à une énigme
+
+_ARTICLES = frozenset({"le", "la", "les", "l", "un", "une", "des", "du", "de", "d"})
+
+def normalize_answer(text: str) -> str:
+    """Forme canonique d'une réponse d'énigme : sans casse, accents, ponctuation ni articles"""
+    return " ".join(word for word in normalize_prompt(text).split() if word not in _ARTICLES)
+
+# -----------------------------
+# Sessions d'énigmes
+# -----------------------------
+class RiddleSession:
+    __slots__ = ("channel_id", "user_id", "riddle_index", "answer", "normalized_answer", "expires_at", "send")
+
+    def __init__(self, channel_id: int, user_id: int, riddle_index: int, expires_at: float, send=None):
+        self.channel_id = channel_id
+        self.user_id = user_id
+        self.riddle_index = riddle_index
+        # Réponse figée au moment de l'énigme (un rechargement des contenus ne la change pas)
+        self.answer = library.riddles[riddle_index]["answer"]
+        self.normalized_answer = normalize_answer(self.answer)
+        self.expires_at = expires_at
+        self.send = send  # None pour une énigme reprise après redémarrage (envoi via le salon)
+
+class RiddleManager:
+    """Énigmes en cours, indexées par (salon, utilisateur).
+
+    Remplace un `bot.wait_for` par énigme : discord.py évalue chaque prédicat en
+    attente à chaque message, alors qu'ici on_message trouve la session en O(1).
+    Les expirations sont gérées par une seule tâche et un tas trié par échéance.
+    Les sessions sont enregistrées dans le stockage des conversations et reprises
+    au redémarrage.
+    """
+
+    def __init__(self, bot, duration: float = RIDDLE_DURATION):
+        self.bot = bot
+        self.duration = duration
+        self._sessions: Dict[Tuple[int, int], RiddleSession] = {}
+        self._heap: List[tuple] = []  # (expires_at, ordre, session)
+        self._counter = 0
+        self._wakeup = asyncio.Event()
+        self._timer = None
+        self.answered = 0
+        self.solved = 0
+        self.expired = 0
+        self.resumed = 0
+
+    def start(self, channel_id: int, user_id: int, riddle_index: int, send) -> RiddleSession:
+        """Poser une énigme ; `send(content)` enverra le verdict"""
+        session = RiddleSession(channel_id, user_id, riddle_index, time.time() + self.duration, send)
+        self._add(session)
+        conversations.save_riddle(channel_id, user_id, riddle_index, session.expires_at)
+        return session
+
+    async def resume(self):
+        """Reprendre les énigmes encore valides enregistrées avant un redémarrage"""
+        for channel_id, user_id, riddle_index, expires_at in await conversations.load_riddles():
+            if (channel_id, user_id) not in self._sessions and 0 <= riddle_index < len(library.riddles):
+                self._add(RiddleSession(channel_id, user_id, riddle_index, expires_at))
+                self.resumed += 1
+
+    def _add(self, session: RiddleSession):
+        # Une nouvelle énigme remplace la précédente ; son entrée dans le tas devient caduque
+        self._sessions[(session.channel_id, session.user_id)] = session
+        self._counter += 1
+        heapq.heappush(self._heap, (session.expires_at, self._counter, session))
+        if self._heap[0][2] is session:
+            self._wakeup.set()
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._expire_loop())
+
+    def handle(self, message) -> bool:
+        """Traiter un message s'il répond à une énigme en cours (verdict envoyé en tâche de fond)"""
+        session = self._sessions.pop((message.channel.id, message.author.id), None)
+        if session is None:
+            return False
+        self.answered += 1
+        if f" {session.normalized_answer} " in f" {normalize_answer(message.content)} ":
+            self.solved += 1
+            text = "✨ Votre esprit est aussi brillant que l'étoile du matin. Vous avez percé le mystère !"
+        else:
+            text = f"🕊️ La réponse était : **{session.answer}**. La vérité se cache parfois dans l'ombre..."
+        asyncio.create_task(self._finish(session, text))
+        return True
+
+    async def _expire_loop(self):
+        while True:
+            now = time.time()
+            while self._heap and self._heap[0][0] <= now:
+                session = heapq.heappop(self._heap)[2]
+                key = (session.channel_id, session.user_id)
+                if self._sessions.get(key) is session:
+                    del self._sessions[key]
+                    self.expired += 1
+                    asyncio.create_task(self._finish(
+                        session, f"⏳ Le temps des étoiles est passé... La réponse était : **{session.answer}**"))
+            self._wakeup.clear()
+            delay = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _finish(self, session: RiddleSession, text: str):
+        send = session.send
+        if send is None:
+            await self.bot.wait_until_ready()
+            channel = self.bot.get_channel(session.channel_id)
+            if channel is None:
+                return  # Salon géré par un autre worker : il s'en charge
+            send = channel.send
+        conversations.end_riddle(session.channel_id, session.user_id)
+        try:
+            await self.bot.outbound.send(session.channel_id, send, text, mergeable=True)
+        except discord.HTTPException as e:
+            print(f"[🕯️] Verdict d'énigme non envoyé : {e}")
+
+    async def close(self):
+        # Les sessions restent enregistrées : elles seront reprises au redémarrage
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "active": len(self._sessions),
+            "answered": self.answered,
+            "solved": self.solved,
+            "expired": self.expired,
+            "resumed": self.resumed,
+        }
+
+# -----------------------------
+# Client HTTP partagé (pool de connexions)
+# -----------------------------
+class RoutwayHTTPPool:
+    """Session aiohttp unique et durable, partagée par tous les appels à l'API Routway.
+
+    Les connexions TCP/TLS restent ouvertes (keep-alive) et sont réutilisées d'un
+    message à l'autre au lieu d'être renégociées à chaque réponse d'Audrey.
+    """
+
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 keepalive_timeout: float = HTTP_KEEPALIVE_TIMEOUT, dns_cache_ttl: int = HTTP_DNS_CACHE_TTL,
+                 request_timeout: float = HTTP_REQUEST_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.request_timeout = request_timeout
+        self._session = None
+        self._connector = None
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    async def start(self):
+        """Créer la session (idempotent)"""
+        if self._session is not None and not self._session.closed:
+            return self._session
+
+        self._connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+        )
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(self._on_request_start)
+        trace.on_connection_create_end.append(self._on_connection_create)
+        trace.on_connection_reuseconn.append(self._on_connection_reuse)
+
+        self._session = aiohttp.ClientSession(
+            connector=self._connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+            trace_configs=[trace],
+        )
+        print(f"[🌐] Pool HTTP prêt (limite {self.limit}, {self.limit_per_host}/hôte, keep-alive {self.keepalive_timeout:g}s)")
+        return self._session
+
+    async def session(self) -> aiohttp.ClientSession:
+        """Session active, recréée si elle a été fermée"""
+        if self._session is None or self._session.closed:
+            await self.start()
+        return self._session
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            print("[🌐] Pool HTTP fermé")
+        self._session = None
+        self._connector = None
+
+    async def _on_request_start(self, session, ctx, params):
+        self.requests += 1
+
+    async def _on_connection_create(self, session, ctx, params):
+        self.connections_created += 1
+
+    async def _on_connection_reuse(self, session, ctx, params):
+        self.connections_reused += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Statistiques du pool (connexions actives, inactives, réutilisées...)"""
+        connector = self._connector
+        in_use = len(getattr(connector, "_acquired", ())) if connector else 0
+        idle = sum(len(conns) for conns in getattr(connector, "_conns", {}).values()) if connector else 0
+        return {
+            "open": int(self._session is not None and not self._session.closed),
+            "limit": self.limit,
+            "limit_per_host": self.limit_per_host,
+            "in_use": in_use,
+            "idle": idle,
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+        }
+
+# -----------------------------
+# File d'attente des requêtes IA
+# -----------------------------
+PRIORITY_INTERACTIVE = 0  # Messages et commandes des utilisateurs
+PRIORITY_BACKGROUND = 10  # Tâches de fond (passent après les utilisateurs)
+
+class SchedulerFull(Exception):
+    """La file d'attente est pleine : la requête est refusée immédiatement"""
+
+class RequestExpired(Exception):
+    """La requête a attendu trop longtemps dans la file et a été abandonnée"""
+
+class _Waiter:
+    __slots__ = ("future", "guild_id", "user_id", "enqueued_at")
+
+    def __init__(self, future, guild_id, user_id):
+        self.future = future
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.enqueued_at = time.monotonic()
+
+class RequestScheduler:
+    """Limiteur de concurrence devant l'API Routway.
+
+    - plafond global et plafond par serveur d'appels simultanés ;
+    - file bornée, ordonnée par priorité puis en tourniquet entre utilisateurs
+      (un utilisateur bavard ne passe pas devant les autres) ;
+    - contre-pression explicite : SchedulerFull si la file est pleine,
+      RequestExpired si l'attente dépasse max_wait.
+    """
+
+    def __init__(self, max_concurrent: int = LLM_MAX_CONCURRENCY, per_guild: int = LLM_MAX_CONCURRENCY_PER_GUILD,
+                 max_queue: int = LLM_QUEUE_SIZE, max_wait: float = LLM_QUEUE_MAX_WAIT):
+        self.max_concurrent = max_concurrent
+        self.per_guild = per_guild
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._active_by_guild: Dict[Optional[int], int] = defaultdict(int)
+        # {priorité: OrderedDict{user_id: deque[_Waiter]}}
+        self._queues: Dict[int, "OrderedDict[int, deque]"] = {}
+        self.depth = 0
+        # Métriques
+        self.peak_depth = 0
+        self.granted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._recent_waits = deque(maxlen=500)
+
+    def _has_capacity(self, guild_id) -> bool:
+        if self.active >= self.max_concurrent:
+            return False
+        return guild_id is None or self._active_by_guild[guild_id] < self.per_guild
+
+    def _grant(self, guild_id, waited: float = 0.0):
+        self.active += 1
+        if guild_id is not None:
+            self._active_by_guild[guild_id] += 1
+        self.granted += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        self._recent_waits.append(waited)
+
+    async def acquire(self, guild_id: Optional[int], user_id: int, priority: int = PRIORITY_INTERACTIVE):
+        if self.depth == 0 and self._has_capacity(guild_id):
+            self._grant(guild_id)
+            return
+        if self.depth >= self.max_queue:
+            self.rejected += 1
+            raise SchedulerFull()
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), guild_id, user_id)
+        users = self._queues.setdefault(priority, OrderedDict())
+        users.setdefault(user_id, deque()).append(waiter)
+        self.depth += 1
+        self.peak_depth = max(self.peak_depth, self.depth)
+        if self.active < self.max_concurrent:
+            # File bloquée par des serveurs saturés : ce waiter peut passer sans attendre une libération
+            self._dispatch()
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if self._discard(priority, waiter):
+                self.expired += 1
+                raise RequestExpired()
+            # Le créneau a été attribué au tout dernier moment : on le garde
+        except asyncio.CancelledError:
+            if not self._discard(priority, waiter):
+                self.release(guild_id)
+            raise
+
+    def _discard(self, priority: int, waiter: _Waiter) -> bool:
+        """Retirer un waiter encore en file. Renvoie False s'il avait déjà obtenu son créneau."""
+        if waiter.future.done():
+            return False
+        users = self._queues.get(priority, {})
+        queue = users.get(waiter.user_id)
+        if queue is not None:
+            queue.remove(waiter)
+            if not queue:
+                del users[waiter.user_id]
+        self.depth -= 1
+        waiter.future.cancel()
+        return True
+
+    def release(self, guild_id: Optional[int]):
+        self.active -= 1
+        if guild_id is not None:
+            self._active_by_guild[guild_id] -= 1
+            if self._active_by_guild[guild_id] <= 0:
+                del self._active_by_guild[guild_id]
+        self._dispatch()
+
+    def _dispatch(self):
+        """Attribuer les créneaux libres : priorité d'abord, puis tourniquet entre utilisateurs"""
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            for user_id in list(users):
+                if self.active >= self.max_concurrent:
+                    return
+                queue = users[user_id]
+                waiter = queue[0]
+                if not self._has_capacity(waiter.guild_id):
+                    continue  # Serveur saturé : on laisse passer les autres
+                queue.popleft()
+                self.depth -= 1
+                # L'utilisateur servi repasse en fin de tourniquet
+                del users[user_id]
+                if queue:
+                    users[user_id] = queue
+                self._grant(waiter.guild_id, time.monotonic() - waiter.enqueued_at)
+                waiter.future.set_result(None)
+            if not users:
+                del self._queues[priority]
+
+    @asynccontextmanager
+    async def slot(self, guild_id: Optional[int], user_id: int, priority: int = PRIORITY_INTERACTIVE):
+        await self.acquire(guild_id, user_id, priority)
+        try:
+            yield
+        finally:
+            self.release(guild_id)
+
+    def stats(self) -> Dict[str, float]:
+        waits = sorted(self._recent_waits)
+
+        def pct(p):
+            return waits[min(len(waits) - 1, int(p * len(waits)))] if waits else 0.0
+
+        return {
+            "active": self.active,
+            "queue_depth": self.depth,
+            "peak_depth": self.peak_depth,
+            "granted": self.granted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "wait_avg": self.wait_total / self.granted if self.granted else 0.0,
+            "wait_p50": pct(0.50),
+            "wait_p95": pct(0.95),
+            "wait_max": self.wait_max,
+        }
+
+# -----------------------------
+# Client Routway résilient (réessais, disjoncteur, repli de modèle)
+# -----------------------------
+class UpstreamError(Exception):
+    """L'API n'a pas pu fournir de réponse"""
+
+    def __init__(self, message: str, status: int = None):
+        super().__init__(message)
+        self.status = status
+
+class UpstreamTimeout(UpstreamError):
+    """L'API n'a pas répondu à temps"""
+
+class CircuitOpen(UpstreamError):
+    """Tous les disjoncteurs sont ouverts : on n'essaie même pas d'appeler l'API"""
+
+class CircuitBreaker:
+    """Disjoncteur : après `failure_threshold` échecs consécutifs, les appels sont
+    refusés immédiatement pendant `reset_timeout` secondes, puis une seule requête
+    de test est autorisée (semi-ouvert) pour décider de refermer ou non.
+
+    Une requête de test terminée sans verdict (annulée, abandonnée) libère sa
+    place avec `release()` ; à défaut, elle est tenue pour perdue au bout de
+    `reset_timeout` secondes et une autre est autorisée."""
+    CLOSED = "fermé"
+    OPEN = "ouvert"
+    HALF_OPEN = "semi-ouvert"
+
+    def __init__(self, failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset_timeout: float = CIRCUIT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probing = False
+        self._probe_started = 0.0
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN and (not self._probing or now - self._probe_started >= self.reset_timeout):
+            self._probing = True
+            self._probe_started = now
+            return True
+        return False
+
+    def release(self):
+        """La requête en cours s'est terminée sans verdict : une autre requête de test pourra partir"""
+        self._probing = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.trips += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+class UpstreamEndpoint:
+    """Un couple modèle/URL de l'API, avec son disjoncteur et ses statistiques"""
+
+    def __init__(self, model: str, url: str):
+        self.model = model
+        self.url = url
+        self.breaker = CircuitBreaker()
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.last_error = None
+        self._latencies = deque(maxlen=200)
+
+    @property
+    def name(self) -> str:
+        return self.model if self.url == ROUTWAY_API_URL else f"{self.model}@{self.url}"
+
+    def record_success(self, latency: float):
+        self.successes += 1
+        self._latencies.append(latency)
+        self.breaker.record_success()
+
+    def record_failure(self, error: str, trip: bool = True):
+        self.failures += 1
+        self.last_error = error
+        if trip:
+            self.breaker.record_failure()
+        else:
+            self.breaker.release()
+
+    def stats(self) -> Dict[str, object]:
+        latencies = sorted(self._latencies)
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else 0.0
+
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "error_rate": self.failures / self.requests if self.requests else 0.0,
+            "latency_p50": pct(0.50),
+            "latency_p95": pct(0.95),
+            "circuit": self.breaker.state,
+            "circuit_trips": self.breaker.trips,
+            "last_error": self.last_error,
+        }
+
+def parse_endpoints(spec: str = ROUTWAY_ENDPOINTS) -> List[UpstreamEndpoint]:
+    endpoints = []
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        model, _, url = entry.partition("@")
+        endpoints.append(UpstreamEndpoint(model.strip(), url.strip() or ROUTWAY_API_URL))
+    return endpoints or [UpstreamEndpoint(ROUTWAY_MODEL, ROUTWAY_API_URL)]
+
+def _retry_after(resp) -> Optional[float]:
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None  # Format date HTTP : on garde le délai exponentiel
+
+class UpstreamClient:
+    """Appels à l'API avec réessais, disjoncteur par endpoint et liste de repli.
+
+    Les erreurs transitoires (timeouts, connexion, 5xx, 429) sont réessayées avec
+    un délai exponentiel aléatoire (« full jitter »), en respectant `Retry-After`.
+    Quand un endpoint échoue ou a son disjoncteur ouvert, on passe au suivant de la
+    liste. Si tous les disjoncteurs sont ouverts, CircuitOpen est levée tout de
+    suite au lieu d'attendre un timeout.
+    """
+
+    def __init__(self, pool: RoutwayHTTPPool, endpoints: List[UpstreamEndpoint] = None,
+                 max_attempts: int = UPSTREAM_MAX_ATTEMPTS, backoff_base: float = UPSTREAM_BACKOFF_BASE,
+                 backoff_max: float = UPSTREAM_BACKOFF_MAX, attempt_timeout: float = UPSTREAM_ATTEMPT_TIMEOUT,
+                 deadline: float = UPSTREAM_DEADLINE):
+        self.pool = pool
+        self.endpoints = endpoints if endpoints is not None else parse_endpoints()
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.attempt_timeout = attempt_timeout
+        self.deadline = deadline
+        self.retries = 0
+        self.failovers = 0
+        self.fast_failures = 0
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def circuit_state(self) -> str:
+        """État global : fermé si au moins un endpoint accepte les requêtes"""
+        states = [endpoint.breaker.state for endpoint in self.endpoints]
+        if CircuitBreaker.CLOSED in states:
+            return CircuitBreaker.CLOSED
+        return CircuitBreaker.HALF_OPEN if CircuitBreaker.HALF_OPEN in states else CircuitBreaker.OPEN
+
+    async def _send(self, payload: dict, stream: bool = False):
+        """Obtenir une réponse HTTP 200 (non lue) : (réponse, endpoint, début)"""
+        session = await self.pool.session()
+        if stream:
+            timeout = aiohttp.ClientTimeout(total=None, sock_connect=self.attempt_timeout, sock_read=self.attempt_timeout)
+        else:
+            timeout = aiohttp.ClientTimeout(total=self.attempt_timeout)
+        started_at = time.monotonic()
+        last_error = None
+        tried = False
+
+        for index, endpoint in enumerate(self.endpoints):
+            if tried and index > 0:
+                self.failovers += 1
+            for attempt in range(self.max_attempts):
+                if not endpoint.breaker.allow():
+                    break
+                tried = True
+                endpoint.requests += 1
+                if attempt:
+                    self.retries += 1
+                body = dict(payload, model=endpoint.model)
+                attempt_start = time.monotonic()
+                delay = self._backoff(attempt)
+                try:
+                    resp = await session.post(endpoint.url, headers=routway_headers(), json=body, timeout=timeout)
+                except asyncio.TimeoutError:
+                    UPSTREAM_LATENCY.observe(time.monotonic() - attempt_start, endpoint.name, "timeout")
+                    endpoint.record_failure("timeout")
+                    last_error = UpstreamTimeout(f"{endpoint.name} : timeout")
+                except aiohttp.ClientError as e:
+                    UPSTREAM_LATENCY.observe(time.monotonic() - attempt_start, endpoint.name, "connection_error")
+                    endpoint.record_failure(f"connexion : {e}")
+                    last_error = UpstreamError(f"{endpoint.name} : {e}")
+                except BaseException:
+                    endpoint.breaker.release()  # Tentative annulée : ni succès ni échec
+                    raise
+                else:
+                    if resp.status != 200 or stream:
+                        # En streaming, on mesure le temps jusqu'aux en-têtes ; sinon jusqu'au corps (complete)
+                        UPSTREAM_LATENCY.observe(time.monotonic() - attempt_start, endpoint.name, str(resp.status))
+                    if resp.status == 200:
+                        return resp, endpoint, attempt_start
+                    try:
+                        error_text = (await resp.text())[:200]
+                    except (aiohttp.ClientError, asyncio.TimeoutError, UnicodeDecodeError):
+                        error_text = ""  # Corps illisible : le statut suffit pour décider
+                    resp.release()
+                    last_error = UpstreamError(f"{endpoint.name} : statut {resp.status}: {error_text}", resp.status)
+                    if resp.status == 429:
+                        # Limite de débit : le service fonctionne, on ne déclenche pas le disjoncteur
+                        endpoint.rate_limited += 1
+                        endpoint.record_failure(f"429: {error_text}", trip=False)
+                        retry_after = _retry_after(resp)
+                        if retry_after is not None:
+                            if retry_after > self.backoff_max:
+                                break  # Trop long : on essaie plutôt l'endpoint suivant
+                            delay = retry_after
+                    elif resp.status >= 500 or resp.status == 408:
+                        endpoint.record_failure(f"{resp.status}: {error_text}")
+                    else:
+                        # Erreur de requête (400, 401...) : inutile de réessayer à l'identique
+                        endpoint.record_failure(f"{resp.status}: {error_text}", trip=False)
+                        break
+
+                if attempt + 1 >= self.max_attempts:
+                    break
+                if time.monotonic() - started_at + delay > self.deadline:
+                    raise last_error
+                await asyncio.sleep(delay)
+
+        if not tried:
+            self.fast_failures += 1
+            raise CircuitOpen("tous les disjoncteurs sont ouverts")
+        raise last_error
+
+    async def complete(self, payload: dict) -> dict:
+        """Requête classique : renvoie le JSON de la réponse"""
+        resp, endpoint, attempt_start = await self._send(payload)
+        try:
+            result = await resp.json()
+        except (aiohttp.ClientError, ValueError, asyncio.TimeoutError) as e:
+            endpoint.record_failure(f"lecture : {e}")
+            raise UpstreamError(f"{endpoint.name} : réponse illisible ({e})")
+        except BaseException:
+            endpoint.breaker.release()
+            raise
+        finally:
+            resp.release()
+        latency = time.monotonic() - attempt_start
+        UPSTREAM_LATENCY.observe(latency, endpoint.name, "200")
+        endpoint.record_success(latency)
+        return result
+
+    @asynccontextmanager
+    async def stream(self, payload: dict):
+        """Requête en streaming : donne la réponse HTTP ouverte (les réessais s'arrêtent au premier octet)"""
+        resp, endpoint, attempt_start = await self._send(payload, stream=True)
+        # Latence mesurée jusqu'aux en-têtes (temps avant le premier fragment)
+        latency = time.monotonic() - attempt_start
+        try:
+            yield resp
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            endpoint.record_failure(f"flux interrompu : {e}")
+            raise
+        except BaseException:
+            endpoint.breaker.release()  # Annulé, abandonné ou format inattendu : pas de verdict sur l'endpoint
+            raise
+        else:
+            endpoint.record_success(latency)
+        finally:
+            resp.release()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "circuit": self.circuit_state(),
+            "retries": self.retries,
+            "failovers": self.failovers,
+            "fast_failures": self.fast_failures,
+            "endpoints": {endpoint.name: endpoint.stats() for endpoint in self.endpoints},
+        }
+
+# -----------------------------
+# Serveur web intégré (même boucle asyncio que le bot)
+# -----------------------------
+class WebServer:
+    """Serveur aiohttp démarré dans la boucle du bot : pas de thread, accès direct à l'état.
+
+    - `/`        : page de présence (keep-alive Render)
+    - `/health`  : disponibilité réelle (gateway, latence, file, disjoncteur) ; 503 si pas prête
+    - `/metrics` : métriques au format Prometheus
+    - `/admin/*` : routes d'administration, protégées par ADMIN_TOKEN
+    """
+
+    def __init__(self, bot, host: str = WEB_HOST, port: int = WEB_PORT):
+        self.bot = bot
+        self.host = host
+        self.port = port
+        self.app = web.Application(middlewares=[self._admin_auth])
+        self.app.router.add_get("/", self.home)
+        self.app.router.add_get("/health", self.health)
+        self.app.router.add_get("/metrics", self.metrics)
+        self.add_admin_route("GET", "/stats", self.admin_stats)
+        self.add_admin_route("GET", "/loop", self.admin_loop)
+        self.add_admin_route("POST", "/profile", self.admin_profile)
+        self._runner = None
+
+    def add_admin_route(self, method: str, path: str, handler):
+        """Monter une route d'administration sous /admin (avant le démarrage du serveur)"""
+        self.app.router.add_route(method, f"/admin{path}", handler)
+
+    @web.middleware
+    async def _admin_auth(self, request: web.Request, handler):
+        if request.path.startswith("/admin"):
+            if not ADMIN_TOKEN:
+                raise web.HTTPNotFound()
+            if request.headers.get("Authorization") != f"Bearer {ADMIN_TOKEN}":
+                raise web.HTTPUnauthorized(text="Jeton d'administration invalide")
+        return await handler(request)
+
+    async def start(self):
+        if self._runner is not None:
+            return
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        try:
+            await web.TCPSite(self._runner, self.host, self.port).start()
+        except OSError as e:
+            print(f"[⚠️] Serveur web non démarré sur le port {self.port} : {e}")
+            await self._runner.cleanup()
+            self._runner = None
+            return
+        print(f"[🌐] Serveur web démarré sur le port {self.port} (/health, /metrics)")
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def home(self, request: web.Request) -> web.Response:
+        return web.Response(text="🎩 Audrey Hall Bot est en ligne!")
+
+    def readiness(self) -> Dict[str, object]:
+        bot = self.bot
+        latency = bot.latency
+        gateway_connected = bot.is_ready() and not bot.is_closed()
+        return {
+            "status": "online" if gateway_connected else "starting",
+            "ready": gateway_connected,
+            "bot": "Audrey Hall",
+            "gateway_latency_ms": round(latency * 1000) if latency == latency else None,
+            "guilds": len(bot.guilds),
+            "queue_depth": bot.scheduler.depth,
+            "llm_in_flight": bot.scheduler.active,
+            "upstream_circuit": bot.upstream.circuit_state(),
+            "loop_lag_p99_ms": bot.loop_monitor.stats()["lag_p99_ms"],
+            "active_conversations": conversations.active_count(),
+            "active_scenes": conversations.scene_count(),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    async def health(self, request: web.Request) -> web.Response:
+        state = self.readiness()
+        return web.json_response(state, status=200 if state["ready"] else 503)
+
+    async def metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain",
+                            headers={"X-Prometheus-Format": "0.0.4"})
+
+    async def admin_stats(self, request: web.Request) -> web.Response:
+        bot = self.bot
+        return web.json_response({
+            "http_pool": bot.routway.stats(),
+            "scheduler": bot.scheduler.stats(),
+            "coalescer": bot.coalescer.stats(),
+            "scenes": bot.scenes.stats(),
+            "outbound": bot.outbound.stats(),
+            "upstream": bot.upstream.stats(),
+            "conversations": conversations.stats(),
+            "riddles": bot.riddles.stats(),
+            "daily_readings": daily_readings.stats(),
+            "response_cache": response_cache.stats(),
+            "local_replies": local_responder.stats(),
+            "tokens": token_usage.stats(),
+            "rate_limits": rate_limiter.stats(),
+            "discord_cache": {"member_cache": MEMBER_CACHE, **bot.cache_sizes()},
+            "loop": bot.loop_monitor.stats(),
+            "traffic_recording": traffic_recorder.stats(),
+        }, dumps=lambda data: json.dumps(data, ensure_ascii=False, default=str))
+
+    async def admin_loop(self, request: web.Request) -> web.Response:
+        """Santé de la boucle asyncio avec l'historique glissant"""
+        return web.json_response(self.bot.loop_monitor.stats(history=True),
+                                 dumps=lambda data: json.dumps(data, ensure_ascii=False))
+
+    async def admin_profile(self, request: web.Request) -> web.Response:
+        """POST /admin/profile?seconds=10&mode=cprofile|sample : profilage du processus en direct"""
+        mode = request.query.get("mode", "sample")
+        if mode not in ("cprofile", "sample"):
+            raise web.HTTPBadRequest(text="mode : cprofile ou sample")
+        try:
+            seconds = float(request.query.get("seconds", "10"))
+        except ValueError:
+            raise web.HTTPBadRequest(text="seconds : nombre de secondes")
+        try:
+            report, summary = await self.bot.loop_monitor.profile(seconds, mode)
+        except ProfilingBusy:
+            raise web.HTTPConflict(text="Un profilage est déjà en cours")
+        return web.json_response({"report": report, "summary": summary})
+
+# -----------------------------
+# Regroupement des messages en rafale
+# -----------------------------
+class _PendingBatch:
+    __slots__ = ("messages", "first_at", "task", "in_flight", "committed")
+
+    def __init__(self):
+        self.messages = []
+        self.first_at = time.monotonic()
+        self.task = None
+        self.in_flight = False  # La requête à l'IA est partie
+        self.committed = False  # La réponse a commencé à être envoyée sur Discord
+
+class MessageCoalescer:
+    """Regroupe les messages rapprochés d'un même utilisateur en un seul appel à l'IA.
+
+    Chaque message relance une fenêtre d'attente de `window` secondes (plafonnée à
+    `max_delay` depuis le premier message). Un message qui arrive pendant qu'une
+    requête est en cours annule cette requête, devenue obsolète, tant que sa
+    réponse n'a pas commencé à s'afficher ; sinon il est gardé pour le tour suivant.
+    `handler(user_id, messages)` traite le lot.
+    """
+
+    def __init__(self, handler, window: float = COALESCE_WINDOW, max_delay: float = COALESCE_MAX_DELAY,
+                 cancel_in_flight: bool = True):
+        self.handler = handler
+        self.window = window
+        self.max_delay = max_delay
+        self.cancel_in_flight = cancel_in_flight  # False : un message reçu pendant l'appel attend le tour suivant
+        self._batches: Dict[int, _PendingBatch] = {}
+        self.batches_sent = 0
+        self.messages_coalesced = 0
+        self.requests_cancelled = 0
+
+    def submit(self, user_id: int, message):
+        batch = self._batches.get(user_id)
+        if batch is None:
+            batch = self._batches[user_id] = _PendingBatch()
+        batch.messages.append(message)
+
+        if batch.task is not None and not batch.task.done():
+            if batch.committed or (batch.in_flight and not self.cancel_in_flight):
+                return  # Réponse déjà en cours : ce message attendra le tour suivant
+            batch.task.cancel()
+            if batch.in_flight:
+                self.requests_cancelled += 1
+                batch.in_flight = False
+        batch.task = asyncio.create_task(self._run(user_id, batch))
+
+    def pending(self) -> int:
+        """Lots en attente ou en cours de traitement"""
+        return sum(1 for batch in self._batches.values() if batch.task is not None and not batch.task.done())
+
+    def mark_committed(self, user_id: int):
+        batch = self._batches.get(user_id)
+        if batch is not None:
+            batch.committed = True
+
+    def discard(self, user_id: int):
+        """Oublier les messages en attente (fin de conversation)"""
+        batch = self._batches.pop(user_id, None)
+        if batch is not None and batch.task is not None and not batch.task.done():
+            batch.task.cancel()
+
+    async def _run(self, user_id: int, batch: _PendingBatch):
+        elapsed = time.monotonic() - batch.first_at
+        await asyncio.sleep(max(0.0, min(self.window, self.max_delay - elapsed)))
+
+        messages = list(batch.messages)
+        batch.in_flight = True
+        self.batches_sent += 1
+        self.messages_coalesced += len(messages)
+        try:
+            await self.handler(user_id, messages)
+        except Exception as e:
+            print(f"[💬] Erreur lors de la réponse à {user_id}: {type(e).__name__}: {e}")
+        finally:
+            if self._batches.get(user_id) is batch and batch.task is asyncio.current_task():
+                # Les messages arrivés pendant l'envoi forment le lot suivant
+                leftover = batch.messages[len(messages):]
+                del self._batches[user_id]
+                for message in leftover:
+                    self.submit(user_id, message)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "pending_users": len(self._batches),
+            "batches_sent": self.batches_sent,
+            "messages_coalesced": self.messages_coalesced,
+            "requests_cancelled": self.requests_cancelled,
+        }
+
+# -----------------------------
+# Envoi des messages Discord
+# -----------------------------
+DISCORD_MESSAGE_LIMIT = 2000
+
+_SPLIT_SENTENCE = re.compile(r"[.!?…][»”\")\]*]*\s")
+_CODE_FENCE = re.compile(r"```([\w+#.-]*)")
+_FENCE_CLOSE = "\n```"
+
+def split_point(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> int:
+    """Position où couper un texte trop long : paragraphe, sinon ligne, phrase, mot (jamais avant limit/3)"""
+    if len(text) <= limit:
+        return len(text)
+    window = text[:limit]
+    floor = limit // 3
+    for separator in ("\n\n", "\n"):
+        cut = window.rfind(separator)
+        if cut >= floor:
+            return cut + len(separator)
+    cut = 0
+    for match in _SPLIT_SENTENCE.finditer(window):
+        cut = match.end()
+    if cut >= floor:
+        return cut
+    cut = window.rfind(" ")
+    return cut + 1 if cut > 0 else limit
+
+def _open_fence(text: str) -> Optional[str]:
+    """Langage du bloc de code resté ouvert à la fin de `text` ("" sans langage), None si tous sont fermés"""
+    language = None
+    for match in _CODE_FENCE.finditer(text):
+        language = match.group(1) if language is None else None
+    return language
+
+def split_message(text: str, limit: int = DISCORD_MESSAGE_LIMIT) -> List[str]:
+    """Découper un texte en messages Discord d'au plus `limit` caractères.
+
+    Un bloc de code coupé est refermé en fin de partie et rouvert (même langage)
+    au début de la suivante, sans toucher à l'indentation du code.
+    """
+    parts = []
+    reopen = ""  # Ouverture du bloc de code coupé, répétée en tête de la partie suivante
+    while len(reopen) + len(text) > limit:
+        budget = limit - len(reopen)
+        if reopen or "```" in text[:budget]:
+            budget -= len(_FENCE_CLOSE)  # Place pour refermer le bloc
+        cut = split_point(text, budget)
+        part = reopen + text[:cut].rstrip()
+        text = text[cut:]
+        language = _open_fence(part)
+        if language is None:
+            reopen = ""
+            text = text.lstrip()
+        else:
+            part += _FENCE_CLOSE
+            reopen = f"```{language}\n"
+            text = text.lstrip("\n")
+        if part.strip():
+            parts.append(part)
+    text = reopen + text
+    if text.strip() or not parts:
+        parts.append(text)
+    return parts
+
+class _OutboundMessage:
+    __slots__ = ("send", "args", "kwargs", "mergeable", "future", "queued_at")
+
+    def __init__(self, send, args: tuple, kwargs: dict, mergeable: bool, future: asyncio.Future):
+        self.send = send
+        self.args = args
+        self.kwargs = kwargs
+        self.mergeable = mergeable
+        self.future = future
+        self.queued_at = time.monotonic()
+
+class OutboundSender:
+    """File de sortie des messages Discord, une par salon.
+
+    Les envois d'un salon partent dans l'ordre, cadencés par un seau à jetons
+    calé sur la limite de l'API (5 messages / 5 s par salon, et un plafond
+    global) : on attend son tour au lieu de recevoir des 429 que discord.py
+    retenterait en silence. Les textes trop longs sont découpés aux fins de
+    paragraphe ou de phrase ; les avis courts consécutifs (`mergeable`) sont
+    fusionnés en un seul message. Les erreurs 5xx et réseau sont retentées.
+    """
+
+    def __init__(self, channel_rate: int = OUTBOUND_CHANNEL_RATE, channel_per: float = OUTBOUND_CHANNEL_PER,
+                 global_rate: float = OUTBOUND_GLOBAL_RATE, max_retries: int = OUTBOUND_MAX_RETRIES):
+        self.channel_burst = max(1, channel_rate)
+        self.channel_rate = self.channel_burst / max(0.001, channel_per)  # Jetons par seconde
+        self.global_rate = max(0.1, global_rate)
+        self.max_retries = max_retries
+        self._queues: Dict[int, deque] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._buckets: Dict[int, TokenBucket] = {}
+        self._global = TokenBucket(self.global_rate, time.monotonic())
+        self._last_sweep = time.monotonic()
+        self.sent = 0
+        self.parts_split = 0
+        self.merged = 0
+        self.retries = 0
+        self.failed = 0
+        self.peak_depth = 0
+
+    async def send(self, key: int, send, content: Optional[str] = None, *, mergeable: bool = False, **kwargs):
+        """Envoyer via `send(content, **kwargs)` dans la file du salon `key` ; renvoie le (dernier) message créé"""
+        loop = asyncio.get_running_loop()
+        parts = split_message(content) if content is not None and len(content) > DISCORD_MESSAGE_LIMIT else [content]
+        if len(parts) > 1:
+            self.parts_split += len(parts) - 1
+            OUTBOUND_MESSAGES.inc("split", amount=len(parts) - 1)
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+        items = []
+        for i, part in enumerate(parts):
+            # Pièces jointes, embeds et options ne vont qu'avec la dernière partie
+            options = kwargs if i == len(parts) - 1 else {k: v for k, v in kwargs.items() if k in ("wait", "ephemeral")}
+            item = _OutboundMessage(send, (part,) if part is not None else (), options,
+                                    mergeable and not kwargs and part is not None, loop.create_future())
+            queue.append(item)
+            items.append(item)
+        self.peak_depth = max(self.peak_depth, len(queue))
+        if key not in self._workers:
+            self._workers[key] = asyncio.create_task(self._drain(key, queue))
+        if time.monotonic() - self._last_sweep >= 60:
+            self._sweep()
+        try:
+            for item in items[:-1]:
+                await item.future
+            return await items[-1].future
+        except BaseException:
+            for item in items:
+                item.future.cancel()  # Annulation ou échec : les parties pas encore envoyées sont abandonnées
+            raise
+
+    async def _drain(self, key: int, queue: deque):
+        try:
+            while queue:
+                item = queue.popleft()
+                if item.future.done():
+                    continue  # Envoi annulé par l'appelant
+                followers = []
+                if item.mergeable:
+                    # Avis courts consécutifs : un seul message
+                    text = item.args[0]
+                    while queue and queue[0].mergeable and queue[0].send == item.send:
+                        nxt = queue[0]
+                        if nxt.future.done():
+                            queue.popleft()
+                            continue
+                        if len(text) + 1 + len(nxt.args[0]) > DISCORD_MESSAGE_LIMIT:
+                            break
+                        text += "\n" + nxt.args[0]
+                        followers.append(queue.popleft())
+                    item.args = (text,)
+                    if followers:
+                        self.merged += len(followers)
+                        OUTBOUND_MESSAGES.inc("merged", amount=len(followers))
+                await self._pace(key)
+                OUTBOUND_WAIT.observe(time.monotonic() - item.queued_at)
+                await self._deliver(item, followers)
+        finally:
+            if self._workers.get(key) is asyncio.current_task():
+                del self._workers[key]
+            if not queue and self._queues.get(key) is queue:
+                del self._queues[key]
+
+    async def _pace(self, key: int):
+        """Attendre un jeton du salon et un jeton global"""
+        channel_bucket = self._buckets.get(key)
+        if channel_bucket is None:
+            channel_bucket = self._buckets[key] = TokenBucket(self.channel_burst, time.monotonic())
+        for bucket, rate, burst in ((channel_bucket, self.channel_rate, self.channel_burst),
+                                    (self._global, self.global_rate, self.global_rate)):
+            while bucket.refill(rate, burst, time.monotonic()) < 1:
+                await asyncio.sleep((1 - bucket.tokens) / rate)
+            bucket.tokens -= 1
+
+    async def _deliver(self, item: _OutboundMessage, followers: List[_OutboundMessage]):
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with DISCORD_API_LATENCY.time("send"):
+                    message = await item.send(*item.args, **item.kwargs)
+            except (discord.HTTPException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = getattr(e, "status", None)
+                transient = status is None or status >= 500 or status == 429
+                if transient and attempt < self.max_retries:
+                    self.retries += 1
+                    OUTBOUND_MESSAGES.inc("retry")
+                    await asyncio.sleep(min(8.0, 0.5 * 2 ** attempt))
+                    continue
+                self._fail(item, followers, e)
+                return
+            except Exception as e:
+                self._fail(item, followers, e)
+                return
+            self.sent += 1
+            OUTBOUND_MESSAGES.inc("sent")
+            for waiting in (item, *followers):
+                if not waiting.future.done():
+                    waiting.future.set_result(message)
+            return
+
+    def _fail(self, item: _OutboundMessage, followers: List[_OutboundMessage], error: Exception):
+        self.failed += 1
+        OUTBOUND_MESSAGES.inc("failed")
+        print(f"[📤] Échec d'envoi : {type(error).__name__}: {error}")
+        for waiting in (item, *followers):
+            if not waiting.future.done():
+                waiting.future.set_exception(error)
+
+    def _sweep(self):
+        """Oublier les seaux des salons inactifs (revenus pleins)"""
+        now = self._last_sweep = time.monotonic()
+        idle = self.channel_burst / self.channel_rate
+        for key in [key for key, bucket in self._buckets.items()
+                    if key not in self._workers and now - bucket.updated >= idle]:
+            del self._buckets[key]
+
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queued": self.depth(),
+            "busy_channels": len(self._workers),
+            "peak_channel_depth": self.peak_depth,
+            "sent": self.sent,
+            "parts_split": self.parts_split,
+            "merged": self.merged,
+            "retries": self.retries,
+            "failed": self.failed,
+            "wait_p95": OUTBOUND_WAIT.percentile(0.95),
+        }
+
+# -----------------------------
+# Santé de la boucle asyncio
+# -----------------------------
+class ProfilingBusy(Exception):
+    """Un profilage est déjà en cours"""
+
+def describe_callback(handle) -> str:
+    """Nom lisible d'un rappel de la boucle : coroutine de la tâche (et où elle s'est arrêtée), sinon fonction"""
+    callback = getattr(handle, "_callback", None)
+    task = getattr(callback, "__self__", None)
+    if isinstance(task, asyncio.Task):
+        coro = task.get_coro()
+        name = getattr(coro, "__qualname__", None) or repr(coro)
+        frame = getattr(coro, "cr_frame", None)
+        if frame is not None:
+            return f"{name} ({os.path.basename(frame.f_code.co_filename)}:{frame.f_lineno})"
+        return name
+    return getattr(callback, "__qualname__", None) or repr(callback)
+
+class LoopMonitor:
+    """Surveillance de la boucle asyncio du bot (gateway, messages, commandes, HTTP : tout y passe).
+
+    - Retard : une tâche dort `interval` secondes et mesure son retard de réveil ;
+      un retard élevé veut dire qu'un traitement synchrone bloque la boucle (et
+      les heartbeats de la gateway).
+    - Rappels lents : chaque rappel exécuté par la boucle est chronométré
+      (remplacement de asyncio.Handle._run, deux appels à perf_counter) ; ceux
+      qui dépassent le seuil sont gardés avec le nom de leur coroutine. Ce
+      chronométrage coûte sur chaque rappel : il n'est permanent qu'avec
+      LOOP_SLOW_CALLBACK_MS, sinon actif seulement pendant un profilage.
+    - Historique : une entrée (retard max, retard moyen, rappels lents) par tranche de 10 s.
+    - Profilage à la demande (`profile()`) : cProfile ou échantillonnage de la
+      pile du thread de la boucle pendant quelques secondes, rapport écrit sur disque.
+    """
+
+    HISTORY_BUCKET = 10.0  # Secondes par entrée de l'historique
+    SAMPLE_INTERVAL = 0.005  # Période d'échantillonnage de la pile (s)
+    PROFILE_SLOW_THRESHOLD = 0.1  # Seuil des rappels lents pendant un profilage, sans LOOP_SLOW_CALLBACK_MS (s)
+
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL, slow_callback_ms: float = LOOP_SLOW_CALLBACK_MS,
+                 history_minutes: int = LOOP_HISTORY_MINUTES):
+        self.interval = interval
+        self.slow_threshold = slow_callback_ms / 1000
+        self.history = deque(maxlen=max(1, int(history_minutes * 60 / self.HISTORY_BUCKET)))
+        self.slow = deque(maxlen=50)  # (horodatage, rappel, durée en ms)
+        self.slow_total = 0
+        self.max_lag = 0.0
+        self._recent = deque(maxlen=240)  # Derniers retards mesurés
+        self._window = [0.0, 0.0, 0, 0]  # Tranche en cours : retard max, somme, mesures, rappels lents
+        self._window_started = time.monotonic()
+        self._last_warning = 0.0
+        self._original_run = None
+        self._task = None
+        self._profiling = False
+
+    def start(self):
+        if self._task is not None:
+            return
+        if self.slow_threshold > 0:
+            self._install(self.slow_threshold)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._uninstall()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _install(self, threshold: float):
+        if self._original_run is not None:
+            return
+        original = asyncio.events.Handle._run
+        monitor = self
+
+        def timed_run(handle):
+            started = time.perf_counter()
+            try:
+                return original(handle)
+            finally:
+                duration = time.perf_counter() - started
+                if duration >= threshold:
+                    monitor._record_slow(handle, duration)
+
+        self._original_run = original
+        asyncio.events.Handle._run = timed_run
+
+    def _uninstall(self):
+        if self._original_run is not None:
+            asyncio.events.Handle._run = self._original_run
+            self._original_run = None
+
+    def _record_slow(self, handle, duration: float):
+        name = describe_callback(handle)
+        self.slow.append((datetime.now().isoformat(timespec="seconds"), name, round(duration * 1000, 1)))
+        self.slow_total += 1
+        self._window[3] += 1
+        SLOW_CALLBACKS.inc()
+        now = time.monotonic()
+        if now - self._last_warning >= 5:  # Au plus un avertissement toutes les 5 s
+            self._last_warning = now
+            print(f"[🐢] Boucle bloquée {duration * 1000:.0f} ms par {name}")
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self._observe(max(0.0, loop.time() - expected))
+
+    def _observe(self, lag: float):
+        LOOP_LAG.observe(lag)
+        self._recent.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        window = self._window
+        window[0] = max(window[0], lag)
+        window[1] += lag
+        window[2] += 1
+        now = time.monotonic()
+        if now - self._window_started >= self.HISTORY_BUCKET:
+            self.history.append((datetime.now().isoformat(timespec="seconds"), round(window[0] * 1000, 1),
+                                 round(window[1] / window[2] * 1000, 1), window[3]))
+            self._window = [0.0, 0.0, 0, 0]
+            self._window_started = now
+
+    def lag_percentile(self, p: float) -> float:
+        values = sorted(self._recent)
+        return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+    # Profilage à la demande ------------------------------------------------
+    async def profile(self, seconds: float, mode: str = "cprofile", directory: str = PROFILE_DIR) -> Tuple[str, str]:
+        """Profiler le processus pendant `seconds` s ; renvoie (rapport complet, résumé texte)"""
+        if self._profiling:
+            raise ProfilingBusy()
+        self._profiling = True
+        timed = self._original_run is None  # Rappels lents chronométrés le temps du profilage seulement
+        if timed:
+            self._install(self.PROFILE_SLOW_THRESHOLD)
+        try:
+            seconds = min(max(1.0, seconds), PROFILE_MAX_SECONDS)
+            os.makedirs(directory, exist_ok=True)
+            base = os.path.join(directory, f"{mode}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+            if mode == "cprofile":
+                return await self._cprofile(seconds, base)
+            return await self._sample(seconds, base)
+        finally:
+            if timed:
+                self._uninstall()
+            self._profiling = False
+
+    async def _cprofile(self, seconds: float, base: str) -> Tuple[str, str]:
+        """cProfile sur le thread de la boucle : toutes les fonctions, mais coût notable pendant la mesure"""
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+
+        def write():
+            profiler.dump_stats(f"{base}.prof")
+            with open(f"{base}.txt", "w", encoding="utf-8") as f:
+                pstats.Stats(profiler, stream=f).sort_stats("cumulative").print_stats(40)
+
+        await asyncio.to_thread(write)
+        return f"{base}.prof", f"{base}.txt"
+
+    async def _sample(self, seconds: float, base: str) -> Tuple[str, str]:
+        """Échantillonnage de la pile du thread de la boucle depuis un autre thread (surcoût faible).
+
+        Repère bien ce qui bloque la boucle ; les rappels très courts sont sous-représentés,
+        le thread d'échantillonnage ne reprenant la main qu'aux libérations du GIL (select, I/O).
+        """
+        thread_id = threading.get_ident()
+        interval = self.SAMPLE_INTERVAL
+
+        def sample():
+            stacks: Dict[str, int] = defaultdict(int)
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                frame = sys._current_frames().get(thread_id)
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if names:
+                    stacks[";".join(reversed(names))] += 1
+                time.sleep(interval)
+            return stacks
+
+        stacks = await asyncio.to_thread(sample)
+
+        def write():
+            total = sum(stacks.values()) or 1
+            # Format « folded » : lisible par flamegraph.pl / speedscope
+            with open(f"{base}.folded", "w", encoding="utf-8") as f:
+                for stack, count in sorted(stacks.items(), key=lambda item: -item[1]):
+                    f.write(f"{stack} {count}\n")
+            leaves: Dict[str, int] = defaultdict(int)
+            inclusive: Dict[str, int] = defaultdict(int)
+            for stack, count in stacks.items():
+                frames = stack.split(";")
+                leaves[frames[-1]] += count
+                for name in set(frames):
+                    inclusive[name] += count
+            with open(f"{base}.txt", "w", encoding="utf-8") as f:
+                f.write(f"{total} échantillons sur {seconds:g} s\n\nFonctions en cours d'exécution (propre) :\n")
+                for name, count in sorted(leaves.items(), key=lambda item: -item[1])[:30]:
+                    f.write(f"{count / total:7.1%}  {name}\n")
+                f.write("\nFonctions sur la pile (inclusif) :\n")
+                for name, count in sorted(inclusive.items(), key=lambda item: -item[1])[:30]:
+                    f.write(f"{count / total:7.1%}  {name}\n")
+
+        await asyncio.to_thread(write)
+        return f"{base}.folded", f"{base}.txt"
+
+    def stats(self, history: bool = False) -> Dict[str, object]:
+        data = {
+            "lag_p50_ms": round(self.lag_percentile(0.50) * 1000, 2),
+            "lag_p99_ms": round(self.lag_percentile(0.99) * 1000, 2),
+            "lag_max_ms": round(self.max_lag * 1000, 2),
+            "slow_callbacks": self.slow_total,
+            "slow_threshold_ms": self.slow_threshold * 1000,
+            "recent_slow": list(self.slow)[-10:],
+            "profiling": self._profiling,
+        }
+        if history:
+            data["history"] = [dict(zip(("time", "max_ms", "mean_ms", "slow"), entry)) for entry in self.history]
+        return data
+
+# -----------------------------
+# Enregistrement du trafic (rejeu avec tools/replay.py)
+# -----------------------------
+# Événement entrant (message ou commande) en cours de traitement, auquel sont rattachés les appels à l'IA
+_traffic_event: contextvars.ContextVar = contextvars.ContextVar("traffic_event", default=None)
+
+class TrafficRecorder:
+    """Journal JSONL compact et anonymisé du trafic, rejouable contre une autre version du bot.
+
+    Une ligne par événement, datée en secondes depuis le début de l'enregistrement
+    (les écarts entre lignes rendent le rythme du trafic) :
+    - `msg` : message reçu (auteur, salon, serveur, longueur ; mot de commande `!…`, mention d'Audrey) ;
+    - `cmd` : commande slash (nom ; longueur des options texte, valeur des options numériques) ;
+    - `llm` : appel à l'API Routway, rattaché à l'événement qui l'a déclenché (`id`), avec
+      son mode, son issue, sa durée, le délai du premier fragment et la longueur de la réponse.
+    Aucun texte n'est écrit : les identifiants Discord deviennent des numéros attribués à la
+    première apparition, les messages et les réponses se réduisent à leur longueur. L'en-tête
+    liste les conversations et scènes déjà actives et les réglages qui influent sur le rejeu.
+    Les lignes sont écrites par lots hors de la boucle asyncio.
+    """
+    VERSION = 1
+
+    def __init__(self, path: str = TRAFFIC_RECORD_PATH, max_events: int = TRAFFIC_RECORD_MAX_EVENTS,
+                 flush_interval: float = 1.0):
+        self.path = path
+        self.max_events = max_events
+        self.flush_interval = flush_interval
+        self.enabled = False
+        self.events = 0
+        self.dropped = 0
+        self._started = 0.0
+        self._next_id = 0
+        self._ids: Dict[str, Dict[int, int]] = {"u": {}, "c": {}, "g": {}}
+        self._buffer: List[str] = []
+        self._file = None
+        self._flush_task = None
+
+    def _anon(self, kind: str, real_id: Optional[int]) -> Optional[int]:
+        if real_id is None:
+            return None
+        ids = self._ids[kind]
+        anon = ids.get(real_id)
+        if anon is None:
+            anon = ids[real_id] = len(ids) + 1
+        return anon
+
+    def _emit(self, kind: str, fields: dict, at: Optional[float] = None):
+        if self.events >= self.max_events:
+            self.dropped += 1
+            return
+        self.events += 1
+        event = {"t": round((at if at is not None else time.monotonic()) - self._started, 3), "e": kind}
+        event.update(fields)
+        self._buffer.append(json.dumps(event, ensure_ascii=False, separators=(",", ":")))
+
+    async def open(self, sessions):
+        """Commencer l'enregistrement ; `sessions` : [(utilisateur ou scène, salon)] déjà actifs"""
+        if not self.path or self.enabled:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = await asyncio.to_thread(open, self.path, "a", encoding="utf-8")
+        self._started = time.monotonic()
+        self.enabled = True
+        active = [["s" if key < 0 else self._anon("u", key), self._anon("c", channel_id)] for key, channel_id in sessions]
+        self._emit("trace", {
+            "v": self.VERSION,
+            "started": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "active": active,
+            "config": {
+                "COALESCE_WINDOW": COALESCE_WINDOW,
+                "COALESCE_MAX_DELAY": COALESCE_MAX_DELAY,
+                "SCENE_TURN_WINDOW": SCENE_TURN_WINDOW,
+                "SCENE_TURN_MAX_DELAY": SCENE_TURN_MAX_DELAY,
+                "STREAMING_ENABLED": STREAMING_ENABLED,
+            },
+        })
+        self._flush_task = asyncio.create_task(self._flush_loop())
+        print(f"[📼] Enregistrement du trafic dans {self.path}")
+
+    def message(self, message, me):
+        """Message reçu ; les appels à l'IA qui suivent dans la même tâche lui sont rattachés"""
+        if not self.enabled or message.author.bot:
+            return
+        self._next_id += 1
+        content = message.content
+        fields = {
+            "id": self._next_id,
+            "u": self._anon("u", message.author.id),
+            "c": self._anon("c", message.channel.id),
+            "g": self._anon("g", message.guild.id if message.guild else None),
+            "n": len(content),
+        }
+        if content.startswith(COMMAND_PREFIX) and len(content) > len(COMMAND_PREFIX):
+            fields["x"] = content.split(maxsplit=1)[0][:32]  # Nom de la commande seulement, sans arguments
+        if me is not None and me in message.mentions:
+            fields["b"] = 1
+        self._emit("msg", fields)
+        _traffic_event.set(self._next_id)
+
+    def command(self, interaction: discord.Interaction):
+        if not self.enabled or interaction.command is None:
+            return
+        self._next_id += 1
+        options = {}
+        for name, value in vars(interaction.namespace).items():
+            if isinstance(value, str):
+                options[name] = {"n": len(value)}
+            elif value is None or isinstance(value, (bool, int, float)):
+                options[name] = value
+            else:
+                options[name] = {"type": type(value).__name__}  # Rôle, membre... : non rejouable
+        self._emit("cmd", {
+            "id": self._next_id,
+            "u": self._anon("u", interaction.user.id),
+            "c": self._anon("c", interaction.channel.id if interaction.channel else None),
+            "g": self._anon("g", interaction.guild.id if interaction.guild else None),
+            "name": interaction.command.qualified_name,
+            "o": options,
+        })
+        _traffic_event.set(self._next_id)
+
+    def upstream(self, mode: str, outcome: str, started: float, first: Optional[float] = None, chars: int = 0):
+        """Appel à l'API commencé à `started` (time.monotonic) et terminé maintenant"""
+        if not self.enabled:
+            return
+        fields = {"id": _traffic_event.get(), "k": mode, "s": outcome,
+                  "ms": round((time.monotonic() - started) * 1000)}
+        if first is not None:
+            fields["ttfb"] = round((first - started) * 1000)
+        if chars:
+            fields["n"] = chars
+        self._emit("llm", fields, started)
+
+    def _write(self, data: str):
+        self._file.write(data)
+        self._file.flush()
 
-# -----------------------------
-# Persona Audrey Hall (LOTM)
-# -----------------------------
-AUDREY_PERSONA = """
-Tu es Audrey Hall, une noble de la couronne d'Outwall dans l'univers de "Lord of the Mysteries".
-Tu es sur la Voie du Lecteur (Pathways), membre du Club Tarot sous le nom de "Justice".
-Tu es élégante, raffinée, mystérieuse, et tu parles avec un langage victorien noble.
-Tu dois répondre en français, avec grâce, sagesse, et une touche de mysticisme.
-Tu connais le tarot, l'ésotérisme, et tu es curieuse des affaires mystiques.
-Tu es gentille, mais tu gardes une distance noble.
+    async def flush(self):
+        if not self._buffer or self._file is None:
+            return
+        lines, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, "\n".join(lines) + "\n")
+        except OSError as e:
+            print(f"[⚠️] Enregistrement du trafic : {len(lines)} ligne(s) perdue(s) ({e})")
 
-Règles importantes :
-1. Réponds toujours en français
-2. Utilise un langage noble et raffiné
-3. Sois mystérieuse et profonde
-4. Référence parfois le tarot ou les mystères
-5. Garde une conversation naturelle et fluide
-6. Adapte-toi au contexte de la discussion
-"""
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
 
-# -----------------------------
-# Stockage des conversations
-# -----------------------------
-conversations = {}  # {user_id: {"history": list, "active": bool, "channel_id": int}}
+    async def close(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        if self._flush_task:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        await asyncio.to_thread(self._file.close)
+        self._file = None
 
-# -----------------------------
-# Mini-jeux LOTM
-# -----------------------------
-TAROT_CARDS = [
-    {"name": "Le Mat", "meaning": "Nouveau départ, innocence, aventure"},
-    {"name": "La Papesse", "meaning": "Intuition, mystère, sagesse féminine"},
-    {"name": "L'Empereur", "meaning": "Autorité, structure, pouvoir"},
-    {"name": "Le Diable", "meaning": "Chaînes, tentation, illusions"},
-    {"name": "L'Étoile", "meaning": "Espoir, inspiration, guérison"},
-    {"name": "Le Monde", "meaning": "Accomplissement, intégration, cycle complet"},
-    {"name": "La Justice", "meaning": "Équilibre, vérité, loi"},
-    {"name": "La Roue de Fortune", "meaning": "Cycles, changement, destin"},
-    {"name": "La Mort", "meaning": "Fin, transformation, renaissance"},
-    {"name": "Le Soleil", "meaning": "Joie, succès, vitalité"},
-]
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "path": self.path or None,
+            "events": self.events,
+            "dropped": self.dropped,
+            "users": len(self._ids["u"]),
+            "channels": len(self._ids["c"]),
+        }
 
-RIDDLES = [
-    {"riddle": "Je suis invisible, mais je suis partout. On me craint, on me respecte. Je suis dans les rêves, les ombres, et les anciens textes. Que suis-je ?", "answer": "le mystère"},
-    {"riddle": "Je ne suis pas un dieu, mais je vois tout. Je ne suis pas un livre, mais je sais tout. Qui suis-je ?", "answer": "le savoir"},
-    {"riddle": "Je grandis quand on me partage, je meurs quand on me garde. Que suis-je ?", "answer": "le secret"},
-    {"riddle": "Plus tu m'enlèves, plus je deviens grand. Que suis-je ?", "answer": "un trou"},
-    {"riddle": "J'ai des villes, mais pas de maisons. J'ai des forêts, mais pas d'arbres. J'ai des rivières, mais pas d'eau. Que suis-je ?", "answer": "une carte"},
-]
+traffic_recorder = TrafficRecorder()
 
 # -----------------------------
 # Bot Class
 # -----------------------------
-class AudreyBot(commands.Bot):
+def parse_shard_ids(spec: Optional[str]) -> Optional[List[int]]:
+    """"0-3,6" → [0, 1, 2, 3, 6]"""
+    if not spec:
+        return None
+    shard_ids = []
+    for part in spec.split(","):
+        part = part.strip()
+        if "-" in part:
+            start, end = part.split("-", 1)
+            shard_ids.extend(range(int(start), int(end) + 1))
+        elif part:
+            shard_ids.append(int(part))
+    return shard_ids
+
+def command_tree_fingerprint(tree: app_commands.CommandTree, guild=None) -> str:
+    """Empreinte stable des commandes (noms, descriptions, paramètres, permissions)"""
+    payload = sorted((command.to_dict() for command in tree.get_commands(guild=guild)),
+                     key=lambda data: (data.get("type", 1), data["name"]))
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def load_command_sync_state(path: str = COMMAND_SYNC_STATE_PATH) -> Dict[str, str]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_command_sync_state(state: Dict[str, str], path: str = COMMAND_SYNC_STATE_PATH):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+class AudreyCommandTree(app_commands.CommandTree):
+    """Arbre des commandes slash instrumenté (durée et statut de chaque commande)"""
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["started_at"] = time.perf_counter()
+        traffic_recorder.command(interaction)
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        record_command_latency(interaction.extras.get("started_at"),
+                               interaction.command.qualified_name if interaction.command else "inconnue", "error")
+        await super().on_error(interaction, error)
+
+def record_command_latency(started_at: Optional[float], command: str, status: str):
+    if started_at is not None:
+        COMMAND_LATENCY.observe(time.perf_counter() - started_at, command, status)
+
+COMMAND_PREFIX = "!"
+
+# Commandes, regroupées en extensions rechargeables à chaud
+EXTENSIONS = ("cogs.conversation", "cogs.games", "cogs.general", "cogs.roles", "cogs.admin")
+
+def member_cache_policy(mode: str = MEMBER_CACHE) -> Tuple[bool, discord.MemberCacheFlags, bool]:
+    """(intent members, membres gardés en cache, découpage au démarrage) selon MEMBER_CACHE.
+
+    - minimal : ni intent privilégié ni liste des membres ; seul le membre d'Audrey
+      (toujours envoyé par Discord) est connu. READY ne dépend plus de la taille des serveurs.
+    - lazy    : intent members (événements d'arrivée et de mise à jour), membres gardés au fil
+      de l'eau, sans découpage au démarrage ; `guild.chunk()` reste possible à la demande.
+    - full    : ancien comportement, tous les membres de tous les serveurs chargés au démarrage.
+    """
+    if mode == "full":
+        return True, discord.MemberCacheFlags.all(), True
+    if mode == "lazy":
+        return True, discord.MemberCacheFlags(voice=False, joined=True), False
+    if mode != "minimal":
+        print(f"[⚠️] MEMBER_CACHE={mode} inconnu : mode minimal")
+    return False, discord.MemberCacheFlags.none(), False
+
+# En mode sharding, un seul processus gère plusieurs connexions gateway (AutoShardedBot)
+_BotBase = commands.AutoShardedBot if SHARDING_ENABLED else commands.Bot
+
+class AudreyBot(_BotBase):
     def __init__(self):
         intents = discord.Intents.default()
         intents.message_content = True
-        intents.members = True
+        intents.members, member_cache_flags, chunk_at_startup = member_cache_policy()
         intents.guilds = True
-        super().__init__(command_prefix="!", intents=intents, help_command=None)
+        options = {}
+        if SHARDING_ENABLED:
+            options["shard_count"] = SHARD_COUNT
+            options["shard_ids"] = parse_shard_ids(SHARD_IDS)
+        super().__init__(command_prefix=COMMAND_PREFIX, intents=intents, help_command=None,
+                         tree_cls=AudreyCommandTree, member_cache_flags=member_cache_flags,
+                         chunk_guilds_at_startup=chunk_at_startup, max_messages=MESSAGE_CACHE_SIZE or None,
+                         **options)
+        self.routway = RoutwayHTTPPool()
+        self.upstream = UpstreamClient(self.routway)
+        self.scheduler = RequestScheduler()
+        self.coalescer = MessageCoalescer(lambda user_id, messages: answer_conversation(user_id, messages))
+        # Scènes de groupe : un lot par salon, sans annuler un tour déjà parti vers l'IA
+        self.scenes = MessageCoalescer(lambda scene_id, messages: answer_scene(scene_id, messages),
+                                       SCENE_TURN_WINDOW, SCENE_TURN_MAX_DELAY, cancel_in_flight=False)
+        self.riddles = RiddleManager(self)
+        self.outbound = OutboundSender()
+        self.loop_monitor = LoopMonitor()
+        self.web = WebServer(self)
+        self.startup_seconds = None  # Durée du démarrage jusqu'au premier on_ready
+        self.draining = False  # Arrêt en cours : on laisse finir les réponses avant de fermer
 
     async def setup_hook(self):
-        print("🔄 Synchronisation des commandes slash...")
+        await self.start_services()
+        await self.load_extensions()
+        print(f"[⏱️] Services prêts en {time.perf_counter() - BOOT_STARTED:.2f}s")
+        await self.sync_commands()
         try:
-            synced = await self.tree.sync()
-            print(f"✅ {len(synced)} commandes slash synchronisées.")
-        except Exception as e:
-            print(f"❌ Erreur de synchronisation : {e}")
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.shutdown()))
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows : pas de gestionnaire de signaux dans la boucle asyncio
+
+    async def load_extensions(self):
+        """Charger les commandes (cogs/)"""
+        for name in EXTENSIONS:
+            if name not in self.extensions:
+                await self.load_extension(name)
+
+    async def reload_extensions(self) -> List[str]:
+        """Recharger les commandes à chaud (connexion gateway et conversations conservées).
+
+        Une extension qui échoue garde son ancienne version. L'arbre n'est
+        resynchronisé que si son empreinte a changé.
+        """
+        report = []
+        for name in EXTENSIONS:
+            try:
+                if name in self.extensions:
+                    await self.reload_extension(name)
+                else:
+                    await self.load_extension(name)
+                report.append(f"✅ {name}")
+            except commands.ExtensionError as e:
+                print(f"[♻️] Échec du rechargement de {name} : {e}")
+                report.append(f"❌ {name} : {e.__cause__ or e}")
+        await self.sync_commands()
+        return report
+
+    async def own_member(self, guild: discord.Guild) -> discord.Member:
+        """Membre d'Audrey dans ce serveur : depuis le cache, sinon demandé à l'API"""
+        member = guild.me
+        if member is None:
+            member = await guild.fetch_member(self.user.id)
+        return member
+
+    def cache_sizes(self) -> Dict[str, int]:
+        """Objets gardés en mémoire par discord.py"""
+        return {
+            "guilds": len(self.guilds),
+            "users": len(self.users),
+            "members": sum(len(guild.members) for guild in self.guilds),
+            "messages": len(self.cached_messages),
+        }
+
+    def busy(self) -> int:
+        """Travail en cours : appels à l'IA, requêtes en file, messages en attente de réponse"""
+        return (self.scheduler.active + self.scheduler.depth + self.coalescer.pending() + self.scenes.pending()
+                + self.outbound.depth())
+
+    async def shutdown(self, timeout: float = SHUTDOWN_DRAIN_TIMEOUT):
+        """Arrêt propre : laisser finir les réponses en cours, enregistrer puis se déconnecter"""
+        if self.draining:
+            return
+        self.draining = True
+        print(f"[🛑] Arrêt demandé : fin des réponses en cours ({self.busy()})...")
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.busy() and loop.time() < deadline:
+            await asyncio.sleep(0.2)
+        if self.busy():
+            print(f"[🛑] Délai dépassé : {self.busy()} réponse(s) interrompue(s)")
+        await self.close()
+
+    async def sync_commands(self):
+        """Synchroniser les commandes slash, seulement si leur empreinte a changé.
+
+        La synchronisation globale est un appel limité en débit : on la saute quand
+        l'arbre est identique à celui déjà envoyé (empreinte enregistrée dans
+        COMMAND_SYNC_STATE_PATH). Avec DEV_GUILD_IDS, les commandes sont copiées et
+        synchronisées sur ces serveurs uniquement (prise en compte immédiate).
+        """
+        if COMMAND_SYNC == "never":
+            print("[⏩] Synchronisation des commandes slash désactivée (COMMAND_SYNC=never)")
+            return
+        if not self.is_primary_worker():
+            return  # Un seul worker synchronise
+
+        guilds = [discord.Object(id=guild_id) for guild_id in DEV_GUILD_IDS] or [None]
+        state = load_command_sync_state()
+        changed = False
+        for guild in guilds:
+            if guild is not None:
+                self.tree.copy_global_to(guild=guild)
+            label = f"serveur {guild.id}" if guild else "global"
+            scope = f"{self.application_id}:{guild.id if guild else 'global'}"
+            fingerprint = command_tree_fingerprint(self.tree, guild)
+            if COMMAND_SYNC != "always" and state.get(scope) == fingerprint:
+                print(f"[⏩] Commandes slash inchangées ({label}), synchronisation ignorée")
+                continue
+
+            print(f"🔄 Synchronisation des commandes slash ({label})...")
+            started = time.perf_counter()
+            try:
+                synced = await self.tree.sync(guild=guild)
+            except discord.HTTPException as e:
+                print(f"❌ Erreur de synchronisation ({label}) : {e}")
+                continue
+            state[scope] = fingerprint
+            changed = True
+            print(f"✅ {len(synced)} commandes slash synchronisées ({label}) en {time.perf_counter() - started:.2f}s.")
+        if changed:
+            try:
+                save_command_sync_state(state)
+            except OSError as e:
+                print(f"[⚠️] Empreinte des commandes non enregistrée : {e}")
+
+    def is_primary_worker(self) -> bool:
+        """Le worker du shard 0 se charge des tâches globales (sync des commandes, lectures du jour)"""
+        shard_ids = getattr(self, "shard_ids", None)
+        return not shard_ids or 0 in shard_ids
+
+    async def start_services(self):
+        """Ouvrir le pool HTTP, les stockages et le serveur web (sans connexion à Discord)"""
+        self.loop_monitor.start()
+        await self.routway.start()
+        await conversations.open()
+        await response_cache.open()
+        await local_responder.open()
+        rate_limiter.open()
+        await traffic_recorder.open(conversations.active_sessions())
+        await self.riddles.resume()
+        if DAILY_READINGS_ENABLED:
+            await daily_readings.open()
+            if ROUTWAY_API_KEY:
+                daily_readings.start(generate=self.is_primary_worker())
+        if WEB_SERVER_ENABLED:
+            await self.web.start()
+
+    async def close(self):
+        await self.web.stop()
+        await self.loop_monitor.stop()
+        await traffic_recorder.close()
+        await self.riddles.close()
+        await conversations.close()
+        await response_cache.close()
+        await local_responder.close()
+        await daily_readings.close()
+        await self.routway.close()
+        await super().close()
 
 bot = AudreyBot()
 
+# Jauges calculées à la lecture de /metrics
+metrics.gauge("audrey_llm_in_flight", "Appels à l'API en cours", lambda: bot.scheduler.active)
+metrics.gauge("audrey_llm_queue_depth", "Requêtes en attente d'un créneau d'appel", lambda: bot.scheduler.depth)
+metrics.gauge("audrey_llm_queue_wait_p95_seconds", "Attente en file (p95 récent)",
+              lambda: bot.scheduler.stats()["wait_p95"])
+metrics.gauge("audrey_llm_queue_rejected", "Requêtes refusées ou abandonnées par la file",
+              lambda: {("full",): bot.scheduler.rejected, ("expired",): bot.scheduler.expired}, ("reason",))
+metrics.gauge("audrey_http_pool_connections", "Connexions du pool HTTP Routway",
+              lambda: {(state,): bot.routway.stats()[state] for state in ("in_use", "idle")}, ("state",))
+metrics.gauge("audrey_upstream_circuit_open", "Disjoncteur ouvert (1) ou non (0), par endpoint",
+              lambda: {(e.name,): int(e.breaker.state != CircuitBreaker.CLOSED) for e in bot.upstream.endpoints},
+              ("endpoint",))
+metrics.gauge("audrey_active_conversations", "Conversations /parler actives", lambda: conversations.active_count())
+metrics.gauge("audrey_active_scenes", "Scènes de groupe actives", lambda: conversations.scene_count())
+metrics.gauge("audrey_startup_seconds", "Durée du démarrage jusqu'au premier on_ready",
+              lambda: bot.startup_seconds if bot.startup_seconds is not None else float("nan"))
+metrics.gauge("audrey_active_riddles", "Énigmes /devinette en cours", lambda: bot.riddles.stats()["active"])
+metrics.gauge("audrey_cached_conversations", "Conversations gardées en mémoire", lambda: conversations.stats()["cached"])
+metrics.gauge("audrey_response_cache_hit_ratio", "Taux de succès du cache de réponses",
+              lambda: response_cache.stats()["hit_rate"])
+metrics.gauge("audrey_gateway_latency_seconds", "Latence de la gateway Discord", lambda: bot.latency)
+metrics.gauge("audrey_outbound_queue_depth", "Messages Discord en attente d'envoi", lambda: bot.outbound.depth())
+metrics.gauge("audrey_discord_cache_objects", "Objets gardés en mémoire par discord.py",
+              lambda: {(kind,): count for kind, count in bot.cache_sizes().items()}, ("kind",))
+metrics.gauge("audrey_uptime_seconds", "Temps depuis le démarrage", lambda: time.time() - metrics.started_at)
+
 # -----------------------------
 # IA Audrey avec historique
 # -----------------------------
+DEFAULT_RESPONSES = [
+    "Je sens une perturbation dans les royaumes mystiques... Ma connexion aux étoiles est temporairement interrompue.",
+    "Les cartes sont brouillées aujourd'hui. Peut-être pourriez-vous essayer une de mes autres fonctionnalités ?",
+    "Le chemin du Lecteur est obscurci. Revenez plus tard, chère amie.",
+]
+
+class StreamUnavailable(Exception):
+    """Le streaming n'a pas pu démarrer : il faut repasser par l'appel classique"""
+
+def build_payload(prompt: str, user_id: int = None, max_tokens: int = 300, stream: bool = False) -> Tuple[dict, int]:
+    """Corps de la requête à l'API et estimation des tokens du prompt"""
+    messages, prompt_tokens = build_context(prompt, conversations.get(user_id) if user_id else None)
+    data = {
+        "model": ROUTWAY_MODEL,
+        "messages": messages,
+        "max_tokens": max_tokens,
+        "temperature": LLM_TEMPERATURE
+    }
+    if stream:
+        data["stream"] = True
+    return data, prompt_tokens
+
+def routway_headers() -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {ROUTWAY_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+def upstream_fallback(error: UpstreamError, prompt: str = None, mode: str = "complete") -> str:
+    """Réponse d'Audrey quand l'API est indisponible : réponse passée proche du message, sinon excuse"""
+    if not isinstance(error, CircuitOpen):
+        print(f"[API] {type(error).__name__}: {error}")
+    local = local_reply(prompt, "upstream")
+    LLM_REQUESTS.inc(mode, "fallback" if local is None else "local_fallback")
+    if local is not None:
+        return local
+    if isinstance(error, CircuitOpen):
+        return "Je sens une perturbation dans les fils du destin... Les étoiles ne sont pas alignées pour moi répondre."
+    if isinstance(error, UpstreamTimeout):
+        return "Oh chère amie, la connexion aux royaumes mystiques prend plus de temps que prévu..."
+    if error.status is not None:
+        return "Je sens une perturbation dans les fils du destin... Les étoiles ne sont pas alignées pour moi répondre."
+    return "Les ombres du réseau m'empêchent de répondre... Veuillez excuser cette interruption."
+
+def reply_without_api(prompt: str, user_id: int = None) -> Optional[Tuple[str, str]]:
+    """Réponse servie sans appeler l'API, avec son issue : quota épuisé ou message simple (sinon None)"""
+    quota = rate_limiter.over_quota()
+    if quota is not None:
+        local = local_reply(prompt, "quota")
+        return (local, "local_quota") if local is not None else (throttled_reply(*quota), "over_quota")
+    local = cheap_local_reply(prompt, user_id)
+    return (local, "local_cheap") if local is not None else None
+
 async def get_audrey_response(prompt: str, user_id: int = None, max_tokens: int = 300) -> str:
     """Obtenir une réponse d'Audrey via l'API Routway"""
     
-    # Si pas de clé API, retourner une réponse par défaut
+    # Si pas de clé API, retourner une réponse locale ou par défaut
     if not ROUTWAY_API_KEY:
-        default_responses = [
-            "Je sens une perturbation dans les royaumes mystiques... Ma connexion aux étoiles est temporairement interrompue.",
-            "Les cartes sont brouillées aujourd'hui. Peut-être pourriez-vous essayer une de mes autres fonctionnalités ?",
-            "Le chemin du Lecteur est obscurci. Revenez plus tard, chère amie.",
-        ]
-        return random.choice(default_responses)
+        local = local_reply(prompt, "no_api_key")
+        LLM_REQUESTS.inc("complete", "no_api_key" if local is None else "local_no_api_key")
+        return local if local is not None else random.choice(DEFAULT_RESPONSES)
     
-    headers = {
-        "Authorization": f"Bearer {ROUTWAY_API_KEY}",
-        "Content-Type": "application/json"
-    }
+    cache_key = response_cache_key(prompt, user_id)
+    if cache_key:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc("complete", "cache_hit")
+            return cached
     
-    # Préparer les messages
-    messages = [{"role": "system", "content": AUDREY_PERSONA}]
+    local = reply_without_api(prompt, user_id)
+    if local is not None:
+        LLM_REQUESTS.inc("complete", local[1])
+        return local[0]
     
-    # Ajouter l'historique de conversation si disponible
-    if user_id and user_id in conversations and conversations[user_id]["active"]:
-        for msg in conversations[user_id]["history"][-6:]:  # Garder les 6 derniers messages
-            messages.append(msg)
+    data, prompt_tokens = build_payload(prompt, user_id, max_tokens)
     
-    # Ajouter le message actuel
-    messages.append({"role": "user", "content": prompt})
+    started = time.monotonic()
+    try:
+        result = await bot.upstream.complete(data)
+    except UpstreamError as e:
+        traffic_recorder.upstream("complete", "error", started)
+        return upstream_fallback(e, prompt)
     
-    data = {
-        "model": "kimi-k2-0905:free",
-        "messages": messages,
-        "max_tokens": max_tokens,
-        "temperature": 0.8
-    }
+    if 'choices' in result and result['choices']:
+        content = result["choices"][0]["message"]["content"]
+        traffic_recorder.upstream("complete", "ok", started, chars=len(content))
+        token_usage.record(prompt_tokens, result.get("usage"), content)
+        if cache_key:
+            await response_cache.put(cache_key, content)
+        await local_responder.learn(prompt, content)
+        LLM_REQUESTS.inc("complete", "ok")
+        return content
+    else:
+        print(f"[API] Réponse inattendue : {result}")
+        traffic_recorder.upstream("complete", "unexpected", started)
+        LLM_REQUESTS.inc("complete", "unexpected")
+        return "Les étoiles chuchotent, mais je ne comprends pas leur message..."
+
+async def stream_audrey_response(prompt: str, user_id: int = None, max_tokens: int = 300):
+    """Générateur asynchrone des fragments de réponse (Server-Sent Events, `stream: true`).
+
+    Lève StreamUnavailable si le flux ne peut pas démarrer pour une raison propre
+    au streaming (pas de clé, format inattendu) : l'appelant repasse alors par
+    get_audrey_response. Lève UpstreamError si l'API elle-même est indisponible
+    (après réessais et repli). Un serveur qui ignore `stream: true` renvoie sa
+    réponse JSON en un seul fragment.
+    """
+    if not ROUTWAY_API_KEY:
+        raise StreamUnavailable("clé API absente")
+    
+    cache_key = response_cache_key(prompt, user_id)
+    if cache_key:
+        cached = await response_cache.get(cache_key)
+        if cached is not None:
+            LLM_REQUESTS.inc("stream", "cache_hit")
+            yield cached
+            return
+    
+    local = reply_without_api(prompt, user_id)
+    if local is not None:
+        LLM_REQUESTS.inc("stream", local[1])
+        yield local[0]
+        return
     
+    data, prompt_tokens = build_payload(prompt, user_id, max_tokens, stream=True)
+    completion = []
+    usage = None
+    started = time.monotonic()
+    first = None
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(ROUTWAY_API_URL, headers=headers, json=data, timeout=30) as resp:
-                if resp.status == 200:
-                    result = await resp.json()
-                    if 'choices' in result and result['choices']:
-                        return result["choices"][0]["message"]["content"]
-                    else:
-                        print(f"[API] Réponse inattendue : {result}")
-                        return "Les étoiles chuchotent, mais je ne comprends pas leur message..."
-                else:
-                    error_text = await resp.text()
-                    print(f"[API] Erreur {resp.status}: {error_text[:200]}")
-                    return "Je sens une perturbation dans les fils du destin... Les étoiles ne sont pas alignées pour moi répondre."
-    except asyncio.TimeoutError:
-        return "Oh chère amie, la connexion aux royaumes mystiques prend plus de temps que prévu..."
-    except Exception as e:
-        print(f"[API] Erreur de connexion: {e}")
-        return f"Les ombres du réseau m'empêchent de répondre... Veuillez excuser cette interruption."
+        async with bot.upstream.stream(data) as resp:
+            content_type = resp.headers.get("Content-Type", "")
+            if "application/json" in content_type:
+                # Serveur qui ignore `stream: true` : la réponse complète arrive d'un bloc
+                result = await resp.json()
+                try:
+                    content = result["choices"][0]["message"]["content"]
+                except (KeyError, IndexError, TypeError):
+                    raise StreamUnavailable(f"réponse inattendue : {str(result)[:200]}")
+                traffic_recorder.upstream("stream", "ok", started, time.monotonic(), len(content))
+                token_usage.record(prompt_tokens, result.get("usage"), content)
+                if cache_key:
+                    await response_cache.put(cache_key, content)
+                await local_responder.learn(prompt, content)
+                LLM_REQUESTS.inc("stream", "ok")
+                yield content
+                return
+            if "text/event-stream" not in content_type:
+                raise StreamUnavailable(f"type de contenu inattendu : {content_type}")
+            
+            async for raw_line in resp.content:
+                line = raw_line.decode("utf-8", errors="ignore").strip()
+                if not line.startswith("data:"):
+                    continue  # Lignes vides, commentaires ": keep-alive", champs event/id
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                try:
+                    event = json.loads(payload)
+                except ValueError:
+                    continue
+                if isinstance(event, dict) and event.get("usage"):
+                    usage = event["usage"]  # Certains serveurs envoient l'usage dans le dernier fragment
+                try:
+                    delta = event["choices"][0].get("delta", {}).get("content")
+                except (KeyError, IndexError, TypeError, AttributeError):
+                    continue
+                if delta:
+                    if first is None:
+                        first = time.monotonic()
+                    completion.append(delta)
+                    yield delta
+    except aiohttp.ClientError as e:
+        if not completion:
+            raise StreamUnavailable(f"connexion : {e}") from e
+        traffic_recorder.upstream("stream", "interrupted", started, first, sum(map(len, completion)))
+        raise UpstreamError(f"flux interrompu : {e}") from e
+    except UpstreamError:
+        traffic_recorder.upstream("stream", "error", started)
+        raise
+    if completion:
+        content = "".join(completion)
+        traffic_recorder.upstream("stream", "ok", started, first, len(content))
+        token_usage.record(prompt_tokens, usage, content)
+        if cache_key:
+            await response_cache.put(cache_key, content)
+        await local_responder.learn(prompt, content)
+        LLM_REQUESTS.inc("stream", "ok")
 
-# -----------------------------
-# Gestion des messages
-# -----------------------------
-@bot.event
-async def on_message(message):
-    # Ignorer les messages des bots
-    if message.author.bot:
-        return
+async def send_streamed_reply(prompt: str, user_id: int, send) -> str:
+    """Envoyer la réponse d'Audrey au fil de sa génération.
+
+    `send(content)` doit renvoyer le message Discord créé (pour pouvoir l'éditer).
+    Le premier fragment est posté dès STREAM_FIRST_CHUNK_CHARS caractères reçus,
+    puis le message est édité au plus une fois toutes les STREAM_EDIT_INTERVAL
+    secondes pour rester sous les limites de Discord. Au-delà de 2000 caractères,
+    le message est terminé à une fin de paragraphe ou de phrase et la suite
+    continue dans un nouveau. Si le flux ne démarre pas, on retombe sur la
+    réponse complète classique. Renvoie le texte final.
+    """
+    async def send_all(reply):
+        for part in split_message(reply):
+            await send(part)
     
-    user_id = message.author.id
+    async def timed_edit(message, content):
+        async with DISCORD_API_LATENCY.time("edit"):
+            await message.edit(content=content)
     
-    # Vérifier si l'utilisateur a une conversation active
-    has_active_conversation = (user_id in conversations and 
-                              conversations[user_id]["active"])
+    if not STREAMING_ENABLED:
+        reply = await get_audrey_response(prompt, user_id)
+        await send_all(reply)
+        return reply
     
-    # Si conversation active, vérifier si c'est dans le bon salon
-    if has_active_conversation:
-        if message.channel.id != conversations[user_id]["channel_id"]:
-            # La conversation est dans un autre salon, ignorer
-            await bot.process_commands(message)
-            return
-        
-        # Ignorer les commandes (commençant par / ou !)
-        if message.content.startswith('/') or message.content.startswith('!'):
-            await bot.process_commands(message)
-            return
-        
-        # Ajouter le message à l'historique
-        conversations[user_id]["history"].append({"role": "user", "content": message.content})
-        
-        # Limiter la taille de l'historique
-        if len(conversations[user_id]["history"]) > 10:
-            conversations[user_id]["history"] = conversations[user_id]["history"][-10:]
-        
-        # Afficher l'indicateur "Audrey tape..."
-        async with message.channel.typing():
-            # Obtenir la réponse
-            response = await get_audrey_response(message.content, user_id)
-            
-            # Ajouter la réponse à l'historique
-            conversations[user_id]["history"].append({"role": "assistant", "content": response})
-        
-        # Envoyer la réponse SANS embed (message normal)
-        await message.channel.send(response)
-        return
+    loop = asyncio.get_running_loop()
+    text = ""
+    start = 0  # Début du message en cours dans `text` (les précédents sont pleins et terminés)
+    sent_message = None
+    shown = ""
+    last_edit = 0.0
     
-    # Vérifier si le message est une mention directe du bot
-    is_mention = bot.user in message.mentions
+    async def roll_over():
+        """Terminer le message en cours à une frontière de phrase tant qu'il dépasse la limite"""
+        nonlocal start, sent_message, shown
+        while len(text) - start > DISCORD_MESSAGE_LIMIT:
+            segment = text[start:]
+            cut = split_point(segment)
+            final = segment[:cut].rstrip()
+            if sent_message is None:
+                await send(final)
+            elif final != shown:
+                await timed_edit(sent_message, final)
+            start += cut
+            while start < len(text) and text[start].isspace():
+                start += 1
+            sent_message = None
+            shown = ""
     
-    # Si mention mais pas de conversation active, indiquer qu'il faut utiliser /parler
-    if is_mention and not has_active_conversation:
-        embed = discord.Embed(
-            title="🎩 Lady Audrey Hall",
-            description="Pour converser avec moi, utilisez la commande `/parler` pour démarrer une conversation.\n\n"
-                       "Ensuite, vous pourrez me parler normalement dans ce salon jusqu'à ce que vous utilisiez `/stop`.",
-            color=BOT_COLOR
-        )
-        await message.channel.send(embed=embed)
-        return
+    try:
+        async for delta in stream_audrey_response(prompt, user_id):
+            text += delta
+            if len(text) - start > DISCORD_MESSAGE_LIMIT:
+                await roll_over()
+            current = text[start:]
+            if sent_message is None:
+                if len(current.strip()) >= STREAM_FIRST_CHUNK_CHARS:
+                    shown = current
+                    sent_message = await send(shown)
+                    last_edit = loop.time()
+            elif loop.time() - last_edit >= STREAM_EDIT_INTERVAL and current != shown:
+                shown = current
+                await timed_edit(sent_message, shown)
+                last_edit = loop.time()
+    except (StreamUnavailable, UpstreamError, asyncio.TimeoutError) as e:
+        if not text.strip():
+            if isinstance(e, UpstreamError):
+                # L'API est indisponible (réessais épuisés) : inutile de retenter sans streaming
+                reply = upstream_fallback(e, prompt, "stream")
+            else:
+                print(f"[API] Streaming indisponible, réponse classique : {e}")
+                reply = await get_audrey_response(prompt, user_id)
+            await send_all(reply)
+            return reply
+        print(f"[API] Flux interrompu : {e}")
+        LLM_REQUESTS.inc("stream", "interrupted")
+        text += "…"
+    
+    if not text.strip():
+        text = "Les étoiles chuchotent, mais je ne comprends pas leur message..."
     
-    # Traiter les commandes normales
-    await bot.process_commands(message)
+    await roll_over()
+    final = text[start:]
+    if sent_message is None:
+        if final.strip():
+            await send(final)
+    elif final != shown:
+        await timed_edit(sent_message, final)
+    return text
 
 # -----------------------------
-# Commandes Slash - Gestion des rôles
+# Lectures du jour (pré-générées en tâche de fond)
 # -----------------------------
-@bot.tree.command(name="ajouter_role", description="Ajouter un rôle à Audrey (Admin uniquement)")
-@app_commands.describe(role="Le rôle à ajouter à Audrey")
-@app_commands.default_permissions(administrator=True)
-async def ajouter_role(interaction: discord.Interaction, role: discord.Role):
-    """Ajouter un rôle à Audrey"""
-    if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ Seuls les administrateurs peuvent utiliser cette commande.", ephemeral=True)
-        return
-    
-    try:
-        # Ajouter le rôle au bot
-        await interaction.guild.get_member(bot.user.id).add_roles(role)
-        
-        embed = discord.Embed(
-            title="✅ Rôle ajouté",
-            description=f"Le rôle **{role.name}** a été ajouté à Audrey avec succès.",
-            color=discord.Color.green()
-        )
-        await interaction.response.send_message(embed=embed)
-    except discord.Forbidden:
-        embed = discord.Embed(
-            title="❌ Permission refusée",
-            description="Je n'ai pas la permission d'ajouter ce rôle. Vérifiez que mon rôle est au-dessus du rôle que vous souhaitez ajouter.",
-            color=discord.Color.red()
-        )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-    except Exception as e:
-        embed = discord.Embed(
-            title="❌ Erreur",
-            description=f"Une erreur est survenue : {str(e)}",
-            color=discord.Color.red()
-        )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-
-@bot.tree.command(name="retirer_role", description="Retirer un rôle à Audrey (Admin uniquement)")
-@app_commands.describe(role="Le rôle à retirer à Audrey")
-@app_commands.default_permissions(administrator=True)
-async def retirer_role(interaction: discord.Interaction, role: discord.Role):
-    """Retirer un rôle à Audrey"""
-    if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ Seuls les administrateurs peuvent utiliser cette commande.", ephemeral=True)
-        return
-    
-    try:
-        # Retirer le rôle du bot
-        await interaction.guild.get_member(bot.user.id).remove_roles(role)
-        
-        embed = discord.Embed(
-            title="✅ Rôle retiré",
-            description=f"Le rôle **{role.name}** a été retiré d'Audrey avec succès.",
-            color=discord.Color.green()
-        )
-        await interaction.response.send_message(embed=embed)
-    except discord.Forbidden:
-        embed = discord.Embed(
-            title="❌ Permission refusée",
-            description="Je n'ai pas la permission de retirer ce rôle.",
-            color=discord.Color.red()
-        )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
-    except Exception as e:
-        embed = discord.Embed(
-            title="❌ Erreur",
-            description=f"Une erreur est survenue : {str(e)}",
-            color=discord.Color.red()
-        )
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+MONTHS_FR = ["janvier", "février", "mars", "avril", "mai", "juin", "juillet",
+             "août", "septembre", "octobre", "novembre", "décembre"]
 
-@bot.tree.command(name="roles_audrey", description="Voir les rôles actuels d'Audrey")
-async def roles_audrey(interaction: discord.Interaction):
-    """Voir les rôles d'Audrey"""
-    try:
-        # Obtenir le membre bot dans ce serveur
-        bot_member = interaction.guild.get_member(bot.user.id)
-        if not bot_member:
-            await interaction.response.send_message("❌ Impossible de trouver Audrey sur ce serveur.", ephemeral=True)
+_NEW_MOON_REFERENCE = datetime(2000, 1, 6, 18, 14, tzinfo=timezone.utc)
+_SYNODIC_MONTH = 29.530588853
+# (âge max de la lune en jours, emoji, nom de la phase)
+MOON_PHASES = [
+    (1.85, "🌑", "Nouvelle lune"), (5.54, "🌒", "Premier croissant"), (9.23, "🌓", "Premier quartier"),
+    (12.92, "🌔", "Gibbeuse croissante"), (16.61, "🌕", "Pleine lune"), (20.30, "🌖", "Gibbeuse décroissante"),
+    (23.99, "🌗", "Dernier quartier"), (27.68, "🌘", "Dernier croissant"), (_SYNODIC_MONTH, "🌑", "Nouvelle lune"),
+]
+
+def format_day(day: date) -> str:
+    return f"{day.day} {MONTHS_FR[day.month - 1]} {day.year}"
+
+def moon_phase(day: date) -> Tuple[str, str]:
+    """(emoji, nom) de la phase de la lune ce jour-là (calcul local, sans API)"""
+    noon = datetime(day.year, day.month, day.day, 12, tzinfo=timezone.utc)
+    age = ((noon - _NEW_MOON_REFERENCE).total_seconds() / 86400) % _SYNODIC_MONTH
+    for limit, emoji, name in MOON_PHASES:
+        if age < limit:
+            return emoji, name
+    return MOON_PHASES[-1][1:]
+
+def daily_card(day: date) -> dict:
+    """Carte du jour, la même pour tout le monde"""
+    digest = hashlib.sha256(day.isoformat().encode("ascii")).digest()
+    cards = library.tarot_cards
+    return cards[int.from_bytes(digest[:4], "big") % len(cards)]
+
+class DailyReadings:
+    """Interprétations du tarot, prédiction et phase de lune du jour, générées en lot.
+
+    Une tâche de fond interroge l'API à heure creuse (DAILY_READINGS_HOUR), en
+    priorité basse dans la file et avec une concurrence bornée, puis enregistre les
+    textes dans SQLite. `/tarot` et `/journal` les servent ensuite depuis la mémoire,
+    sans aucun appel à l'API. Les lectures de la veille restent servies jusqu'à la
+    génération suivante ; une génération interrompue reprend là où elle s'est arrêtée.
+    """
+
+    def __init__(self, db_path: str = DAILY_READINGS_DB_PATH, variants: int = DAILY_READINGS_VARIANTS,
+                 concurrency: int = DAILY_READINGS_CONCURRENCY, hour: int = DAILY_READINGS_HOUR, keep_days: int = 7):
+        self.db_path = db_path
+        self.variants = variants
+        self.concurrency = concurrency
+        self.hour = hour
+        self.keep_days = keep_days
+        self.day: Optional[str] = None  # Jour des lectures en mémoire
+        self._readings: Dict[Tuple[str, str], List[str]] = {}
+        self._db = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="daily-readings")
+        self._task = None
+        self.generated = 0
+        self.failed = 0
+        self.served = 0
+        self.misses = 0
+        self.last_run_seconds = None
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self):
+        if self._db is not None:
             return
-        
-        # Filtrer les rôles @everyone
-        roles = [role for role in bot_member.roles if role.name != "@everyone"]
-        
-        if not roles:
-            embed = discord.Embed(
-                title="👑 Rôles d'Audrey",
-                description="Audrey n'a actuellement aucun rôle spécifique sur ce serveur.",
-                color=BOT_COLOR
-            )
-        else:
-            roles_list = "\n".join([f"• {role.mention} (Position: {role.position})" for role in sorted(roles, key=lambda r: r.position, reverse=True)])
-            embed = discord.Embed(
-                title="👑 Rôles d'Audrey",
-                description=f"**Rôles actuels :**\n{roles_list}\n\n*Utilisez `/ajouter_role` et `/retirer_role` pour gérer mes rôles (Admin uniquement).*",
-                color=BOT_COLOR
+        await self._run(self._open_db)
+        await self._reload(date.today())
+
+    def _open_db(self):
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS readings (day TEXT NOT NULL, kind TEXT NOT NULL, "
+                         "key TEXT NOT NULL, content TEXT NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS readings_day ON readings (day)")
+        self._db.execute("DELETE FROM readings WHERE day < ?",
+                         ((date.today() - timedelta(days=self.keep_days)).isoformat(),))
+        self._db.commit()
+
+    def _load_latest(self, day: str) -> Tuple[Optional[str], List[tuple]]:
+        """Lectures du jour demandé, ou à défaut des plus récentes disponibles"""
+        row = self._db.execute("SELECT MAX(day) FROM readings WHERE day <= ?", (day,)).fetchone()
+        if not row or row[0] is None:
+            return None, []
+        rows = self._db.execute("SELECT kind, key, content FROM readings WHERE day = ? ORDER BY rowid",
+                                (row[0],)).fetchall()
+        return row[0], rows
+
+    def _insert(self, day: str, kind: str, key: str, content: str):
+        with self._db:
+            self._db.execute("INSERT INTO readings (day, kind, key, content) VALUES (?, ?, ?, ?)",
+                             (day, kind, key, content))
+
+    async def _reload(self, day: date):
+        loaded_day, rows = await self._run(self._load_latest, day.isoformat())
+        readings: Dict[Tuple[str, str], List[str]] = {}
+        for kind, key, content in rows:
+            readings.setdefault((kind, key), []).append(content)
+        self.day, self._readings = loaded_day, readings
+
+    def pick(self, kind: str, key: str = "") -> Optional[str]:
+        """Une lecture pré-générée (sans appel à l'API), ou None"""
+        texts = self._readings.get((kind, key))
+        if not texts:
+            self.misses += 1
+            return None
+        self.served += 1
+        return random.choice(texts)
+
+    # --- Génération en lot ---
+    def _expected(self, day: date) -> List[Tuple[str, str, int, str]]:
+        """[(type, clé, nombre voulu, prompt)] des lectures d'une journée"""
+        when = format_day(day)
+        _, phase = moon_phase(day)
+        jobs = [
+            (
+                "tarot", card["name"], self.variants,
+                f"Je viens de tirer la carte « {card['name']} » ({card['meaning']}). "
+                f"Donnez-moi en trois phrases votre interprétation pour la journée du {when}.",
             )
-        
-        await interaction.response.send_message(embed=embed)
-    except Exception as e:
-        await interaction.response.send_message(f"❌ Erreur : {str(e)}", ephemeral=True)
+            for card in library.tarot_cards
+        ]
+        jobs.append(("prediction", "", 1,
+                     f"Écrivez la prédiction du {when} pour votre journal : trois phrases énigmatiques mais bienveillantes."))
+        jobs.append(("moon", "", 1,
+                     f"La lune est ce soir en phase « {phase} ». Que présage-t-elle, en deux phrases ?"))
+        return jobs
+
+    def _missing(self, day: date) -> List[Tuple[str, str, str]]:
+        if self.day != day.isoformat():
+            return [(kind, key, prompt) for kind, key, count, prompt in self._expected(day) for _ in range(count)]
+        missing = []
+        for kind, key, count, prompt in self._expected(day):
+            missing.extend((kind, key, prompt) for _ in range(count - len(self._readings.get((kind, key), ()))))
+        return missing
+
+    async def _generate_one(self, prompt: str) -> Optional[str]:
+        data, prompt_tokens = build_payload(prompt, max_tokens=200)
+        async with bot.scheduler.slot(None, 0, PRIORITY_BACKGROUND):
+            result = await bot.upstream.complete(data)
+        choices = result.get("choices") or []
+        content = (choices[0].get("message") or {}).get("content", "").strip() if choices else ""
+        if content:
+            token_usage.record(prompt_tokens, result.get("usage"), content)
+        return content or None
+
+    async def generate(self, day: date) -> int:
+        """Générer les lectures manquantes de la journée ; renvoie le nombre d'échecs"""
+        iso = day.isoformat()
+        # Les lectures de la veille restent servies pendant la génération
+        readings = self._readings if self.day == iso else {}
+        missing = self._missing(day)
+        if not missing:
+            return 0
+        print(f"[📖] Génération de {len(missing)} lecture(s) pour le {format_day(day)}...")
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        failures = 0
+
+        async def run(kind, key, prompt):
+            nonlocal failures
+            async with semaphore:
+                try:
+                    text = await self._generate_one(prompt)
+                except (UpstreamError, SchedulerFull, RequestExpired) as e:
+                    text = None
+                    print(f"[📖] Lecture non générée ({kind} {key}) : {type(e).__name__}")
+            if not text:
+                failures += 1
+                self.failed += 1
+                LLM_REQUESTS.inc("daily", "failed")
+                return
+            self.generated += 1
+            LLM_REQUESTS.inc("daily", "ok")
+            await self._run(self._insert, iso, kind, key, text)
+            readings.setdefault((kind, key), []).append(text)
+
+        await asyncio.gather(*(run(*job) for job in missing))
+        self.day, self._readings = iso, readings
+        self.last_run_seconds = time.perf_counter() - started
+        print(f"[📖] Lectures du {format_day(day)} prêtes en {self.last_run_seconds:.1f}s ({failures} échec(s))")
+        return failures
+
+    def start(self, generate: bool = True):
+        """Lancer la tâche de fond (`generate=False` : relire seulement le stockage partagé)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(generate))
+
+    async def _loop(self, generate: bool):
+        while True:
+            now = datetime.now()
+            today = now.date()
+            if self.day != today.isoformat() or self._missing(today):
+                await self._reload(today)  # Lectures éventuellement produites par un autre worker
+            delay = None
+            if self._missing(today):
+                if not generate:
+                    delay = 600
+                elif now.hour >= self.hour or self.day is None:
+                    # À l'heure creuse, ou tout de suite s'il n'y a encore rien à servir
+                    failures = await self.generate(today)
+                    if failures:
+                        delay = 900  # Nouvel essai pour les lectures manquantes
+            if delay is None:
+                next_run = datetime.combine(today, datetime.min.time()).replace(hour=self.hour)
+                if next_run <= now:
+                    next_run += timedelta(days=1)
+                delay = (next_run - datetime.now()).total_seconds()
+            await asyncio.sleep(max(1.0, delay))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "day": self.day,
+            "readings": sum(len(texts) for texts in self._readings.values()),
+            "generated": self.generated,
+            "failed": self.failed,
+            "served": self.served,
+            "misses": self.misses,
+            "last_run_seconds": self.last_run_seconds,
+        }
+
+daily_readings = DailyReadings()
+
+BUSY_REPLY = "⏳ Tant de voix s'adressent à moi en même temps... Laissez-moi un instant, puis réessayez, chère amie."
+EXPIRED_REPLY = "⌛ Votre message s'est perdu dans le brouillard pendant que je répondais à d'autres. Pourriez-vous le répéter ?"
 
 # -----------------------------
-# Commandes Slash - Conversation & Jeux
+# Gestion des messages
 # -----------------------------
-@bot.tree.command(name="parler", description="Démarrer une conversation avec Lady Audrey Hall")
-@app_commands.describe(message="Votre premier message pour Audrey")
-async def parler(interaction: discord.Interaction, message: str):
-    """Démarrer une conversation avec Audrey"""
-    await interaction.response.defer()
-    
-    user_id = interaction.user.id
-    
-    # Initialiser ou réactiver la conversation
-    conversations[user_id] = {
-        "history": [{"role": "user", "content": message}],
-        "active": True,
-        "channel_id": interaction.channel.id
-    }
+def scene_id(channel_id: int) -> int:
+    """Identifiant de la scène d'un salon dans le stockage des conversations (négatif : jamais un utilisateur)"""
+    return -channel_id
+
+async def answer_conversation(user_id: int, messages: list):
+    """Répondre à un lot de messages d'une conversation active (appelé par le MessageCoalescer)"""
+    prompt = "\n".join(m.content for m in messages)
+    await reply_to_batch(user_id, messages, prompt, prompt, bot.coalescer, "conversation")
+
+async def answer_scene(scene: int, messages: list):
+    """Répondre en une fois à tous les participants d'un tour de scène de groupe"""
+    turn = "\n".join(f"{m.author.display_name} : {m.content}" for m in messages)
+    participants = ", ".join(dict.fromkeys(m.author.display_name for m in messages))
+    prompt = (f"[Scène de groupe. Participants de ce tour : {participants}. Répondez-leur en un seul message, "
+              f"en vous adressant à chacun par son nom.]\n{turn}")
+    await reply_to_batch(scene, messages, prompt, turn, bot.scenes, "scene")
+
+async def reply_to_batch(key: int, messages: list, prompt: str, turn: str, coalescer: MessageCoalescer, source: str):
+    """Envoyer la réponse d'Audrey à un lot de messages et l'ajouter à l'historique (`turn`)"""
+    conversation = await conversations.load(key)
+    if not conversation or not conversation.active:
+        return
     
-    # Obtenir la réponse
-    reply = await get_audrey_response(message, user_id)
+    last = messages[-1]
     
-    # Ajouter la réponse à l'historique
-    conversations[user_id]["history"].append({"role": "assistant", "content": reply})
+    async def send(content):
+        # Dès que la réponse s'affiche, elle ne peut plus être annulée par un nouveau message
+        coalescer.mark_committed(key)
+        return await bot.outbound.send(last.channel.id, last.channel.send, content)
     
-    # Envoyer la réponse SANS embed (message normal)
-    await interaction.followup.send(reply)
+    # Afficher l'indicateur "Audrey tape..." puis envoyer la réponse SANS embed (message normal),
+    # éditée au fil du streaming, dès qu'un créneau d'appel à l'API se libère
+    guild_id = last.guild.id if last.guild else None
+    authors = dict.fromkeys(m.author.id for m in messages)
+    try:
+        async with last.channel.typing():
+            async with bot.scheduler.slot(guild_id, key):
+                with rate_limiter.consumer(authors, guild_id):
+                    response = await send_streamed_reply(prompt, key, send)
+    except (SchedulerFull, RequestExpired) as e:
+        await bot.outbound.send(last.channel.id, last.channel.send,
+                                BUSY_REPLY if isinstance(e, SchedulerFull) else EXPIRED_REPLY, mergeable=True)
+        return
+    REPLY_LATENCY.observe((discord.utils.utcnow() - last.created_at).total_seconds(), source)
     
-    # Envoyer un message d'information avec embed
-    info_embed = discord.Embed(
-        title="💬 Conversation démarrée",
-        description=f"**{interaction.user.display_name}**, notre conversation est maintenant active !\n\n"
-                   "Vous pouvez me parler normalement dans ce salon.\n"
-                   "Je répondrai à vos messages jusqu'à ce que vous utilisiez `/stop`.\n\n"
-                   "*Pour l'instant, je réponds uniquement dans ce salon de discussion.*",
-        color=discord.Color.green()
-    )
-    info_embed.set_footer(text="Utilisez /stop pour terminer la conversation")
-    await interaction.channel.send(embed=info_embed)
+    # Ajouter l'échange à l'historique (les messages du lot forment un seul tour)
+    conversations.append(conversation, "user", turn)
+    conversations.append(conversation, "assistant", response)
 
-@bot.tree.command(name="stop", description="Mettre fin à la conversation avec Audrey")
-async def stop(interaction: discord.Interaction):
-    """Arrêter la conversation en cours"""
-    user_id = interaction.user.id
-    
-    if user_id in conversations and conversations[user_id]["active"]:
-        conversations[user_id]["active"] = False
-        
-        # Message normal (sans embed)
-        await interaction.response.send_message("🕊️ Notre conversation prend fin ici. Que les mystères vous accompagnent, chère amie...")
-        
-        # Message d'information avec embed
-        embed = discord.Embed(
-            title="Conversation terminée",
-            description="Notre dialogue s'achève ici. Les échos de nos paroles se dissipent dans le néant...\n\n"
-                       "Utilisez à nouveau `/parler` si vous souhaitez converser à nouveau.",
-            color=BOT_COLOR
-        )
-        await interaction.followup.send(embed=embed, ephemeral=True)
-    else:
-        await interaction.response.send_message("💭 Nous ne sommes pas en train de converser actuellement.", ephemeral=True)
-
-@bot.tree.command(name="tarot", description="Tirer une carte du tarot mystique")
-async def tarot(interaction: discord.Interaction):
-    card = random.choice(TAROT_CARDS)
-    embed = discord.Embed(
-        title="🔮 Carte du Tarot",
-        description=f"**{card['name']}**\n\n*{card['meaning']}*\n\nQue cette carte guide vos pas dans les ténèbres...",
-        color=discord.Color.gold()
-    )
-    embed.set_footer(text="Les cartes révèlent ce que les mots ne disent pas")
-    await interaction.response.send_message(embed=embed)
-
-@bot.tree.command(name="devinette", description="Une énigme issue des anciens textes")
-async def devinette(interaction: discord.Interaction):
-    riddle = random.choice(RIDDLES)
-    embed = discord.Embed(
-        title="🕯️ Énigme Mystique",
-        description=f"*{riddle['riddle']}*\n\nVous avez 30 secondes pour trouver la réponse...",
-        color=discord.Color.dark_gold()
-    )
-    await interaction.response.send_message(embed=embed)
+async def admit(message) -> bool:
+    """Limites de débit et quotas : False si le message est refusé (sans appel à l'API)"""
+    verdict = rate_limiter.check(message.author.id, message.channel.id, message.guild.id if message.guild else None)
+    if verdict is None:
+        return True
+    scope, retry_after, notify = verdict
+    if notify:
+        await bot.outbound.send(message.channel.id, message.channel.send, throttled_reply(scope, retry_after),
+                                mergeable=True)
+    return False
 
-    def check(m):
-        return m.author == interaction.user and m.channel == interaction.channel
+@bot.event
+async def on_message(message):
+    started = time.perf_counter()
+    traffic_recorder.message(message, bot.user)
+    path = await handle_message(message)
+    MESSAGE_HANDLING.observe(time.perf_counter() - started, path)
 
-    try:
-        msg = await bot.wait_for("message", timeout=30, check=check)
-        if riddle["answer"].lower() in msg.content.lower():
-            await interaction.followup.send("✨ Votre esprit est aussi brillant que l'étoile du matin. Vous avez percé le mystère !")
-        else:
-            await interaction.followup.send(f"🕊️ La réponse était : **{riddle['answer']}**. La vérité se cache parfois dans l'ombre...")
-    except asyncio.TimeoutError:
-        await interaction.followup.send(f"⏳ Le temps des étoiles est passé... La réponse était : **{riddle['answer']}**")
-
-@bot.tree.command(name="aide", description="Voir les commandes disponibles")
-async def aide(interaction: discord.Interaction):
-    user_id = interaction.user.id
-    has_active = user_id in conversations and conversations[user_id]["active"]
-    
-    embed = discord.Embed(
-        title="🎩 Services de Lady Audrey Hall",
-        description="Voici les mystères que je peux vous révéler :",
-        color=BOT_COLOR
-    )
-    
-    if has_active:
-        embed.add_field(
-            name="💬 Conversation Active",
-            value=f"✅ **Conversation en cours dans <#{conversations[user_id]['channel_id']}>**\n"
-                  "Parlez-moi normalement dans ce salon.\n"
-                  "Utilisez `/stop` pour terminer.",
-            inline=False
-        )
-    else:
-        embed.add_field(
-            name="💬 Démarrer une Conversation",
-            value="**`/parler [message]`** - Démarrer une conversation avec moi\n"
-                  "Je répondrai à vos messages dans le salon jusqu'à `/stop`",
-            inline=False
-        )
-    
-    embed.add_field(
-        name="🎮 Mini-Jeux Mystiques",
-        value="**`/tarot`** - Tirer une carte du tarot\n"
-              "**`/devinette`** - Résoudre une énigme ancienne",
-        inline=False
-    )
+async def handle_message(message) -> str:
+    """Aiguiller un message ; renvoie le chemin suivi (étiquette des métriques).
+
+    Dans les grands serveurs, la plupart des messages ne concernent pas Audrey :
+    l'index des conversations par salon permet de les écarter en temps constant,
+    sans analyse de préfixe, s'ils ne sont ni une commande ni une mention.
+    """
+    # Ignorer les messages des bots
+    if message.author.bot:
+        return "bot"
     
-    embed.add_field(
-        name="👑 Gestion des Rôles (Admin)",
-        value="**`/ajouter_role [rôle]`** - Ajouter un rôle à Audrey\n"
-              "**`/retirer_role [rôle]`** - Retirer un rôle à Audrey\n"
-              "**`/roles_audrey`** - Voir mes rôles actuels",
-        inline=False
-    )
+    # Réponse à une énigme en cours de l'auteur dans ce salon
+    if bot.riddles.handle(message):
+        return "riddle"
     
-    embed.add_field(
-        name="⚙️ Gestion Conversation",
-        value="**`/stop`** - Terminer la conversation en cours\n"
-              "**`/aide`** - Voir ce message d'aide\n"
-              "**`/statut`** - Voir le statut de la conversation\n"
-              "**`/ping`** - Vérifier la latence",
-        inline=False
-    )
+    content = message.content
+    is_command = content.startswith(COMMAND_PREFIX)
+    channel_users = conversations.channel_users(message.channel.id)
     
-    # Ajout d'informations sur l'état du bot
-    embed.add_field(
-        name="📊 État du Bot",
-        value=f"• IA Conversationnelle: {'✅ Activée' if ROUTWAY_API_KEY else '⚠️ Désactivée'}\n"
-              f"• Commandes Slash: ✅ Synchronisées\n"
-              f"• Conversations actives: {sum(1 for conv in conversations.values() if conv['active'])}",
-        inline=False
-    )
+    # Scène de groupe dans ce salon : tous les messages du tour forment un seul lot
+    if channel_users and not is_command and not content.startswith('/'):
+        scene = scene_id(message.channel.id)
+        if scene in channel_users:
+            if not await admit(message):
+                return "throttled"
+            bot.scenes.submit(scene, message)
+            return "scene"
     
-    if has_active:
-        embed.set_footer(text=f"Conversation active • Utilisez /stop pour terminer")
-    else:
-        embed.set_footer(text="Utilisez /parler pour démarrer une conversation")
+    # L'auteur converse-t-il avec Audrey dans ce salon ?
+    if message.author.id in channel_users:
+        # Ignorer les commandes (commençant par / ou !)
+        if is_command or content.startswith('/'):
+            await bot.process_commands(message)
+            return "command"
+        
+        if not await admit(message):
+            return "throttled"
+        # Regrouper les messages envoyés en rafale : une seule réponse pour le lot
+        bot.coalescer.submit(message.author.id, message)
+        return "conversation"
     
-    await interaction.response.send_message(embed=embed)
-
-@bot.tree.command(name="statut", description="Voir le statut de votre conversation")
-async def statut(interaction: discord.Interaction):
-    user_id = interaction.user.id
+    if is_command:
+        await bot.process_commands(message)
+        return "command"
     
-    if user_id in conversations and conversations[user_id]["active"]:
-        history_len = len(conversations[user_id]["history"])
-        messages_count = history_len // 2
-        
+    # Mention directe sans conversation active : indiquer qu'il faut utiliser /parler
+    if bot.user in message.mentions and not conversations.is_active(message.author.id):
         embed = discord.Embed(
-            title="📊 Statut de la Conversation",
-            description=f"**Conversation active** avec {interaction.user.display_name}",
-            color=discord.Color.green()
-        )
-        embed.add_field(name="Salon", value=f"<#{conversations[user_id]['channel_id']}>", inline=True)
-        embed.add_field(name="Messages échangés", value=str(messages_count), inline=True)
-        embed.add_field(name="Statut", value="✅ Active", inline=True)
-        embed.set_footer(text="Utilisez /stop pour terminer la conversation")
-        
-        await interaction.response.send_message(embed=embed)
-    else:
-        await interaction.response.send_message(
-            "💭 Aucune conversation active. Utilisez `/parler` pour en démarrer une.",
-            ephemeral=True
+            title="🎩 Lady Audrey Hall",
+            description="Pour converser avec moi, utilisez la commande `/parler` pour démarrer une conversation.\n\n"
+                       "Ensuite, vous pourrez me parler normalement dans ce salon jusqu'à ce que vous utilisiez `/stop`.",
+            color=BOT_COLOR
         )
-
-@bot.tree.command(name="ping", description="Vérifier la latence du bot")
-async def ping_slash(interaction: discord.Interaction):
-    """Vérifier la latence du bot (commande slash)"""
-    latency = round(bot.latency * 1000)
-    
-    embed = discord.Embed(
-        title="🏓 Pong!",
-        description=f"Latence: **{latency}ms**\n"
-                   f"État: **{'✅ En ligne' if latency < 100 else '⚠️ Latence élevée'}**",
-        color=discord.Color.green() if latency < 100 else discord.Color.orange()
-    )
-    embed.set_footer(text=f"Déployé sur Render • {datetime.now().strftime('%d/%m/%Y %H:%M')}")
-    
-    await interaction.response.send_message(embed=embed)
-
-# -----------------------------
-# Commandes traditionnelles (préfixe !)
-# -----------------------------
-@bot.command(name="aide")
-async def aide_command(ctx):
-    """Commande traditionnelle d'aide"""
-    user_id = ctx.author.id
-    has_active = user_id in conversations and conversations[user_id]["active"]
-    
-    message = "**🎩 Services de Lady Audrey Hall**\n\n"
+        await bot.outbound.send(message.channel.id, message.channel.send, embed=embed)
+        return "mention"
     
-    if has_active:
-        message += f"**💬 CONVERSATION ACTIVE** dans <#{conversations[user_id]['channel_id']}>\n"
-        message += "Parlez-moi normalement dans ce salon.\n"
-        message += "Utilisez `/stop` pour terminer.\n\n"
-    else:
-        message += "**Pour converser :**\n"
-        message += "`/parler [message]` - Démarrer une conversation\n\n"
-    
-    message += "**Mini-jeux :**\n"
-    message += "`/tarot` - Tirer une carte du tarot\n"
-    message += "`/devinette` - Énigme mystique\n\n"
-    
-    message += "**Gestion des rôles (Admin) :**\n"
-    message += "`/ajouter_role [rôle]` - Ajouter un rôle\n"
-    message += "`/retirer_role [rôle]` - Retirer un rôle\n"
-    message += "`/roles_audrey` - Voir mes rôles\n\n"
-    
-    message += "**Gestion :**\n"
-    message += "`/stop` - Terminer la conversation\n"
-    message += "`/aide` - Afficher cette aide\n"
-    message += "`/statut` - Voir le statut\n"
-    message += "`/ping` - Vérifier la latence"
-    
-    await ctx.send(message)
-
-@bot.command(name="stop")
-async def stop_command(ctx):
-    """Commande traditionnelle pour arrêter"""
-    user_id = ctx.author.id
-    
-    if user_id in conversations and conversations[user_id]["active"]:
-        conversations[user_id]["active"] = False
-        await ctx.send("🕊️ Notre conversation prend fin ici. Que les mystères vous accompagnent...")
-    else:
-        await ctx.send("💭 Nous ne sommes pas en train de converser actuellement.")
-
-@bot.command(name="ping")
-async def ping_command(ctx):
-    """Commande traditionnelle pour ping"""
-    latency = round(bot.latency * 1000)
-    await ctx.send(f"🏓 Pong! Latence : **{latency}ms**")
+    return "dropped"
 
 # -----------------------------
 # Événements
@@ -602,6 +4300,15 @@ async def ping_command(ctx):
 @bot.event
 async def on_ready():
     print(f"[✔] {bot.user} est connectée en tant qu'Audrey Hall.")
+    if bot.startup_seconds is None:
+        bot.startup_seconds = time.perf_counter() - BOOT_STARTED
+        print(f"[⏱️] Prête en {bot.startup_seconds:.2f}s après le lancement")
+        sizes = bot.cache_sizes()
+        print(f"[🧠] Cache Discord (MEMBER_CACHE={MEMBER_CACHE}) : {sizes['guilds']} serveurs, "
+              f"{sizes['users']} utilisateurs, {sizes['members']} membres")
+    if bot.shard_count:
+        shard_ids = getattr(bot, "shard_ids", None) or list(range(bot.shard_count))
+        print(f"[🧩] Shards {shard_ids} sur {bot.shard_count}")
     print(f"[💬] Mode conversation activé : /parler → conversation → /stop")
     print(f"[👑] Commandes de rôles disponibles pour les administrateurs")
     print(f"[🌐] Déployé sur Render - Prête à servir!")
@@ -614,47 +4321,84 @@ async def on_ready():
         )
     )
 
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    record_command_latency(interaction.extras.get("started_at"), command.qualified_name, "ok")
+
+@bot.event
+async def on_command(ctx):
+    ctx.started_at = time.perf_counter()
+
+@bot.event
+async def on_command_completion(ctx):
+    record_command_latency(getattr(ctx, "started_at", None), f"!{ctx.command.qualified_name}", "ok")
+
 @bot.event
 async def on_command_error(ctx, error):
     """Gestion des erreurs de commandes"""
     if isinstance(error, commands.CommandNotFound):
         return  # Ignorer les commandes non trouvées
-    elif isinstance(error, commands.MissingPermissions):
+    if ctx.command is not None:
+        record_command_latency(getattr(ctx, "started_at", None), f"!{ctx.command.qualified_name}", "error")
+    if isinstance(error, commands.MissingPermissions):
         await ctx.send("❌ Vous n'avez pas les permissions nécessaires pour cette commande.")
     else:
         print(f"[❌] Erreur de commande: {error}")
         await ctx.send("❌ Une erreur est survenue lors de l'exécution de cette commande.")
 
 # -----------------------------
-# Serveur web pour keep-alive (optionnel pour Render)
+# Lanceur multi-processus (un groupe de shards par worker)
 # -----------------------------
-def start_keep_alive():
-    """Démarrer un serveur web simple pour éviter la suspension sur Render"""
+def launch_workers(workers: int, shard_count: Optional[int] = None) -> int:
+    """Lancer `workers` processus bot.py, chacun avec sa plage de shards.
+
+    Les workers partagent l'état des conversations et des énigmes via le stockage
+    configuré (CONVERSATION_BACKEND=redis, ou le même fichier SQLite sur une seule
+    machine). Un worker qui s'arrête est relancé ; Ctrl+C arrête tout le monde.
+    """
+    import subprocess
+    
+    shard_count = shard_count or workers
+    if shard_count < workers:
+        print(f"⚠️  {workers} workers pour {shard_count} shards : réduit à {shard_count} workers")
+        workers = shard_count
+    
+    def spawn(index: int):
+        shard_ids = list(range(index, shard_count, workers))
+        env = dict(os.environ, SHARDING_ENABLED="true", SHARD_COUNT=str(shard_count),
+                   SHARD_IDS=",".join(map(str, shard_ids)), WORKER_PROCESSES="1",
+                   PORT=str(WEB_PORT + index),  # Un port par worker pour /health et /metrics
+                   CONVERSATION_SYNC_INTERVAL=str(CONVERSATION_SYNC_INTERVAL or 2))
+        print(f"[🧵] Worker {index} → shards {shard_ids}")
+        return subprocess.Popen([sys.executable, os.path.abspath(__file__)], env=env)
+    
+    processes = {index: spawn(index) for index in range(workers)}
+    stopping = False
+    
+    def stop_all(*_):
+        nonlocal stopping
+        stopping = True
+        for process in processes.values():
+            if process.poll() is None:
+                process.terminate()
+    
+    signal.signal(signal.SIGTERM, stop_all)
     try:
-        from flask import Flask
-        import threading
-        
-        app = Flask(__name__)
-        
-        @app.route('/')
-        def home():
-            return "🎩 Audrey Hall Bot est en ligne!"
-        
-        @app.route('/health')
-        def health():
-            return {"status": "online", "bot": "Audrey Hall", "timestamp": datetime.now().isoformat()}
-        
-        def run():
-            app.run(host='0.0.0.0', port=8080)
-        
-        thread = threading.Thread(target=run)
-        thread.daemon = True
-        thread.start()
-        print("[🌐] Serveur keep-alive démarré sur le port 8080")
-    except ImportError:
-        print("[⚠️] Flask non installé - skip du serveur keep-alive")
-    except Exception as e:
-        print(f"[⚠️] Erreur serveur keep-alive: {e}")
+        while not stopping:
+            time.sleep(2)
+            for index, process in list(processes.items()):
+                code = process.poll()
+                if code is not None and not stopping:
+                    print(f"[🧵] Worker {index} arrêté (code {code}), redémarrage...")
+                    processes[index] = spawn(index)
+    except KeyboardInterrupt:
+        stop_all()
+    for process in processes.values():
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return 0
 
 # -----------------------------
 # Lancement adapté pour Render
@@ -664,15 +4408,16 @@ if __name__ == "__main__":
     print("[💬] Système : /parler → conversation → /stop")
     print("[👑] Commandes de rôles ajoutées pour les admins")
     
-    # Démarrer le serveur keep-alive (optionnel)
-    # start_keep_alive()
-    
     # Vérification des variables d'environnement
     if not DISCORD_TOKEN:
         print("❌ ERREUR : DISCORD_TOKEN n'est pas défini!")
         print("ℹ️  Configurez-le dans les variables d'environnement Render.")
         exit(1)
     
+    # Plusieurs workers : ce processus répartit les shards et surveille les workers
+    if WORKER_PROCESSES > 1 and not SHARD_IDS:
+        sys.exit(launch_workers(WORKER_PROCESSES, SHARD_COUNT))
+    
     # Pour Render, nous gardons le bot actif avec un simple run
     try:
         bot.run(DISCORD_TOKEN)
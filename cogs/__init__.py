@@ -0,0 +1 @@
+"""Commandes d'Audrey, chargées comme extensions discord.py (rechargeables à chaud avec /recharger)"""
@@ -0,0 +1,225 @@
+"""Administration : métriques, rechargement à chaud"""
+import time
+from typing import Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import bot as core
+
+
+class AdminCog(commands.Cog, name="Administration"):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(name="metrics", description="Voir les métriques de performance du bot (Admin uniquement)")
+    @app_commands.default_permissions(administrator=True)
+    async def metrics_slash(self, interaction: discord.Interaction):
+        """Résumé des métriques (latences, erreurs, file d'attente, débit)"""
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("❌ Seuls les administrateurs peuvent utiliser cette commande.", ephemeral=True)
+            return
+
+        uptime = max(1.0, time.time() - core.metrics.started_at)
+        upstream = self.bot.upstream.stats()
+        attempts = sum(e["requests"] for e in upstream["endpoints"].values())
+        failures = sum(e["failures"] for e in upstream["endpoints"].values())
+        queue = self.bot.scheduler.stats()
+        tokens = core.token_usage.stats()
+
+        def ms(seconds: float) -> str:
+            return f"{seconds * 1000:.0f}ms"
+
+        embed = discord.Embed(title="📈 Métriques d'Audrey", color=core.BOT_COLOR)
+        embed.add_field(
+            name="🔮 API Routway",
+            value=f"Latence p50/p99 : **{ms(core.UPSTREAM_LATENCY.percentile(0.50))}** / **{ms(core.UPSTREAM_LATENCY.percentile(0.99))}**\n"
+                  f"Appels : **{attempts}** • Erreurs : **{failures / attempts if attempts else 0:.1%}**\n"
+                  f"Disjoncteur : **{upstream['circuit']}** • Réessais : **{upstream['retries']}**",
+            inline=False
+        )
+        embed.add_field(
+            name="💬 Réponses",
+            value=f"Délai p50/p99 : **{ms(core.REPLY_LATENCY.percentile(0.50))}** / **{ms(core.REPLY_LATENCY.percentile(0.99))}**\n"
+                  f"on_message p99 : **{ms(core.MESSAGE_HANDLING.percentile(0.99))}**\n"
+                  f"Cache : **{core.response_cache.stats()['hit_rate']:.0%}** de succès",
+            inline=False
+        )
+        embed.add_field(
+            name="⏳ File d'attente",
+            value=f"En cours : **{queue['active']}** • En attente : **{queue['queue_depth']}** (max {queue['peak_depth']})\n"
+                  f"Attente p95 : **{ms(queue['wait_p95'])}** • Refusées : **{queue['rejected'] + queue['expired']}**",
+            inline=False
+        )
+        embed.add_field(
+            name="📊 Débit",
+            value=f"Messages : **{core.MESSAGE_HANDLING.count() / uptime:.2f}/s** • Commandes : **{core.COMMAND_LATENCY.count() / uptime * 60:.1f}/min**\n"
+                  f"Tokens : **{tokens['prompt_tokens']}** envoyés, **{tokens['completion_tokens']}** générés\n"
+                  f"Conversations actives : **{core.conversations.active_count()}** • Scènes : **{core.conversations.scene_count()}**",
+            inline=False
+        )
+        embed.set_footer(text=f"Depuis {uptime / 3600:.1f} h • Détail complet : /metrics du serveur web (format Prometheus)")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="consommation", description="Voir les plus gros consommateurs de l'IA (Admin uniquement)")
+    @app_commands.default_permissions(administrator=True)
+    async def consommation(self, interaction: discord.Interaction):
+        """Tokens consommés sur la fenêtre glissante des quotas, par utilisateur et par serveur"""
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("❌ Seuls les administrateurs peuvent utiliser cette commande.", ephemeral=True)
+            return
+
+        limiter = core.rate_limiter
+        stats = limiter.stats()
+        limits = limiter.limits(interaction.guild.id)
+        window = core.format_wait(stats["window_seconds"])
+
+        def quota(used: int, limit: int) -> str:
+            return f"{used} / {limit}" if limit > 0 else str(used)
+
+        embed = discord.Embed(title="🚦 Consommation de l'IA", description=f"Sur les dernières **{window}**", color=core.BOT_COLOR)
+        users = limiter.top("user", 10)
+        embed.add_field(
+            name="👤 Utilisateurs",
+            value="\n".join(f"<@{user_id}> : **{quota(tokens, limits.user_token_quota)}** tokens"
+                            for user_id, tokens in users) or "Aucune consommation",
+            inline=False
+        )
+        guilds = limiter.top("guild", 5)
+        embed.add_field(
+            name="🏰 Serveurs",
+            value="\n".join(f"{getattr(self.bot.get_guild(guild_id), 'name', guild_id)} : **{tokens}** tokens"
+                            for guild_id, tokens in guilds) or "Aucune consommation",
+            inline=False
+        )
+        throttled = stats["throttled"]
+        embed.add_field(
+            name="⏳ Messages refusés",
+            value=", ".join(f"{scope} : **{count}**" for scope, count in sorted(throttled.items())) or "Aucun",
+            inline=False
+        )
+        embed.set_footer(text=f"Ce serveur : {quota(limiter.usage('guild', interaction.guild.id), limits.guild_token_quota)} tokens • /limites pour ajuster")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="limites", description="Voir ou régler les limites de débit de ce serveur (Admin uniquement)")
+    @app_commands.describe(
+        messages_par_minute="Messages par minute et par utilisateur (0 = illimité)",
+        rafale="Messages d'affilée tolérés avant limitation",
+        salon_par_minute="Messages par minute dans un même salon (0 = illimité)",
+        serveur_par_minute="Messages par minute sur tout le serveur (0 = illimité)",
+        quota_utilisateur="Tokens IA par utilisateur sur la fenêtre glissante (0 = illimité)",
+        quota_serveur="Tokens IA pour tout le serveur sur la fenêtre glissante (0 = illimité)",
+        reinitialiser="Revenir aux valeurs par défaut",
+    )
+    @app_commands.default_permissions(administrator=True)
+    async def limites(self, interaction: discord.Interaction,
+                      messages_par_minute: Optional[app_commands.Range[float, 0, 600]] = None,
+                      rafale: Optional[app_commands.Range[float, 1, 100]] = None,
+                      salon_par_minute: Optional[app_commands.Range[float, 0, 6000]] = None,
+                      serveur_par_minute: Optional[app_commands.Range[float, 0, 60000]] = None,
+                      quota_utilisateur: Optional[app_commands.Range[int, 0]] = None,
+                      quota_serveur: Optional[app_commands.Range[int, 0]] = None,
+                      reinitialiser: bool = False):
+        """Limites propres au serveur, enregistrées dans RATE_LIMITS_PATH"""
+        if not interaction.guild or not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("❌ Seuls les administrateurs peuvent utiliser cette commande.", ephemeral=True)
+            return
+
+        limiter = core.rate_limiter
+        if reinitialiser:
+            limits = limiter.reset(interaction.guild.id)
+        else:
+            values = {
+                "user_per_minute": messages_par_minute, "user_burst": rafale,
+                "channel_per_minute": salon_par_minute, "guild_per_minute": serveur_par_minute,
+                "user_token_quota": quota_utilisateur, "guild_token_quota": quota_serveur,
+            }
+            if any(value is not None for value in values.values()):
+                limits = limiter.configure(interaction.guild.id, **values)
+            else:
+                limits = limiter.limits(interaction.guild.id)
+
+        def rate(value: float) -> str:
+            return f"{value:g}/min" if value > 0 else "illimité"
+
+        def tokens(value: int) -> str:
+            return str(value) if value > 0 else "illimité"
+
+        embed = discord.Embed(title=f"🚦 Limites de {interaction.guild.name}", color=core.BOT_COLOR)
+        embed.add_field(name="👤 Par utilisateur", value=f"{rate(limits.user_per_minute)} (rafale {limits.user_burst:g})", inline=True)
+        embed.add_field(name="💬 Par salon", value=rate(limits.channel_per_minute), inline=True)
+        embed.add_field(name="🏰 Serveur", value=rate(limits.guild_per_minute), inline=True)
+        embed.add_field(
+            name=f"🔮 Quotas de tokens ({core.format_wait(limiter.stats()['window_seconds'])} glissantes)",
+            value=f"Utilisateur : **{tokens(limits.user_token_quota)}** • Serveur : **{tokens(limits.guild_token_quota)}**",
+            inline=False
+        )
+        if not limiter.enabled:
+            embed.set_footer(text="⚠️ Limitation désactivée (RATE_LIMIT_ENABLED=false)")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="profiler", description="Profiler le bot en direct quelques secondes (Admin uniquement)")
+    @app_commands.describe(secondes="Durée de la mesure", mode="Échantillonnage (léger) ou cProfile (complet, plus coûteux)")
+    @app_commands.choices(mode=[
+        app_commands.Choice(name="Échantillonnage", value="sample"),
+        app_commands.Choice(name="cProfile", value="cprofile"),
+    ])
+    @app_commands.default_permissions(administrator=True)
+    async def profiler(self, interaction: discord.Interaction, secondes: app_commands.Range[int, 1, 60] = 10,
+                       mode: str = "sample"):
+        """Profil du processus en direct, écrit dans PROFILE_DIR ; le résumé est joint à la réponse"""
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("❌ Seuls les administrateurs peuvent utiliser cette commande.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        try:
+            report, summary = await self.bot.loop_monitor.profile(secondes, mode)
+        except core.ProfilingBusy:
+            await interaction.followup.send("⏳ Un profilage est déjà en cours.", ephemeral=True)
+            return
+        loop = self.bot.loop_monitor.stats()
+        embed = discord.Embed(
+            title="🔬 Profilage terminé",
+            description=f"Rapport : `{report}`\n"
+                        f"Retard de la boucle p50/p99 : **{loop['lag_p50_ms']:.1f}** / **{loop['lag_p99_ms']:.1f} ms** • "
+                        f"Rappels lents : **{loop['slow_callbacks']}**",
+            color=core.BOT_COLOR
+        )
+        for when, name, duration in loop["recent_slow"][-5:]:
+            embed.add_field(name=f"🐢 {duration:.0f} ms à {when[11:]}", value=f"`{name[:200]}`", inline=False)
+        await interaction.followup.send(embed=embed, file=discord.File(summary), ephemeral=True)
+
+    @app_commands.command(name="recharger", description="Recharger persona, cartes, énigmes et commandes sans redémarrer (Admin uniquement)")
+    @app_commands.describe(cible="Ce qu'il faut recharger")
+    @app_commands.choices(cible=[
+        app_commands.Choice(name="Tout", value="tout"),
+        app_commands.Choice(name="Contenus (persona, cartes, énigmes)", value="contenus"),
+        app_commands.Choice(name="Commandes", value="commandes"),
+    ])
+    @app_commands.default_permissions(administrator=True)
+    async def recharger(self, interaction: discord.Interaction, cible: str = "tout"):
+        """Rechargement à chaud : les conversations et la connexion Discord sont conservées"""
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("❌ Seuls les administrateurs peuvent utiliser cette commande.", ephemeral=True)
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        report = []
+        if cible in ("tout", "contenus"):
+            try:
+                changed = core.library.reload()
+            except (OSError, ValueError) as e:
+                report.append(f"❌ Contenus : {e} (anciennes versions conservées)")
+            else:
+                report.append(f"✅ Contenus : {', '.join(changed) if changed else 'aucun changement'}")
+        if cible in ("tout", "commandes"):
+            report.extend(await self.bot.reload_extensions())
+
+        embed = discord.Embed(title="♻️ Rechargement", description="\n".join(report), color=core.BOT_COLOR)
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(AdminCog(bot))
@@ -0,0 +1,178 @@
+"""Conversations avec Audrey : /parler, /stop, /statut et scènes de groupe"""
+from typing import Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import bot as core
+
+
+class ConversationCog(commands.Cog, name="Conversation"):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(name="parler", description="Démarrer une conversation avec Lady Audrey Hall")
+    @app_commands.describe(message="Votre premier message pour Audrey")
+    async def parler(self, interaction: discord.Interaction, message: str):
+        """Démarrer une conversation avec Audrey"""
+        user_id = interaction.user.id
+        guild_id = interaction.guild.id if interaction.guild else None
+        verdict = core.rate_limiter.check(user_id, interaction.channel.id, guild_id)
+        if verdict is not None:
+            await interaction.response.send_message(core.throttled_reply(verdict[0], verdict[1]), ephemeral=True)
+            return
+        await interaction.response.defer()
+
+        # Initialiser ou réactiver la conversation
+        self.bot.coalescer.discard(user_id)
+        conversation = core.conversations.start(user_id, interaction.channel.id)
+
+        # Obtenir et envoyer la réponse SANS embed (message normal), éditée au fil du streaming
+        def send(content):
+            return self.bot.outbound.send(interaction.channel.id, interaction.followup.send, content, wait=True)
+
+        try:
+            async with self.bot.scheduler.slot(guild_id, user_id):
+                with core.rate_limiter.consumer((user_id,), guild_id):
+                    reply = await core.send_streamed_reply(message, user_id, send)
+        except (core.SchedulerFull, core.RequestExpired) as e:
+            core.conversations.end(user_id)
+            await self.bot.outbound.send(interaction.channel.id, interaction.followup.send,
+                                         core.BUSY_REPLY if isinstance(e, core.SchedulerFull) else core.EXPIRED_REPLY)
+            return
+        core.REPLY_LATENCY.observe((discord.utils.utcnow() - interaction.created_at).total_seconds(), "parler")
+
+        # Ajouter l'échange à l'historique
+        core.conversations.append(conversation, "user", message)
+        core.conversations.append(conversation, "assistant", reply)
+
+        # Envoyer un message d'information avec embed
+        info_embed = discord.Embed(
+            title="💬 Conversation démarrée",
+            description=f"**{interaction.user.display_name}**, notre conversation est maintenant active !\n\n"
+                       "Vous pouvez me parler normalement dans ce salon.\n"
+                       "Je répondrai à vos messages jusqu'à ce que vous utilisiez `/stop`.\n\n"
+                       "*Pour l'instant, je réponds uniquement dans ce salon de discussion.*",
+            color=discord.Color.green()
+        )
+        info_embed.set_footer(text="Utilisez /stop pour terminer la conversation")
+        await self.bot.outbound.send(interaction.channel.id, interaction.channel.send, embed=info_embed)
+
+    @app_commands.command(name="stop", description="Mettre fin à la conversation avec Audrey")
+    async def stop(self, interaction: discord.Interaction):
+        """Arrêter la conversation en cours"""
+        user_id = interaction.user.id
+
+        if core.conversations.end(user_id):
+            self.bot.coalescer.discard(user_id)
+
+            # Message normal (sans embed)
+            await interaction.response.send_message("🕊️ Notre conversation prend fin ici. Que les mystères vous accompagnent, chère amie...")
+
+            # Message d'information avec embed
+            embed = discord.Embed(
+                title="Conversation terminée",
+                description="Notre dialogue s'achève ici. Les échos de nos paroles se dissipent dans le néant...\n\n"
+                           "Utilisez à nouveau `/parler` si vous souhaitez converser à nouveau.",
+                color=core.BOT_COLOR
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        else:
+            await interaction.response.send_message("💭 Nous ne sommes pas en train de converser actuellement.", ephemeral=True)
+
+    @app_commands.command(name="scene", description="Ouvrir une scène de roleplay de groupe avec Audrey dans ce salon")
+    @app_commands.describe(theme="Le décor ou l'intrigue de la scène (optionnel)")
+    async def scene(self, interaction: discord.Interaction, theme: Optional[str] = None):
+        """Démarrer une scène partagée : Audrey répond une fois par tour à tous les participants"""
+        key = core.scene_id(interaction.channel.id)
+        if core.conversations.is_active(key):
+            await interaction.response.send_message("🎭 Une scène est déjà en cours dans ce salon. Joignez-vous à elle !", ephemeral=True)
+            return
+        guild_id = interaction.guild.id if interaction.guild else None
+        verdict = core.rate_limiter.check(interaction.user.id, interaction.channel.id, guild_id)
+        if verdict is not None:
+            await interaction.response.send_message(core.throttled_reply(verdict[0], verdict[1]), ephemeral=True)
+            return
+        await interaction.response.defer()
+
+        conversation = core.conversations.start(key, interaction.channel.id)
+        opening = (f"[Nouvelle scène de groupe ouverte par {interaction.user.display_name}. "
+                   f"{f'Thème : {theme}. ' if theme else ''}Plantez le décor en quelques phrases "
+                   "et invitez les personnes présentes à y prendre part.]")
+
+        def send(content):
+            return self.bot.outbound.send(interaction.channel.id, interaction.followup.send, content, wait=True)
+
+        try:
+            async with self.bot.scheduler.slot(guild_id, key):
+                with core.rate_limiter.consumer((interaction.user.id,), guild_id):
+                    reply = await core.send_streamed_reply(opening, key, send)
+        except (core.SchedulerFull, core.RequestExpired) as e:
+            core.conversations.end(key)
+            await self.bot.outbound.send(interaction.channel.id, interaction.followup.send,
+                                         core.BUSY_REPLY if isinstance(e, core.SchedulerFull) else core.EXPIRED_REPLY)
+            return
+        core.REPLY_LATENCY.observe((discord.utils.utcnow() - interaction.created_at).total_seconds(), "scene")
+
+        core.conversations.append(conversation, "user", opening)
+        core.conversations.append(conversation, "assistant", reply)
+
+        info_embed = discord.Embed(
+            title="🎭 Scène de groupe ouverte",
+            description="Tout le monde peut maintenant écrire dans ce salon : j'écoute chaque tour, "
+                       "puis je réponds à tous les participants à la fois.\n\n"
+                       "Utilisez `/fin_scene` pour clore la scène.",
+            color=discord.Color.purple()
+        )
+        await self.bot.outbound.send(interaction.channel.id, interaction.channel.send, embed=info_embed)
+
+    @app_commands.command(name="fin_scene", description="Clore la scène de groupe de ce salon")
+    async def fin_scene(self, interaction: discord.Interaction):
+        key = core.scene_id(interaction.channel.id)
+        if core.conversations.end(key):
+            self.bot.scenes.discard(key)
+            await interaction.response.send_message("🕯️ Le rideau tombe sur notre scène... Merci à tous d'y avoir pris part.")
+        else:
+            await interaction.response.send_message("🎭 Aucune scène n'est en cours dans ce salon.", ephemeral=True)
+
+    @app_commands.command(name="statut", description="Voir le statut de votre conversation")
+    async def statut(self, interaction: discord.Interaction):
+        user_id = interaction.user.id
+
+        conversation = await core.conversations.load(user_id)
+        if conversation and conversation.active:
+            history_len = len(conversation.history)
+            messages_count = history_len // 2
+
+            embed = discord.Embed(
+                title="📊 Statut de la Conversation",
+                description=f"**Conversation active** avec {interaction.user.display_name}",
+                color=discord.Color.green()
+            )
+            embed.add_field(name="Salon", value=f"<#{conversation.channel_id}>", inline=True)
+            embed.add_field(name="Messages échangés", value=str(messages_count), inline=True)
+            embed.add_field(name="Statut", value="✅ Active", inline=True)
+            embed.set_footer(text="Utilisez /stop pour terminer la conversation")
+
+            await interaction.response.send_message(embed=embed)
+        else:
+            await interaction.response.send_message(
+                "💭 Aucune conversation active. Utilisez `/parler` pour en démarrer une.",
+                ephemeral=True
+            )
+
+    @commands.command(name="stop")
+    async def stop_command(self, ctx):
+        """Commande traditionnelle pour arrêter"""
+        user_id = ctx.author.id
+
+        if core.conversations.end(user_id):
+            self.bot.coalescer.discard(user_id)
+            await ctx.send("🕊️ Notre conversation prend fin ici. Que les mystères vous accompagnent...")
+        else:
+            await ctx.send("💭 Nous ne sommes pas en train de converser actuellement.")
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(ConversationCog(bot))
@@ -0,0 +1,72 @@
+"""Mini-jeux : tarot, journal du jour et énigmes"""
+import random
+from datetime import date
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import bot as core
+
+
+class GamesCog(commands.Cog, name="Mini-jeux"):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(name="tarot", description="Tirer une carte du tarot mystique")
+    async def tarot(self, interaction: discord.Interaction):
+        card = random.choice(core.library.tarot_cards)
+        # Interprétation pré-générée pour aujourd'hui (aucun appel à l'API ici)
+        reading = core.daily_readings.pick("tarot", card["name"]) or "Que cette carte guide vos pas dans les ténèbres..."
+        embed = discord.Embed(
+            title="🔮 Carte du Tarot",
+            description=f"**{card['name']}**\n\n*{card['meaning']}*\n\n{reading}"[:4096],
+            color=discord.Color.gold()
+        )
+        embed.set_footer(text="Les cartes révèlent ce que les mots ne disent pas")
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(name="journal", description="Le journal du jour : prédiction, carte et phase de la lune")
+    async def journal(self, interaction: discord.Interaction):
+        today = date.today()
+        emoji, phase = core.moon_phase(today)
+        card = core.daily_card(today)
+        embed = discord.Embed(
+            title=f"📖 Journal d'Audrey — {core.format_day(today)}",
+            color=core.BOT_COLOR
+        )
+        embed.add_field(
+            name="✨ Prédiction du jour",
+            value=(core.daily_readings.pick("prediction") or "Les pages de mon journal sont encore blanches... Revenez un peu plus tard.")[:1024],
+            inline=False
+        )
+        embed.add_field(
+            name=f"🃏 Carte du jour : {card['name']}",
+            value=(core.daily_readings.pick("tarot", card["name"]) or f"*{card['meaning']}*")[:1024],
+            inline=False
+        )
+        embed.add_field(
+            name=f"{emoji} {phase}",
+            value=(core.daily_readings.pick("moon") or "La lune garde ses secrets pour ce soir.")[:1024],
+            inline=False
+        )
+        embed.set_footer(text="Écrit à l'aube, pour ceux qui savent lire entre les lignes")
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(name="devinette", description="Une énigme issue des anciens textes")
+    async def devinette(self, interaction: discord.Interaction):
+        riddle_index = random.randrange(len(core.library.riddles))
+        riddle = core.library.riddles[riddle_index]
+        embed = discord.Embed(
+            title="🕯️ Énigme Mystique",
+            description=f"*{riddle['riddle']}*\n\nVous avez {core.RIDDLE_DURATION} secondes pour trouver la réponse...",
+            color=discord.Color.dark_gold()
+        )
+        await interaction.response.send_message(embed=embed)
+
+        # La réponse est attendue par le gestionnaire d'énigmes (via on_message)
+        self.bot.riddles.start(interaction.channel.id, interaction.user.id, riddle_index, interaction.followup.send)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(GamesCog(bot))
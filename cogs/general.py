@@ -0,0 +1,153 @@
+"""Aide et latence (commandes slash et préfixe !)"""
+from datetime import datetime
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import bot as core
+
+
+class GeneralCog(commands.Cog, name="Général"):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(name="aide", description="Voir les commandes disponibles")
+    async def aide(self, interaction: discord.Interaction):
+        user_id = interaction.user.id
+        active_channel_id = core.conversations.active_channel(user_id)
+        has_active = active_channel_id is not None
+
+        embed = discord.Embed(
+            title="🎩 Services de Lady Audrey Hall",
+            description="Voici les mystères que je peux vous révéler :",
+            color=core.BOT_COLOR
+        )
+
+        if has_active:
+            embed.add_field(
+                name="💬 Conversation Active",
+                value=f"✅ **Conversation en cours dans <#{active_channel_id}>**\n"
+                      "Parlez-moi normalement dans ce salon.\n"
+                      "Utilisez `/stop` pour terminer.",
+                inline=False
+            )
+        else:
+            embed.add_field(
+                name="💬 Démarrer une Conversation",
+                value="**`/parler [message]`** - Démarrer une conversation avec moi\n"
+                      "Je répondrai à vos messages dans le salon jusqu'à `/stop`",
+                inline=False
+            )
+
+        embed.add_field(
+            name="🎭 Scènes de Groupe",
+            value="**`/scene [thème]`** - Ouvrir une scène de roleplay à plusieurs dans ce salon\n"
+                  "**`/fin_scene`** - Clore la scène",
+            inline=False
+        )
+
+        embed.add_field(
+            name="🎮 Mini-Jeux Mystiques",
+            value="**`/tarot`** - Tirer une carte du tarot\n"
+                  "**`/journal`** - Prédiction, carte et lune du jour\n"
+                  "**`/devinette`** - Résoudre une énigme ancienne",
+            inline=False
+        )
+
+        embed.add_field(
+            name="👑 Gestion des Rôles (Admin)",
+            value="**`/ajouter_role [rôle]`** - Ajouter un rôle à Audrey\n"
+                  "**`/retirer_role [rôle]`** - Retirer un rôle à Audrey\n"
+                  "**`/roles_audrey`** - Voir mes rôles actuels",
+            inline=False
+        )
+
+        embed.add_field(
+            name="⚙️ Gestion Conversation",
+            value="**`/stop`** - Terminer la conversation en cours\n"
+                  "**`/aide`** - Voir ce message d'aide\n"
+                  "**`/statut`** - Voir le statut de la conversation\n"
+                  "**`/ping`** - Vérifier la latence",
+            inline=False
+        )
+
+        # Ajout d'informations sur l'état du bot
+        embed.add_field(
+            name="📊 État du Bot",
+            value=f"• IA Conversationnelle: {'✅ Activée' if core.ROUTWAY_API_KEY else '⚠️ Désactivée'}\n"
+                  f"• Commandes Slash: ✅ Synchronisées\n"
+                  f"• Conversations actives: {core.conversations.active_count()}",
+            inline=False
+        )
+
+        if has_active:
+            embed.set_footer(text=f"Conversation active • Utilisez /stop pour terminer")
+        else:
+            embed.set_footer(text="Utilisez /parler pour démarrer une conversation")
+
+        await interaction.response.send_message(embed=embed)
+
+    @app_commands.command(name="ping", description="Vérifier la latence du bot")
+    async def ping_slash(self, interaction: discord.Interaction):
+        """Vérifier la latence du bot (commande slash)"""
+        latency = round(self.bot.latency * 1000)
+
+        embed = discord.Embed(
+            title="🏓 Pong!",
+            description=f"Latence: **{latency}ms**\n"
+                       f"État: **{'✅ En ligne' if latency < 100 else '⚠️ Latence élevée'}**",
+            color=discord.Color.green() if latency < 100 else discord.Color.orange()
+        )
+        embed.set_footer(text=f"Déployé sur Render • {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+
+        await interaction.response.send_message(embed=embed)
+
+    @commands.command(name="aide")
+    async def aide_command(self, ctx):
+        """Commande traditionnelle d'aide"""
+        user_id = ctx.author.id
+        active_channel_id = core.conversations.active_channel(user_id)
+        has_active = active_channel_id is not None
+
+        message = "**🎩 Services de Lady Audrey Hall**\n\n"
+
+        if has_active:
+            message += f"**💬 CONVERSATION ACTIVE** dans <#{active_channel_id}>\n"
+            message += "Parlez-moi normalement dans ce salon.\n"
+            message += "Utilisez `/stop` pour terminer.\n\n"
+        else:
+            message += "**Pour converser :**\n"
+            message += "`/parler [message]` - Démarrer une conversation\n\n"
+
+        message += "**Scènes de groupe :**\n"
+        message += "`/scene [thème]` - Roleplay à plusieurs\n"
+        message += "`/fin_scene` - Clore la scène\n\n"
+
+        message += "**Mini-jeux :**\n"
+        message += "`/tarot` - Tirer une carte du tarot\n"
+        message += "`/journal` - Journal du jour\n"
+        message += "`/devinette` - Énigme mystique\n\n"
+
+        message += "**Gestion des rôles (Admin) :**\n"
+        message += "`/ajouter_role [rôle]` - Ajouter un rôle\n"
+        message += "`/retirer_role [rôle]` - Retirer un rôle\n"
+        message += "`/roles_audrey` - Voir mes rôles\n\n"
+
+        message += "**Gestion :**\n"
+        message += "`/stop` - Terminer la conversation\n"
+        message += "`/aide` - Afficher cette aide\n"
+        message += "`/statut` - Voir le statut\n"
+        message += "`/ping` - Vérifier la latence"
+
+        await ctx.send(message)
+
+    @commands.command(name="ping")
+    async def ping_command(self, ctx):
+        """Commande traditionnelle pour ping"""
+        latency = round(self.bot.latency * 1000)
+        await ctx.send(f"🏓 Pong! Latence : **{latency}ms**")
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(GeneralCog(bot))
@@ -0,0 +1,115 @@
+"""Gestion des rôles d'Audrey sur le serveur (administrateurs)"""
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+import bot as core
+
+
+class RolesCog(commands.Cog, name="Rôles"):
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @app_commands.command(name="ajouter_role", description="Ajouter un rôle à Audrey (Admin uniquement)")
+    @app_commands.describe(role="Le rôle à ajouter à Audrey")
+    @app_commands.default_permissions(administrator=True)
+    async def ajouter_role(self, interaction: discord.Interaction, role: discord.Role):
+        """Ajouter un rôle à Audrey"""
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("❌ Seuls les administrateurs peuvent utiliser cette commande.", ephemeral=True)
+            return
+
+        try:
+            # Ajouter le rôle au bot
+            await (await self.bot.own_member(interaction.guild)).add_roles(role)
+
+            embed = discord.Embed(
+                title="✅ Rôle ajouté",
+                description=f"Le rôle **{role.name}** a été ajouté à Audrey avec succès.",
+                color=discord.Color.green()
+            )
+            await interaction.response.send_message(embed=embed)
+        except discord.Forbidden:
+            embed = discord.Embed(
+                title="❌ Permission refusée",
+                description="Je n'ai pas la permission d'ajouter ce rôle. Vérifiez que mon rôle est au-dessus du rôle que vous souhaitez ajouter.",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            embed = discord.Embed(
+                title="❌ Erreur",
+                description=f"Une erreur est survenue : {str(e)}",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="retirer_role", description="Retirer un rôle à Audrey (Admin uniquement)")
+    @app_commands.describe(role="Le rôle à retirer à Audrey")
+    @app_commands.default_permissions(administrator=True)
+    async def retirer_role(self, interaction: discord.Interaction, role: discord.Role):
+        """Retirer un rôle à Audrey"""
+        if not interaction.user.guild_permissions.administrator:
+            await interaction.response.send_message("❌ Seuls les administrateurs peuvent utiliser cette commande.", ephemeral=True)
+            return
+
+        try:
+            # Retirer le rôle du bot
+            await (await self.bot.own_member(interaction.guild)).remove_roles(role)
+
+            embed = discord.Embed(
+                title="✅ Rôle retiré",
+                description=f"Le rôle **{role.name}** a été retiré d'Audrey avec succès.",
+                color=discord.Color.green()
+            )
+            await interaction.response.send_message(embed=embed)
+        except discord.Forbidden:
+            embed = discord.Embed(
+                title="❌ Permission refusée",
+                description="Je n'ai pas la permission de retirer ce rôle.",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+        except Exception as e:
+            embed = discord.Embed(
+                title="❌ Erreur",
+                description=f"Une erreur est survenue : {str(e)}",
+                color=discord.Color.red()
+            )
+            await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="roles_audrey", description="Voir les rôles actuels d'Audrey")
+    async def roles_audrey(self, interaction: discord.Interaction):
+        """Voir les rôles d'Audrey"""
+        try:
+            # Obtenir le membre bot dans ce serveur (demandé à l'API s'il n'est pas en cache)
+            try:
+                bot_member = await self.bot.own_member(interaction.guild)
+            except discord.NotFound:
+                await interaction.response.send_message("❌ Impossible de trouver Audrey sur ce serveur.", ephemeral=True)
+                return
+
+            # Filtrer les rôles @everyone
+            roles = [role for role in bot_member.roles if role.name != "@everyone"]
+
+            if not roles:
+                embed = discord.Embed(
+                    title="👑 Rôles d'Audrey",
+                    description="Audrey n'a actuellement aucun rôle spécifique sur ce serveur.",
+                    color=core.BOT_COLOR
+                )
+            else:
+                roles_list = "\n".join([f"• {role.mention} (Position: {role.position})" for role in sorted(roles, key=lambda r: r.position, reverse=True)])
+                embed = discord.Embed(
+                    title="👑 Rôles d'Audrey",
+                    description=f"**Rôles actuels :**\n{roles_list}\n\n*Utilisez `/ajouter_role` et `/retirer_role` pour gérer mes rôles (Admin uniquement).*",
+                    color=core.BOT_COLOR
+                )
+
+            await interaction.response.send_message(embed=embed)
+        except Exception as e:
+            await interaction.response.send_message(f"❌ Erreur : {str(e)}", ephemeral=True)
+
+
+async def setup(bot: commands.Bot):
+    await bot.add_cog(RolesCog(bot))
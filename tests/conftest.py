@@ -0,0 +1,86 @@
+"""Configuration commune des tests : environnement du bot et faux serveur Routway.
+
+Le bot lit sa configuration à l'import : l'environnement est fixé ici, avant le
+premier `import bot`. Aucun test ne se connecte à Discord ni à la vraie API.
+"""
+import contextlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tools")]
+
+os.environ.update({
+    "DISCORD_TOKEN": "test",
+    "ROUTWAY_API_KEY": "test",
+    "ROUTWAY_ENDPOINTS": "",
+    "LOCAL_FALLBACK_ENABLED": "false",  # Réponses de repli prévisibles (pas de répondeur local)
+    "STREAMING_ENABLED": "true",
+    "STREAM_EDIT_INTERVAL": "0",
+    "UPSTREAM_MAX_ATTEMPTS": "2",
+    "UPSTREAM_BACKOFF_BASE": "0.01",
+})
+
+import bot as audrey_module  # noqa: E402
+from fake_routway import start_server  # noqa: E402
+
+
+@pytest.fixture
+def audrey():
+    return audrey_module
+
+
+@pytest.fixture
+def routway(audrey, monkeypatch):
+    """`async with routway(FakeRoutway(...))` : le bot appelle ce faux serveur le temps du bloc"""
+
+    @contextlib.asynccontextmanager
+    async def serve(server):
+        runner = await start_server(server, port=0)
+        host, port = runner.addresses[0][:2]
+        url = f"http://{host}:{port}/v1/chat/completions"
+        # Endpoint neuf à chaque test : disjoncteur fermé, statistiques à zéro
+        monkeypatch.setattr(audrey.bot.upstream, "endpoints", [audrey.UpstreamEndpoint(audrey.ROUTWAY_MODEL, url)])
+        await audrey.bot.routway.start()
+        try:
+            yield server
+        finally:
+            await audrey.bot.routway.close()
+            await runner.cleanup()
+
+    return serve
+
+
+class SentMessage:
+    """Message Discord envoyé par le bot (contenu modifiable par edit)"""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.edits = 0
+
+    async def edit(self, content: str):
+        self.content = content
+        self.edits += 1
+
+
+class FakeChannel:
+    """Salon qui garde les messages envoyés : `send` convient à send_streamed_reply"""
+
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content: str) -> SentMessage:
+        message = SentMessage(content)
+        self.messages.append(message)
+        return message
+
+    @property
+    def contents(self):
+        return [message.content for message in self.messages]
+
+
+@pytest.fixture
+def channel():
+    return FakeChannel()
@@ -0,0 +1,134 @@
+"""Disjoncteur des appels à l'API (CircuitBreaker)"""
+import asyncio
+import contextlib
+import time
+
+from fake_routway import FakeRoutway
+
+
+def test_opens_after_consecutive_failures(audrey):
+    breaker = audrey.CircuitBreaker(failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure()
+        assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert breaker.trips == 1
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(audrey):
+    breaker = audrey.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == breaker.CLOSED
+
+
+def test_half_open_allows_a_single_probe(audrey, monkeypatch):
+    breaker = audrey.CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    opened_at = time.monotonic()
+    monkeypatch.setattr(audrey.time, "monotonic", lambda: opened_at + 31)
+    assert breaker.allow()
+    assert breaker.state == breaker.HALF_OPEN
+    assert not breaker.allow()  # Une seule requête de test à la fois
+
+
+def test_probe_success_closes_and_failure_reopens(audrey, monkeypatch):
+    breaker = audrey.CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    now = [time.monotonic()]
+    monkeypatch.setattr(audrey.time, "monotonic", lambda: now[0])
+    breaker.record_failure()
+
+    now[0] += 31
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    assert breaker.trips == 2
+    assert not breaker.allow()
+
+    now[0] += 31
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_open_circuit_fails_fast_without_calling_the_api(audrey, routway):
+    async def scenario():
+        async with routway(FakeRoutway(chunk_delay=0)) as server:
+            upstream = audrey.bot.upstream
+            for _ in range(upstream.endpoints[0].breaker.failure_threshold):
+                upstream.endpoints[0].breaker.record_failure()
+            try:
+                await upstream.complete({"messages": [{"role": "user", "content": "Bonjour"}]})
+            except audrey.CircuitOpen:
+                return server.requests, upstream.fast_failures
+        return None
+
+    assert asyncio.run(scenario()) == (0, 1)
+
+
+def test_released_probe_lets_another_one_through(audrey, monkeypatch):
+    breaker = audrey.CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    opened_at = time.monotonic()
+    breaker.record_failure()
+    monkeypatch.setattr(audrey.time, "monotonic", lambda: opened_at + 31)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
+    assert breaker.state == breaker.HALF_OPEN
+
+
+def test_lost_probe_is_replaced_after_reset_timeout(audrey, monkeypatch):
+    breaker = audrey.CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    now = [time.monotonic()]
+    monkeypatch.setattr(audrey.time, "monotonic", lambda: now[0])
+    breaker.record_failure()
+    now[0] += 31
+    assert breaker.allow()
+    now[0] += 10
+    assert not breaker.allow()
+    now[0] += 21  # Requête de test sans verdict depuis reset_timeout
+    assert breaker.allow()
+
+
+def test_cancelled_half_open_probe_does_not_block_the_endpoint(audrey, routway):
+    async def scenario():
+        async with routway(FakeRoutway(latency=1.0, chunk_delay=0)):
+            breaker = audrey.bot.upstream.endpoints[0].breaker
+            breaker.reset_timeout = 0.3
+            for _ in range(breaker.failure_threshold):
+                breaker.record_failure()
+            await asyncio.sleep(0.35)
+            probe = asyncio.create_task(
+                audrey.bot.upstream.complete({"messages": [{"role": "user", "content": "Bonjour"}]}))
+            await asyncio.sleep(0.1)
+            probing = (breaker.state, breaker.allow())
+            probe.cancel()  # Réponse devenue obsolète (nouveau message, file expirée...)
+            with contextlib.suppress(asyncio.CancelledError):
+                await probe
+            return probing, breaker.allow()
+
+    probing, allowed_after = asyncio.run(scenario())
+    assert probing == (audrey.CircuitBreaker.HALF_OPEN, False)
+    assert allowed_after
+
+
+def test_abandoned_stream_probe_does_not_block_the_endpoint(audrey, routway):
+    async def scenario():
+        async with routway(FakeRoutway(chunk_delay=0.05, chunk_size=4)):
+            breaker = audrey.bot.upstream.endpoints[0].breaker
+            breaker.reset_timeout = 0.3
+            for _ in range(breaker.failure_threshold):
+                breaker.record_failure()
+            await asyncio.sleep(0.35)
+            stream = audrey.stream_audrey_response("Bonjour")
+            await stream.__anext__()
+            probing = breaker.allow()
+            await stream.aclose()  # Lecteur parti au milieu du flux
+            return probing, breaker.allow()
+
+    assert asyncio.run(scenario()) == (False, True)
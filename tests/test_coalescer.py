@@ -0,0 +1,108 @@
+"""Regroupement des messages rapprochés (MessageCoalescer)"""
+import asyncio
+
+
+class Recorder:
+    """Handler de test : garde chaque lot traité ; `delay` simule la durée de l'appel à l'IA"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.started = []
+        self.batches = []
+
+    async def __call__(self, user_id, messages):
+        self.started.append((user_id, messages))
+        await asyncio.sleep(self.delay)
+        self.batches.append((user_id, messages))
+
+
+def test_close_messages_form_one_batch(audrey):
+    async def scenario():
+        handler = Recorder()
+        coalescer = audrey.MessageCoalescer(handler, window=0.05, max_delay=1)
+        for text in ("Bonjour", "Audrey", "tu es là ?"):
+            coalescer.submit(1, text)
+            await asyncio.sleep(0.01)
+        coalescer.submit(2, "Salut")
+        await asyncio.sleep(0.15)
+        return handler, coalescer
+
+    handler, coalescer = asyncio.run(scenario())
+    assert sorted(handler.batches) == [(1, ["Bonjour", "Audrey", "tu es là ?"]), (2, ["Salut"])]
+    assert coalescer.batches_sent == 2
+    assert coalescer.stats()["pending_users"] == 0
+
+
+def test_max_delay_caps_the_wait(audrey):
+    async def scenario():
+        handler = Recorder()
+        coalescer = audrey.MessageCoalescer(handler, window=0.05, max_delay=0.1)
+        for i in range(8):  # Un message toutes les 30 ms : la fenêtre ne se referme jamais
+            coalescer.submit(1, i)
+            await asyncio.sleep(0.03)
+        await asyncio.sleep(0.1)
+        return handler
+
+    handler = asyncio.run(scenario())
+    assert len(handler.batches) > 1
+    assert [m for _, batch in handler.batches for m in batch] == list(range(8))
+
+
+def test_new_message_cancels_request_in_flight(audrey):
+    async def scenario():
+        handler = Recorder(delay=0.1)
+        coalescer = audrey.MessageCoalescer(handler, window=0.02, max_delay=1)
+        coalescer.submit(1, "Bonjour")
+        await asyncio.sleep(0.05)  # Requête partie
+        coalescer.submit(1, "en fait, autre question")
+        await asyncio.sleep(0.2)
+        return handler, coalescer
+
+    handler, coalescer = asyncio.run(scenario())
+    assert coalescer.requests_cancelled == 1
+    assert handler.batches == [(1, ["Bonjour", "en fait, autre question"])]
+
+
+def test_committed_reply_keeps_message_for_next_turn(audrey):
+    async def scenario():
+        handler = Recorder(delay=0.1)
+        coalescer = audrey.MessageCoalescer(handler, window=0.02, max_delay=1)
+        coalescer.submit(1, "Bonjour")
+        await asyncio.sleep(0.05)
+        coalescer.mark_committed(1)  # La réponse s'affiche déjà
+        coalescer.submit(1, "Et demain ?")
+        await asyncio.sleep(0.25)
+        return handler, coalescer
+
+    handler, coalescer = asyncio.run(scenario())
+    assert coalescer.requests_cancelled == 0
+    assert handler.batches == [(1, ["Bonjour"]), (1, ["Et demain ?"])]
+
+
+def test_scene_mode_does_not_cancel_in_flight(audrey):
+    async def scenario():
+        handler = Recorder(delay=0.1)
+        coalescer = audrey.MessageCoalescer(handler, window=0.02, max_delay=1, cancel_in_flight=False)
+        coalescer.submit(7, "Alice : bonsoir")
+        await asyncio.sleep(0.05)
+        coalescer.submit(7, "Bob : bonsoir aussi")
+        await asyncio.sleep(0.25)
+        return handler, coalescer
+
+    handler, coalescer = asyncio.run(scenario())
+    assert coalescer.requests_cancelled == 0
+    assert handler.batches == [(7, ["Alice : bonsoir"]), (7, ["Bob : bonsoir aussi"])]
+
+
+def test_discard_drops_pending_messages(audrey):
+    async def scenario():
+        handler = Recorder()
+        coalescer = audrey.MessageCoalescer(handler, window=0.05, max_delay=1)
+        coalescer.submit(1, "Bonjour")
+        coalescer.discard(1)
+        await asyncio.sleep(0.1)
+        return handler, coalescer
+
+    handler, coalescer = asyncio.run(scenario())
+    assert handler.started == []
+    assert coalescer.stats()["pending_users"] == 0
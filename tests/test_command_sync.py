@@ -0,0 +1,53 @@
+"""Empreinte de l'arbre des commandes slash (command_tree_fingerprint)"""
+import discord
+from discord import app_commands
+
+
+def make_tree(with_count_option: bool = False, description: str = "Tirer une carte du tarot", reverse: bool = False):
+    tree = app_commands.CommandTree(discord.Client(intents=discord.Intents.none()))
+
+    if with_count_option:
+        @app_commands.command(name="tarot", description=description)
+        async def tarot(interaction: discord.Interaction, count: int = 1):
+            pass
+    else:
+        @app_commands.command(name="tarot", description=description)
+        async def tarot(interaction: discord.Interaction):
+            pass
+
+    @app_commands.command(name="devinette", description="Poser une énigme")
+    async def devinette(interaction: discord.Interaction):
+        pass
+
+    for command in ((devinette, tarot) if reverse else (tarot, devinette)):
+        tree.add_command(command)
+    return tree
+
+
+def test_fingerprint_is_stable_for_identical_trees(audrey):
+    fingerprint = audrey.command_tree_fingerprint
+    assert fingerprint(make_tree()) == fingerprint(make_tree())
+    assert fingerprint(make_tree()) == fingerprint(make_tree(reverse=True))  # L'ordre d'ajout ne compte pas
+
+
+def test_fingerprint_changes_with_options_and_descriptions(audrey):
+    fingerprint = audrey.command_tree_fingerprint
+    base = fingerprint(make_tree())
+    assert fingerprint(make_tree(with_count_option=True)) != base
+    assert fingerprint(make_tree(description="Tirer une carte")) != base
+
+
+def test_guild_commands_have_their_own_fingerprint(audrey):
+    tree = make_tree()
+    guild = discord.Object(id=1234)
+    empty = audrey.command_tree_fingerprint(tree, guild)
+    tree.copy_global_to(guild=guild)
+    assert audrey.command_tree_fingerprint(tree, guild) == audrey.command_tree_fingerprint(tree)
+    assert empty != audrey.command_tree_fingerprint(tree)
+
+
+def test_sync_state_roundtrip(audrey, tmp_path):
+    path = str(tmp_path / "state" / "command_sync.json")
+    assert audrey.load_command_sync_state(path) == {}
+    audrey.save_command_sync_state({"global": "abc"}, path)
+    assert audrey.load_command_sync_state(path) == {"global": "abc"}
@@ -0,0 +1,79 @@
+"""Fenêtre de contexte dans un budget de tokens (build_context)"""
+
+
+def make_conversation(audrey, turns: int, length: int = 200, summary: str = ""):
+    history = [("user" if i % 2 == 0 else "assistant",
+                f"Message {i}. " + "Les arcanes se dévoilent lentement. " * (length // 36)) for i in range(turns)]
+    return audrey.Conversation(1, "session", 100, history, summary=summary)
+
+
+def history_messages(messages):
+    """Messages d'historique : ni la persona, ni le résumé, ni le message courant"""
+    return [m for m in messages[1:-1] if m["role"] != "system"]
+
+
+def summary_messages(messages):
+    return [m for m in messages[1:-1] if m["role"] == "system"]
+
+
+def test_without_conversation_only_persona_and_prompt(audrey):
+    messages, used = audrey.build_context("Bonjour Audrey")
+    assert messages == [{"role": "system", "content": audrey.library.persona},
+                        {"role": "user", "content": "Bonjour Audrey"}]
+    assert used == audrey.estimate_tokens(audrey.library.persona) + audrey.estimate_tokens("Bonjour Audrey")
+
+
+def test_short_history_fits_entirely_without_summary(audrey):
+    conversation = make_conversation(audrey, 4)
+    messages, _ = audrey.build_context("Et ensuite ?", conversation, budget=2000)
+    assert [m["content"] for m in history_messages(messages)] == [turn.content for turn in conversation.history]
+    assert summary_messages(messages) == []
+    assert messages[-1] == {"role": "user", "content": "Et ensuite ?"}
+
+
+def test_budget_is_respected_and_newest_turns_are_kept(audrey):
+    conversation = make_conversation(audrey, 40)
+    for budget in (800, 1200, 2000):
+        messages, used = audrey.build_context("Et ensuite ?", conversation, budget=budget)
+        assert used <= budget
+        kept = history_messages(messages)
+        assert 0 < len(kept) < len(conversation.history)
+        newest = [turn.content for turn in list(conversation.history)[-len(kept):]]
+        assert [m["content"] for m in kept] == newest  # Les plus récents, dans l'ordre
+
+
+def test_summary_is_included_once_history_overflows(audrey):
+    conversation = make_conversation(audrey, 40)
+    messages, _ = audrey.build_context("Et ensuite ?", conversation, budget=1200)
+    summaries = summary_messages(messages)
+    assert len(summaries) == 1
+    kept = len(history_messages(messages))
+    excluded = list(conversation.history)[:len(conversation.history) - kept]
+    # Le résumé couvre les messages exclus les plus récents (sa taille est bornée)
+    assert f"Message {len(excluded) - 1}." in summaries[0]["content"]
+    assert "Message 0." not in [m["content"] for m in history_messages(messages)]
+
+
+def test_rolled_summary_is_kept_when_history_fits(audrey):
+    conversation = make_conversation(audrey, 2, summary="Interlocuteur : Quelle carte pour demain ?")
+    messages, used = audrey.build_context("Et ensuite ?", conversation, budget=2000)
+    summaries = summary_messages(messages)
+    assert len(summaries) == 1
+    assert "Quelle carte pour demain ?" in summaries[0]["content"]
+    assert len(history_messages(messages)) == 2
+    assert used <= 2000
+
+
+def test_long_prompt_is_truncated(audrey):
+    prompt = "Dites-moi tout. " * 1000
+    messages, used = audrey.build_context(prompt)
+    assert messages[-1]["content"].endswith(" [...]")
+    assert audrey.estimate_tokens(messages[-1]["content"]) <= audrey.CONTEXT_PROMPT_MAX_TOKENS + 2
+    assert used < audrey.estimate_tokens(prompt)
+
+
+def test_inactive_conversation_is_ignored(audrey):
+    conversation = make_conversation(audrey, 4)
+    conversation.active = False
+    messages, _ = audrey.build_context("Bonjour", conversation)
+    assert len(messages) == 2
@@ -0,0 +1,155 @@
+"""Stockage des conversations (ConversationStore sur SQLite)"""
+import asyncio
+import time
+
+import pytest
+
+
+@pytest.fixture
+def make_store(audrey, tmp_path):
+    def make(**options):
+        options.setdefault("flush_interval", 60)  # Écritures déclenchées par les tests (flush)
+        options.setdefault("sync_interval", 0)
+        backend = audrey.SQLiteConversationBackend(str(tmp_path / "conversations.db"))
+        return audrey.ConversationStore(backend, **options)
+
+    return make
+
+
+def test_start_append_end_roundtrip(make_store):
+    async def scenario():
+        store = make_store()
+        await store.open()
+        conversation = store.start(1, 100)
+        store.append(conversation, "user", "Bonjour Audrey")
+        store.append(conversation, "assistant", "Bonjour, chère amie.")
+        state = (store.is_active(1), store.active_channel(1), [turn.content for turn in conversation.history])
+        assert store.end(1)
+        ended = (store.is_active(1), conversation.active, store.end(1))
+        await store.close()
+        return state, ended
+
+    state, ended = asyncio.run(scenario())
+    assert state == (True, 100, ["Bonjour Audrey", "Bonjour, chère amie."])
+    assert ended == (False, False, False)
+
+
+def test_sessions_and_history_survive_restart(make_store):
+    async def scenario():
+        store = make_store()
+        await store.open()
+        conversation = store.start(1, 100)
+        store.append(conversation, "user", "Quelle carte pour demain ?")
+        store.append(conversation, "assistant", "La Roue de Fortune.")
+        store.start(2, 200)
+        store.end(2)
+        await store.close()
+
+        store = make_store()
+        await store.open()
+        assert store.get(1) is None  # Pas encore en mémoire
+        loaded = await store.load(1)
+        result = (store.active_count(), store.is_active(2), loaded.channel_id,
+                  [(turn.role, turn.content) for turn in loaded.history], store.loads)
+        await store.close()
+        return result
+
+    count, other_active, channel_id, history, loads = asyncio.run(scenario())
+    assert count == 1
+    assert not other_active
+    assert channel_id == 100
+    assert history == [("user", "Quelle carte pour demain ?"), ("assistant", "La Roue de Fortune.")]
+    assert loads == 1
+
+
+def test_cache_is_bounded_and_reloads_from_disk(make_store):
+    async def scenario():
+        store = make_store(cache_size=2)
+        await store.open()
+        for user_id in (1, 2, 3):
+            store.append(store.start(user_id, 100), "user", f"message {user_id}")
+        await store.flush()
+        evicted = store.get(1)
+        reloaded = await store.load(1)
+        await store.close()
+        return evicted, reloaded, store.evictions
+
+    evicted, reloaded, evictions = asyncio.run(scenario())
+    assert evicted is None
+    assert [turn.content for turn in reloaded.history] == ["message 1"]
+    assert evictions >= 1
+
+
+def test_expire_unloads_idle_conversations_behind_a_recent_read(make_store):
+    async def scenario():
+        store = make_store(idle_ttl=60, session_ttl=3600)
+        await store.open()
+        idle = store.start(1, 100)
+        other = store.start(2, 100)
+        idle.last_seen -= 120
+        other.last_seen -= 120
+        store.get(2)  # Lu récemment, mais sans nouveau message
+        store.get(1)
+        store._expire()
+        result = (store.get(1), store.get(2), store.is_active(1), store.is_active(2))
+        await store.close()
+        return result
+
+    assert asyncio.run(scenario()) == (None, None, True, True)
+
+
+def test_expire_ends_abandoned_sessions(make_store):
+    async def scenario():
+        store = make_store(session_ttl=60)
+        await store.open()
+        store.start(1, 100)
+        session_id, channel_id, _ = store._active[1]
+        store._active[1] = (session_id, channel_id, time.time() - 120)
+        store._expire()
+        result = (store.is_active(1), store.channel_users(100))
+        await store.close()
+        return result
+
+    active, users = asyncio.run(scenario())
+    assert not active
+    assert not users
+
+
+def test_append_after_end_of_evicted_conversation_is_dropped(make_store):
+    async def scenario():
+        store = make_store(cache_size=1)
+        await store.open()
+        in_flight = store.start(1, 100)
+        store.start(2, 100)  # Fait sortir la conversation 1 du cache pendant sa réponse
+        store.end(1)  # /stop ne peut pas marquer l'objet sorti du cache
+        store.append(in_flight, "assistant", "Réponse arrivée trop tard")
+        result = (store.is_active(1), store.channel_users(100), in_flight.active, len(in_flight.history),
+                  [op[0] for op in store._pending])
+        await store.close()
+        return result
+
+    active, users, conversation_active, turns, ops = asyncio.run(scenario())
+    assert not active
+    assert users == {2}
+    assert not conversation_active
+    assert turns == 0
+    assert "turn" not in ops
+
+
+def test_scenes_are_counted_apart_from_conversations(audrey, make_store):
+    async def scenario():
+        store = make_store()
+        await store.open()
+        store.start(1, 100)
+        store.start(2, 100)
+        store.start(audrey.scene_id(100), 100)
+        counts = [(store.active_count(), store.scene_count())]
+        store.start(audrey.scene_id(100), 100)  # Scène relancée : toujours une seule
+        counts.append((store.active_count(), store.scene_count()))
+        store.end(audrey.scene_id(100))
+        store.end(1)
+        counts.append((store.active_count(), store.scene_count()))
+        await store.close()
+        return counts
+
+    assert asyncio.run(scenario()) == [(2, 1), (2, 1), (1, 0)]
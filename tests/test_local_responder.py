@@ -0,0 +1,116 @@
+"""Répondeur local : plus proche voisin TF-IDF parmi les réponses passées (LocalResponder)"""
+import asyncio
+
+import pytest
+
+CORPUS = [
+    ("Peux-tu me tirer une carte ?", "Je tire pour vous l'Étoile : l'espoir revient."),
+    ("Que penses-tu de Klein ?", "Le Fou garde bien ses secrets, chère amie."),
+    ("Quel temps fait-il à Backlund ?", "Le brouillard de Backlund ne se lève jamais tout à fait."),
+    ("Raconte-moi une histoire du Club Tarot", "Il était une fois, au-dessus du brouillard gris..."),
+]
+
+
+@pytest.fixture
+def responder(audrey):
+    def make(corpus=CORPUS, **options):
+        options.setdefault("db_path", "")
+        options.setdefault("min_score", 0.3)
+        options.setdefault("enabled", True)
+        local = audrey.LocalResponder(**options)
+
+        async def learn_all():
+            for prompt, reply in corpus:
+                await local.learn(prompt, reply)
+
+        asyncio.run(learn_all())
+        return local
+
+    return make
+
+
+def test_empty_index_never_answers(responder):
+    local = responder(corpus=[])
+    assert local.match("Tire-moi une carte") == []
+    assert local.reply("Tire-moi une carte", "upstream") is None
+    assert local.misses == 1
+
+
+def test_close_prompt_gets_the_matching_reply(responder):
+    local = responder()
+    assert local.reply("Tirez-moi une carte s'il vous plaît", "upstream") == CORPUS[0][1]
+    assert local.reply("que pense tu de klein", "quota") == CORPUS[1][1]
+    assert local.served == {"upstream": 1, "quota": 1}
+
+
+def test_unrelated_prompt_is_below_threshold(responder):
+    local = responder()
+    assert local.reply("Combien coûte un billet de train pour Tingen ?", "upstream") is None
+    assert local.misses == 1
+
+
+def test_min_score_overrides_the_default_threshold(responder):
+    local = responder()
+    prompt = "tirer une carte demain"  # Proche, sans être identique
+    score = local.match(prompt)[0][0]
+    assert 0.3 <= score < 0.9
+    assert local.reply(prompt, "upstream") is not None
+    assert local.reply(prompt, "cheap", min_score=0.9) is None
+
+
+def test_reply_is_drawn_among_the_best_matches_only(responder):
+    corpus = [("Tire une carte", "Le Soleil."), ("Tire une carte", "La Lune."),
+              ("Tire une carte du tarot pour demain", "La Tour, prudence.")]
+    local = responder(corpus=corpus)
+    replies = {local.reply("Tire une carte", "upstream") for _ in range(50)}
+    assert replies == {"Le Soleil.", "La Lune."}  # La troisième est sous les 90 % du meilleur score
+
+
+def test_learn_skips_unsuitable_replies_and_duplicates(responder):
+    local = responder(corpus=[
+        ("Bonjour Audrey", "Bonjour, chère amie."),
+        ("Bonjour Audrey", "Bonjour, chère amie."),  # Doublon
+        ("[Scène] Alice : bonsoir", "Bonsoir à tous."),  # Message généré (scène)
+        ("Salut Audrey", "Salut <@123> !"),  # Mention : réponse propre à quelqu'un
+        ("Dis-moi tout " * 60, "Tout ?"),  # Message trop particulier
+    ])
+    assert local.stats()["replies"] == 1
+    assert local.learned == 1
+
+
+def test_oldest_replies_are_evicted(responder):
+    corpus = [(f"Question numéro {word}", f"Réponse {word}") for word in ("alpha", "beta", "gamma", "delta", "epsilon")]
+    local = responder(corpus=corpus, max_replies=3)
+    assert local.stats()["replies"] == 3
+    assert local.reply("Question numéro alpha", "upstream") is None
+    assert local.reply("Question numéro epsilon", "upstream") == "Réponse epsilon"
+    assert "alpha" not in local._postings  # Index inversé nettoyé
+
+
+def test_corpus_is_persisted_and_trimmed_on_reload(audrey, responder, tmp_path):
+    path = str(tmp_path / "local_replies.db")
+
+    async def reopen(max_replies):
+        local = audrey.LocalResponder(db_path=path, max_replies=max_replies, min_score=0.3, enabled=True)
+        await local.open()
+        result = (local.stats()["replies"], local.reply("Raconte une histoire du Club Tarot", "upstream"),
+                  local.reply("Peux-tu me tirer une carte ?", "upstream"))
+        await local.close()
+        return result
+
+    async def fill():
+        local = audrey.LocalResponder(db_path=path, max_replies=10, min_score=0.3, enabled=True)
+        await local.open()
+        for prompt, reply in CORPUS:
+            await local.learn(prompt, reply)
+        await local.close()
+
+    asyncio.run(fill())
+    assert asyncio.run(reopen(10)) == (4, CORPUS[3][1], CORPUS[0][1])
+    assert asyncio.run(reopen(2)) == (2, CORPUS[3][1], None)  # Seules les plus récentes restent
+
+
+def test_disabled_responder_learns_nothing(responder):
+    local = responder(enabled=False)
+    assert local.stats()["replies"] == 0
+    assert local.reply("Peux-tu me tirer une carte ?", "upstream") is None
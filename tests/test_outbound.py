@@ -0,0 +1,198 @@
+"""Découpage des messages et file de sortie Discord (split_message, OutboundSender)"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import discord
+import pytest
+
+LIMIT = 2000
+
+
+def test_short_and_exact_length_texts_are_not_split(audrey):
+    assert audrey.split_message("Bonjour") == ["Bonjour"]
+    assert audrey.split_message("") == [""]
+    exact = "a" * (LIMIT - 1) + "."
+    assert audrey.split_message(exact) == [exact]
+
+
+def test_one_character_over_the_limit_splits(audrey):
+    text = "Première phrase. " + "b" * (LIMIT - 16)
+    assert len(text) == LIMIT + 1
+    parts = audrey.split_message(text)
+    assert parts == ["Première phrase.", "b" * (LIMIT - 16)]
+
+
+def test_prefers_paragraph_then_sentence_boundaries(audrey):
+    first = "Le Fou ouvre la marche. " * 50
+    second = "La Lune veille sur lui. " * 50
+    parts = audrey.split_message(first.strip() + "\n\n" + second.strip())
+    assert parts == [first.strip(), second.strip()]
+
+    sentences = "Les cartes parlent. " * 150
+    parts = audrey.split_message(sentences.strip())
+    assert all(len(part) <= LIMIT for part in parts)
+    assert all(part.endswith(".") for part in parts)
+    assert " ".join(parts) == sentences.strip()
+
+
+def test_long_word_is_cut_at_the_limit(audrey):
+    word = "x" * (2 * LIMIT + 500)
+    assert audrey.split_message(word) == ["x" * LIMIT, "x" * LIMIT, "x" * 500]
+
+
+def test_code_block_crossing_the_limit_is_closed_and_reopened(audrey):
+    code = "\n".join(f"    tirage_{i} = tirer_carte(paquet, {i})" for i in range(80))
+    text = "Voici le script :\n\n```python\n" + code + "\n```\nBonne lecture !"
+    parts = audrey.split_message(text)
+    assert len(parts) >= 2
+    for part in parts:
+        assert len(part) <= LIMIT
+        assert audrey._open_fence(part) is None  # Chaque message a des blocs fermés
+    assert parts[1].startswith("```python\n    tirage_")
+    # Le code lu message par message est identique à l'original (indentation comprise)
+    lines = []
+    for part in parts:
+        inside = False
+        for line in part.split("\n"):
+            if line.startswith("```"):
+                inside = not inside
+            elif inside:
+                lines.append(line)
+    assert "\n".join(lines) == code
+
+
+def test_text_without_code_keeps_the_full_limit(audrey):
+    text = "a" * (LIMIT - 2) + "\n\n" + "b" * 10
+    assert audrey.split_message(text) == ["a" * (LIMIT - 2), "b" * 10]
+
+
+class Channel:
+    def __init__(self, fail_first: int = 0):
+        self.sent = []
+        self.fail_first = fail_first
+
+    async def send(self, content=None, **kwargs):
+        if self.fail_first:
+            self.fail_first -= 1
+            raise discord.HTTPException(SimpleNamespace(status=503, reason="Service Unavailable"), "indisponible")
+        message = SimpleNamespace(content=content, kwargs=kwargs, number=len(self.sent))
+        self.sent.append(message)
+        return message
+
+
+@pytest.fixture
+def sender(audrey):
+    def make(**options):
+        options.setdefault("channel_rate", 100)
+        options.setdefault("channel_per", 1)
+        options.setdefault("global_rate", 1000)
+        return audrey.OutboundSender(**options)
+
+    return make
+
+
+def test_messages_of_a_channel_keep_their_order(sender):
+    async def scenario():
+        outbound = sender()
+        channel = Channel()
+        results = await asyncio.gather(*(outbound.send(1, channel.send, f"message {i}") for i in range(10)))
+        return channel, results, outbound
+
+    channel, results, outbound = asyncio.run(scenario())
+    assert [message.content for message in channel.sent] == [f"message {i}" for i in range(10)]
+    assert [message.number for message in results] == list(range(10))
+    assert outbound.depth() == 0
+    assert outbound.stats()["busy_channels"] == 0
+
+
+def test_consecutive_notices_are_merged(sender):
+    async def scenario():
+        outbound = sender()
+        channel = Channel()
+        results = await asyncio.gather(
+            outbound.send(1, channel.send, "Réponse complète"),
+            outbound.send(1, channel.send, "⏳ Un instant...", mergeable=True),
+            outbound.send(1, channel.send, "⏳ Encore un instant...", mergeable=True),
+            outbound.send(1, channel.send, "Réponse suivante"),
+        )
+        return channel, results, outbound
+
+    channel, results, outbound = asyncio.run(scenario())
+    assert [message.content for message in channel.sent] == [
+        "Réponse complète", "⏳ Un instant...\n⏳ Encore un instant...", "Réponse suivante"]
+    assert results[1] is results[2]
+    assert outbound.merged == 1
+
+
+def test_merge_stops_at_the_discord_limit(sender):
+    async def scenario():
+        outbound = sender()
+        channel = Channel()
+        notice = "n" * 1200
+        await asyncio.gather(*(outbound.send(1, channel.send, notice, mergeable=True) for _ in range(3)))
+        return channel
+
+    channel = asyncio.run(scenario())
+    assert [len(message.content) for message in channel.sent] == [1200, 1200, 1200]
+
+
+def test_long_content_is_sent_in_parts(sender):
+    async def scenario():
+        outbound = sender()
+        channel = Channel()
+        last = await outbound.send(1, channel.send, "Une phrase du Club Tarot. " * 120, embed="carte")
+        return channel, last, outbound
+
+    channel, last, outbound = asyncio.run(scenario())
+    assert len(channel.sent) == 2
+    assert all(len(message.content) <= LIMIT for message in channel.sent)
+    assert last is channel.sent[-1]
+    assert channel.sent[0].kwargs == {}  # L'embed accompagne la dernière partie
+    assert channel.sent[1].kwargs == {"embed": "carte"}
+    assert outbound.parts_split == 1
+
+
+def test_channel_sends_are_paced(sender):
+    async def scenario():
+        outbound = sender(channel_rate=2, channel_per=0.2)  # Rafale de 2, puis 10 messages/s
+        channel = Channel()
+        started = time.monotonic()
+        await asyncio.gather(*(outbound.send(1, channel.send, f"message {i}") for i in range(6)))
+        elapsed = time.monotonic() - started
+        others = time.monotonic()
+        await outbound.send(2, Channel().send, "autre salon")
+        return elapsed, time.monotonic() - others
+
+    elapsed, other_channel = asyncio.run(scenario())
+    assert elapsed >= 0.35
+    assert other_channel < 0.05  # Chaque salon a son propre seau
+
+
+def test_cancelled_send_is_skipped(sender):
+    async def scenario():
+        outbound = sender(channel_rate=1, channel_per=0.1)
+        channel = Channel()
+        first = asyncio.create_task(outbound.send(1, channel.send, "premier"))
+        cancelled = asyncio.create_task(outbound.send(1, channel.send, "annulé"))
+        last = asyncio.create_task(outbound.send(1, channel.send, "dernier"))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.gather(first, last)
+        return channel
+
+    channel = asyncio.run(scenario())
+    assert [message.content for message in channel.sent] == ["premier", "dernier"]
+
+
+def test_server_errors_are_retried(sender):
+    async def scenario():
+        outbound = sender()
+        channel = Channel(fail_first=1)
+        message = await outbound.send(1, channel.send, "Bonjour")
+        return message, outbound
+
+    message, outbound = asyncio.run(scenario())
+    assert message.content == "Bonjour"
+    assert outbound.retries == 1
+    assert outbound.failed == 0
@@ -0,0 +1,94 @@
+"""Limites de débit et quotas de tokens (RateLimiter)"""
+import os
+
+import pytest
+
+
+@pytest.fixture
+def limiter(audrey, tmp_path):
+    def make(quota_fallback: bool = False):
+        limiter = audrey.RateLimiter(path=str(tmp_path / "rate_limits.json"), window=60, enabled=True,
+                                     quota_fallback=quota_fallback)
+        limiter.open()
+        return limiter
+
+    return make
+
+
+def test_disabled_limiter_admits_everything(audrey, tmp_path):
+    limiter = audrey.RateLimiter(path=str(tmp_path / "rate_limits.json"), enabled=False)
+    assert all(limiter.check(1, 2, 3) is None for _ in range(100))
+
+
+def test_user_burst_then_throttled_once(limiter):
+    limiter = limiter()
+    limiter.configure(3, user_per_minute=6, user_burst=2)
+    assert limiter.check(1, 2, 3) is None
+    assert limiter.check(1, 2, 3) is None
+    scope, retry_after, notify = limiter.check(1, 2, 3)
+    assert scope == "user"
+    assert 0 < retry_after <= 10
+    assert notify
+    # Refus suivants du même épisode : pas de nouvel avertissement
+    assert limiter.check(1, 2, 3)[2] is False
+    # Un autre utilisateur du même serveur n'est pas concerné
+    assert limiter.check(4, 2, 3) is None
+    assert limiter.throttled["user"] == 2
+
+
+def test_denied_message_takes_no_token_from_other_scopes(limiter):
+    limiter = limiter()
+    limiter.configure(3, user_per_minute=60, user_burst=1, channel_per_minute=60, channel_burst=2)
+    assert limiter.check(1, 2, 3) is None
+    assert limiter.check(1, 2, 3)[0] == "user"
+    # Le refus de l'utilisateur 1 n'a pas consommé de jeton du salon
+    assert limiter.check(5, 2, 3) is None
+    assert limiter.check(6, 2, 3)[0] == "channel"
+
+
+def test_guild_settings_are_saved_and_reset(audrey, limiter, tmp_path):
+    first = limiter()
+    first.configure(3, user_burst=1)
+    assert os.path.exists(tmp_path / "rate_limits.json")
+    second = limiter()
+    assert second.limits(3).user_burst == 1
+    assert second.limits(4).user_burst == audrey.RATE_USER_BURST
+    assert second.reset(3).user_burst == audrey.RATE_USER_BURST
+
+
+def test_token_quota_refuses_messages_without_fallback(limiter):
+    limiter = limiter(quota_fallback=False)
+    limiter.configure(3, user_token_quota=100)
+    with limiter.consumer([1], 3):
+        limiter.charge(150)
+    assert limiter.usage("user", 1) == 150
+    assert limiter.usage("guild", 3) == 150
+    scope, retry_after, _ = limiter.check(1, 2, 3)
+    assert scope == "user_quota"
+    assert retry_after >= 1
+    assert limiter.check(4, 2, 3) is None
+
+
+def test_token_quota_switches_to_local_replies_with_fallback(limiter):
+    limiter = limiter(quota_fallback=True)
+    limiter.configure(3, user_token_quota=100)
+    with limiter.consumer([1], 3):
+        limiter.charge(150)
+    assert limiter.check(1, 2, 3) is None  # Message admis : la réponse sera locale
+    with limiter.consumer([1], 3):
+        assert limiter.over_quota()[0] == "user_quota"
+    with limiter.consumer([4], 3):
+        assert limiter.over_quota() is None
+    assert limiter.over_quota() is None  # Hors d'un appel à l'IA
+
+
+def test_scene_over_quota_only_when_every_participant_is(limiter):
+    limiter = limiter(quota_fallback=True)
+    limiter.configure(3, user_token_quota=100)
+    with limiter.consumer([1], 3):
+        limiter.charge(150)
+    with limiter.consumer([1, 2], 3):
+        assert limiter.over_quota() is None
+        limiter.charge(300)  # Partagé : 150 chacun
+    with limiter.consumer([1, 2], 3):
+        assert limiter.over_quota()[0] == "user_quota"
@@ -0,0 +1,94 @@
+"""Cache des réponses sans contexte : variantes, expiration et disque (ResponseCache)"""
+import asyncio
+import time
+
+
+def test_key_ignores_case_accents_and_punctuation(audrey):
+    key = audrey.ResponseCache.key
+    assert key("Tire-moi une carte !") == key("tire moi une carte")
+    assert key("Tire-moi une carte") != key("Tire-moi deux cartes")
+    assert key("Tire-moi une carte", temperature=0.2) != key("Tire-moi une carte", temperature=0.9)
+
+
+def test_miss_until_all_variants_are_collected(audrey):
+    async def scenario():
+        cache = audrey.ResponseCache(db_path="", variants=3)
+        key = cache.key("Quelle carte pour demain ?")
+        results = [await cache.get(key)]
+        for reply in ("Le Soleil.", "Le Soleil.", "La Lune."):  # Le doublon ne compte pas
+            await cache.put(key, reply)
+            results.append(await cache.get(key))
+        await cache.put(key, "L'Étoile.")
+        served = {await cache.get(key) for _ in range(50)}
+        await cache.put(key, "La Tour.")  # Réserve pleine : ignorée
+        await cache.close()
+        return results, served, cache
+
+    results, served, cache = asyncio.run(scenario())
+    assert results == [None, None, None, None]
+    assert served == {"Le Soleil.", "La Lune.", "L'Étoile."}
+    assert cache.misses == 4 and cache.hits == 50
+
+
+def test_entries_expire_after_ttl(audrey, monkeypatch):
+    async def scenario():
+        cache = audrey.ResponseCache(db_path="", variants=1, ttl=60)
+        key = cache.key("Bonjour Audrey")
+        await cache.put(key, "Bonjour, chère amie.")
+        fresh = await cache.get(key)
+        now = time.time()
+        monkeypatch.setattr(audrey.time, "time", lambda: now + 61)
+        expired = (await cache.get(key), cache.stats()["entries"])
+        await cache.put(key, "Bonsoir, chère amie.")  # Nouvelle entrée, datée de maintenant
+        renewed = await cache.get(key)
+        await cache.close()
+        return fresh, expired, renewed
+
+    fresh, expired, renewed = asyncio.run(scenario())
+    assert fresh == "Bonjour, chère amie."
+    assert expired == (None, 0)
+    assert renewed == "Bonsoir, chère amie."
+
+
+def test_least_recently_used_entry_is_evicted(audrey):
+    async def scenario():
+        cache = audrey.ResponseCache(db_path="", variants=1, max_entries=2)
+        keys = [cache.key(f"question {word}") for word in ("alpha", "beta", "gamma")]
+        await cache.put(keys[0], "réponse alpha")
+        await cache.put(keys[1], "réponse beta")
+        await cache.get(keys[0])  # alpha redevient la plus récente
+        await cache.put(keys[2], "réponse gamma")
+        result = [await cache.get(key) for key in keys]
+        await cache.close()
+        return result
+
+    assert asyncio.run(scenario()) == ["réponse alpha", None, "réponse gamma"]
+
+
+def test_variants_survive_restart_on_disk(audrey, tmp_path):
+    path = str(tmp_path / "response_cache.db")
+
+    async def scenario():
+        cache = audrey.ResponseCache(db_path=path, variants=2)
+        await cache.open()
+        key = cache.key("Raconte-moi une histoire")
+        await cache.put(key, "Il était une fois...")
+        await cache.put(key, "Au-dessus du brouillard gris...")
+        await cache.close()
+
+        cache = audrey.ResponseCache(db_path=path, variants=2)
+        await cache.open()
+        served = {await cache.get(key) for _ in range(20)}
+        disk_hits = cache.disk_hits
+        await cache.close()
+
+        cache = audrey.ResponseCache(db_path=path, variants=2, ttl=0)  # Entrées périmées purgées à l'ouverture
+        await cache.open()
+        purged = await cache.get(key)
+        await cache.close()
+        return served, disk_hits, purged
+
+    served, disk_hits, purged = asyncio.run(scenario())
+    assert served == {"Il était une fois...", "Au-dessus du brouillard gris..."}
+    assert disk_hits == 1
+    assert purged is None
@@ -0,0 +1,166 @@
+"""Énigmes en cours : réponses, expirations et reprise (RiddleManager)"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+
+class Bot:
+    """Ce dont RiddleManager a besoin : la file de sortie et les salons connus"""
+
+    def __init__(self, audrey, channels=()):
+        self.outbound = audrey.OutboundSender(channel_rate=100, channel_per=1, global_rate=1000)
+        self.channels = {channel_id: Verdicts() for channel_id in channels}
+
+    async def wait_until_ready(self):
+        pass
+
+    def get_channel(self, channel_id):
+        return self.channels.get(channel_id)
+
+
+class Verdicts:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content):
+        self.sent.append(content)
+        return SimpleNamespace(content=content)
+
+
+def message(channel_id: int, user_id: int, content: str):
+    return SimpleNamespace(channel=SimpleNamespace(id=channel_id), author=SimpleNamespace(id=user_id), content=content)
+
+
+@pytest.fixture
+def store(audrey, tmp_path, monkeypatch):
+    """Stockage SQLite propre au test, à la place du stockage global du bot"""
+    def make():
+        backend = audrey.SQLiteConversationBackend(str(tmp_path / "conversations.db"))
+        conversations = audrey.ConversationStore(backend, flush_interval=60, sync_interval=0)
+        monkeypatch.setattr(audrey, "conversations", conversations)
+        return conversations
+
+    return make
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_correct_answer_ends_the_riddle(audrey, store):
+    async def scenario():
+        conversations = store()
+        await conversations.open()
+        manager = audrey.RiddleManager(Bot(audrey), duration=60)
+        verdicts = Verdicts()
+        manager.start(1, 10, 0, verdicts.send)  # Réponse : « le mystère »
+        handled = (manager.handle(message(1, 11, "le mystère")),  # Autre utilisateur
+                   manager.handle(message(1, 10, "C'est LE Mystere !")))
+        await settle()
+        again = manager.handle(message(1, 10, "le mystère"))
+        await conversations.flush()
+        pending = await conversations.load_riddles()
+        await manager.close()
+        await conversations.close()
+        return handled, again, verdicts.sent, manager.stats(), pending
+
+    handled, again, sent, stats, pending = asyncio.run(scenario())
+    assert handled == (False, True)
+    assert not again  # L'énigme est terminée
+    assert len(sent) == 1 and "percé le mystère" in sent[0]
+    assert stats["active"] == 0 and stats["solved"] == 1 and stats["answered"] == 1
+    assert pending == []
+
+
+def test_wrong_answer_reveals_the_solution(audrey, store):
+    async def scenario():
+        conversations = store()
+        await conversations.open()
+        manager = audrey.RiddleManager(Bot(audrey), duration=60)
+        verdicts = Verdicts()
+        manager.start(1, 10, 2, verdicts.send)
+        manager.handle(message(1, 10, "le silence"))
+        await settle()
+        await manager.close()
+        await conversations.close()
+        return verdicts.sent, manager.stats()
+
+    sent, stats = asyncio.run(scenario())
+    assert sent == ["🕊️ La réponse était : **le secret**. La vérité se cache parfois dans l'ombre..."]
+    assert stats["solved"] == 0 and stats["answered"] == 1
+
+
+def test_expiry_fires_in_deadline_order(audrey, store):
+    async def scenario():
+        conversations = store()
+        await conversations.open()
+        manager = audrey.RiddleManager(Bot(audrey), duration=0.3)
+        verdicts = Verdicts()
+        manager.start(1, 10, 0, verdicts.send)
+        manager.duration = 0.1
+        manager.start(1, 11, 1, verdicts.send)  # Échéance plus proche : le minuteur doit se réveiller plus tôt
+        await asyncio.sleep(0.2)
+        early = (list(verdicts.sent), manager.stats()["active"])
+        await asyncio.sleep(0.25)
+        await manager.close()
+        await conversations.close()
+        return early, verdicts.sent, manager.stats()
+
+    (early, active), sent, stats = asyncio.run(scenario())
+    assert active == 1
+    assert len(early) == 1 and "le savoir" in early[0]
+    assert len(sent) == 2 and "le mystère" in sent[1]
+    assert stats["expired"] == 2 and stats["active"] == 0
+
+
+def test_replaced_riddle_leaves_a_stale_heap_entry_ignored(audrey, store):
+    async def scenario():
+        conversations = store()
+        await conversations.open()
+        manager = audrey.RiddleManager(Bot(audrey), duration=0.1)
+        verdicts = Verdicts()
+        manager.start(1, 10, 0, verdicts.send)
+        manager.duration = 60
+        manager.start(1, 10, 1, verdicts.send)  # Nouvelle énigme : l'entrée à 0,1 s devient caduque
+        await asyncio.sleep(0.2)
+        state = (list(verdicts.sent), manager.stats()["expired"], len(manager._heap))
+        manager.handle(message(1, 10, "le savoir"))
+        await settle()
+        await manager.close()
+        await conversations.close()
+        return state, verdicts.sent
+
+    (early, expired, heap), sent = asyncio.run(scenario())
+    assert early == [] and expired == 0
+    assert heap == 1  # L'entrée caduque a été retirée du tas, sans verdict
+    assert len(sent) == 1 and "percé le mystère" in sent[0]
+
+
+def test_riddles_are_resumed_after_restart(audrey, store):
+    async def scenario():
+        conversations = store()
+        await conversations.open()
+        manager = audrey.RiddleManager(Bot(audrey), duration=60)
+        manager.start(1, 10, 0, Verdicts().send)
+        manager.start(2, 20, 1, Verdicts().send)  # Salon d'un autre worker
+        await manager.close()
+        await conversations.close()
+
+        conversations = store()
+        await conversations.open()
+        bot = Bot(audrey, channels=[1])
+        manager = audrey.RiddleManager(bot)
+        await manager.resume()
+        resumed = manager.stats()
+        handled = (manager.handle(message(1, 10, "mystère")), manager.handle(message(2, 20, "le savoir")))
+        await settle()
+        await manager.close()
+        await conversations.close()
+        return resumed, handled, bot.channels[1].sent
+
+    resumed, handled, sent = asyncio.run(scenario())
+    assert resumed["resumed"] == 2 and resumed["active"] == 2
+    assert handled == (True, True)
+    assert len(sent) == 1 and "percé le mystère" in sent[0]  # Le verdict du salon 2 revient à son worker
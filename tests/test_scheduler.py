@@ -0,0 +1,102 @@
+"""File d'attente des requêtes IA (RequestScheduler)"""
+import asyncio
+
+import pytest
+
+
+def test_grants_immediately_under_capacity(audrey):
+    async def scenario():
+        scheduler = audrey.RequestScheduler(max_concurrent=2, per_guild=2, max_queue=5, max_wait=1)
+        await scheduler.acquire(1, 10)
+        await scheduler.acquire(1, 11)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.active == 2
+    assert scheduler.depth == 0
+    assert scheduler.granted == 2
+
+
+def test_rejects_when_queue_is_full(audrey):
+    async def scenario():
+        scheduler = audrey.RequestScheduler(max_concurrent=1, per_guild=1, max_queue=1, max_wait=1)
+        await scheduler.acquire(1, 10)
+        waiting = asyncio.create_task(scheduler.acquire(1, 11))
+        await asyncio.sleep(0)
+        with pytest.raises(audrey.SchedulerFull):
+            await scheduler.acquire(1, 12)
+        scheduler.release(1)
+        await waiting
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.rejected == 1
+    assert scheduler.active == 1
+
+
+def test_expires_requests_that_wait_too_long(audrey):
+    async def scenario():
+        scheduler = audrey.RequestScheduler(max_concurrent=1, per_guild=1, max_queue=5, max_wait=0.05)
+        await scheduler.acquire(None, 10)
+        with pytest.raises(audrey.RequestExpired):
+            await scheduler.acquire(None, 11)
+        return scheduler
+
+    scheduler = asyncio.run(scenario())
+    assert scheduler.expired == 1
+    assert scheduler.depth == 0
+
+
+def test_round_robin_between_users(audrey):
+    async def scenario():
+        scheduler = audrey.RequestScheduler(max_concurrent=1, per_guild=1, max_queue=10, max_wait=1)
+        order = []
+
+        async def request(user_id):
+            async with scheduler.slot(None, user_id):
+                order.append(user_id)
+                await asyncio.sleep(0)
+
+        await scheduler.acquire(None, 0)
+        # L'utilisateur 1 envoie trois messages avant que l'utilisateur 2 n'en envoie un
+        tasks = [asyncio.create_task(request(user_id)) for user_id in (1, 1, 1, 2)]
+        await asyncio.sleep(0)
+        scheduler.release(None)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == [1, 2, 1, 1]
+
+
+def test_background_priority_waits_for_interactive(audrey):
+    async def scenario():
+        scheduler = audrey.RequestScheduler(max_concurrent=1, per_guild=1, max_queue=10, max_wait=1)
+        order = []
+
+        async def request(user_id, priority):
+            async with scheduler.slot(None, user_id, priority):
+                order.append(user_id)
+
+        await scheduler.acquire(None, 0)
+        tasks = [asyncio.create_task(request(1, audrey.PRIORITY_BACKGROUND)),
+                 asyncio.create_task(request(2, audrey.PRIORITY_INTERACTIVE))]
+        await asyncio.sleep(0)
+        scheduler.release(None)
+        await asyncio.gather(*tasks)
+        return order
+
+    assert asyncio.run(scenario()) == [2, 1]
+
+
+def test_busy_guild_does_not_block_others(audrey):
+    async def scenario():
+        scheduler = audrey.RequestScheduler(max_concurrent=3, per_guild=1, max_queue=10, max_wait=1)
+        await scheduler.acquire(1, 10)
+        blocked = asyncio.create_task(scheduler.acquire(1, 11))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(scheduler.acquire(2, 20), timeout=1)
+        state = (scheduler.active, scheduler.depth, blocked.done())
+        blocked.cancel()
+        return state
+
+    assert asyncio.run(scenario()) == (2, 1, False)
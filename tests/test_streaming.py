@@ -0,0 +1,108 @@
+"""Réponses en streaming contre le faux Routway (SSE, repli JSON, flux coupé, messages de plus de 2000 caractères)"""
+import asyncio
+
+from fake_routway import REPLIES, FakeRoutway
+
+LONG_REPLY = " ".join(
+    f"Phrase {i} : les cartes du Club Tarot murmurent encore un secret que le brouillard garde pour lui."
+    for i in range(30)
+)
+
+
+class FixedReply(FakeRoutway):
+    def __init__(self, reply: str, **options):
+        super().__init__(chunk_delay=0, **options)
+        self.reply = reply
+
+    def pick_reply(self, body: dict) -> str:
+        return self.reply
+
+
+async def collect(audrey, prompt: str = "Bonjour Audrey"):
+    return [delta async for delta in audrey.stream_audrey_response(prompt)]
+
+
+def test_stream_parses_sse_chunks(audrey, routway):
+    async def scenario():
+        async with routway(FixedReply(REPLIES[0], chunk_size=12)) as server:
+            return await collect(audrey), server
+
+    chunks, server = asyncio.run(scenario())
+    assert server.streamed == 1
+    assert "".join(chunks) == REPLIES[0]
+    assert len(chunks) == -(-len(REPLIES[0]) // 12)
+    assert all(len(chunk) <= 12 for chunk in chunks)
+
+
+def test_stream_falls_back_to_json_response(audrey, routway):
+    async def scenario():
+        async with routway(FixedReply(REPLIES[1], stream=False)) as server:
+            return await collect(audrey), server
+
+    chunks, server = asyncio.run(scenario())
+    assert server.streamed == 0
+    assert chunks == [REPLIES[1]]  # Réponse complète en un seul fragment
+
+
+def test_stream_cut_midway_raises_after_partial_text(audrey, routway):
+    async def scenario():
+        chunks = []
+        async with routway(FixedReply(REPLIES[2], chunk_size=12, cut_after=36)):
+            try:
+                async for delta in audrey.stream_audrey_response("Bonjour"):
+                    chunks.append(delta)
+            except audrey.UpstreamError as e:
+                return chunks, e
+        return chunks, None
+
+    chunks, error = asyncio.run(scenario())
+    assert error is not None
+    assert "".join(chunks) == REPLIES[2][:36]
+
+
+def test_send_streamed_reply_marks_interrupted_reply(audrey, routway, channel):
+    async def scenario():
+        async with routway(FixedReply(REPLIES[0], chunk_size=12, cut_after=60)):
+            return await audrey.send_streamed_reply("Bonjour", None, channel.send)
+
+    text = asyncio.run(scenario())
+    assert text == REPLIES[0][:60] + "…"
+    assert channel.contents == [text]
+
+
+def test_send_streamed_reply_retries_without_stream_when_cut_before_text(audrey, routway, channel):
+    async def scenario():
+        async with routway(FixedReply(REPLIES[1], chunk_size=12, cut_after=0)) as server:
+            return await audrey.send_streamed_reply("Bonjour", None, channel.send), server
+
+    text, server = asyncio.run(scenario())
+    assert server.cut == 1
+    assert server.requests == 2  # Flux coupé avant tout texte, puis appel classique
+    assert text == REPLIES[1]
+    assert channel.contents == [REPLIES[1]]
+
+
+def test_send_streamed_reply_uses_fallback_when_upstream_fails(audrey, routway, channel):
+    async def scenario():
+        async with routway(FixedReply(REPLIES[0], error_rate=1.0)) as server:
+            return await audrey.send_streamed_reply("Bonjour", None, channel.send), server
+
+    text, server = asyncio.run(scenario())
+    assert server.errors == audrey.bot.upstream.max_attempts
+    assert text not in REPLIES
+    assert channel.contents == [text]
+
+
+def test_send_streamed_reply_rolls_over_discord_limit(audrey, routway, channel):
+    async def scenario():
+        async with routway(FixedReply(LONG_REPLY, chunk_size=150)):
+            return await audrey.send_streamed_reply("Raconte-moi tout", None, channel.send)
+
+    text = asyncio.run(scenario())
+    assert len(LONG_REPLY) > audrey.DISCORD_MESSAGE_LIMIT
+    assert text == LONG_REPLY
+    assert len(channel.messages) == 2
+    first, second = channel.contents
+    assert len(first) <= audrey.DISCORD_MESSAGE_LIMIT
+    assert first.endswith(".")  # Coupé à une fin de phrase
+    assert first + " " + second == LONG_REPLY
@@ -0,0 +1,164 @@
+"""Faux serveur Routway local pour tester Audrey sans appeler la vraie API.
+
+Imite `POST /v1/chat/completions` au format OpenAI :
+- réponse JSON classique ;
+- réponse en Server-Sent Events quand la requête contient `"stream": true` ;
+- pannes simulées : erreurs 503 et limitations 429 (avec `Retry-After`) à un taux donné ;
+- flux coupé : connexion fermée au milieu d'une réponse SSE, sans `[DONE]`.
+
+Utilisation :
+    python tools/fake_routway.py --port 8089 --chunk-delay 0.05
+    ROUTWAY_API_URL=http://127.0.0.1:8089/v1/chat/completions ROUTWAY_API_KEY=test python bot.py
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from aiohttp import web
+
+REPLIES = [
+    "Ah, chère amie, les cartes murmurent que votre chemin croise celui d'un mystère ancien. "
+    "Restez attentive aux signes que le brouillard de Backlund voudra bien vous révéler.",
+    "Quelle question délicieuse... La Justice tient sa balance avec patience, et je crois que "
+    "la réponse se trouve déjà dans votre cœur, quelque part entre la raison et l'intuition.",
+    "Le Club Tarot m'a appris qu'aucune coïncidence n'est innocente. Dites-m'en davantage, "
+    "je vous écoute avec la plus grande attention.",
+]
+
+
+class FakeRoutway:
+    def __init__(self, latency: float = 0.0, chunk_delay: float = 0.03, chunk_size: int = 12,
+                 stream: bool = True, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 retry_after: float = 1.0, jitter: float = 0.0, cut_after: int = None):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunk_size = chunk_size
+        self.stream = stream
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.jitter = jitter  # Variation relative de la latence (0.5 = ±50 %)
+        self.cut_after = cut_after  # Flux coupé après ce nombre de caractères (None = jamais)
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.streamed = 0
+        self.cut = 0
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "streamed": self.streamed,
+            "cut": self.cut,
+        }
+
+    def pick_reply(self, body: dict) -> str:
+        return random.choice(REPLIES)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.completions)
+        return app
+
+    async def completions(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        latency = self.latency
+        if latency and self.jitter:
+            latency *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        if latency > 0:
+            await asyncio.sleep(latency)
+
+        roll = random.random()
+        if roll < self.rate_limit_rate:
+            self.rate_limited += 1
+            return web.json_response({"error": {"message": "Rate limit exceeded", "type": "rate_limit"}},
+                                     status=429, headers={"Retry-After": f"{self.retry_after:g}"})
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.errors += 1
+            return web.json_response({"error": {"message": "Upstream unavailable", "type": "server_error"}},
+                                     status=503)
+
+        reply = self.pick_reply(body)
+
+        if body.get("stream") and self.stream:
+            self.streamed += 1
+            return await self._stream(request, body, reply)
+
+        return web.json_response({
+            "id": f"fake-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        })
+
+    async def _stream(self, request: web.Request, body: dict, reply: str,
+                      chunk_delay: float = None) -> web.StreamResponse:
+        if chunk_delay is None:
+            chunk_delay = self.chunk_delay
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await resp.prepare(request)
+        await resp.write(b": keep-alive\n\n")
+        try:
+            for i in range(0, len(reply), self.chunk_size):
+                if self.cut_after is not None and i >= self.cut_after:
+                    # Connexion fermée en plein flux : le client reçoit une réponse incomplète
+                    self.cut += 1
+                    request.transport.close()
+                    return resp
+                event = {
+                    "id": f"fake-{self.requests}",
+                    "object": "chat.completion.chunk",
+                    "model": body.get("model"),
+                    "choices": [{"index": 0, "delta": {"content": reply[i:i + self.chunk_size]}, "finish_reason": None}],
+                }
+                await resp.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8"))
+                if chunk_delay:
+                    await asyncio.sleep(chunk_delay)
+            await resp.write(b"data: [DONE]\n\n")
+            await resp.write_eof()
+        except ConnectionResetError:
+            pass  # Le bot a abandonné la réponse (lot annulé par un nouveau message)
+        return resp
+
+
+async def start_server(server: FakeRoutway, host: str = "127.0.0.1", port: int = 8089) -> web.AppRunner:
+    """Démarrer le faux serveur dans la boucle courante (pour les scripts de test).
+
+    Avec `port=0`, un port libre est choisi : voir `runner.addresses`.
+    """
+    runner = web.AppRunner(server.app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur Routway (JSON + SSE)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0, help="Délai avant la première réponse (s)")
+    parser.add_argument("--chunk-delay", type=float, default=0.03, help="Délai entre deux fragments SSE (s)")
+    parser.add_argument("--chunk-size", type=int, default=12, help="Caractères par fragment SSE")
+    parser.add_argument("--no-stream", action="store_true", help="Ignorer `stream: true` (teste le repli)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variation relative de la latence (0.5 = ±50 %%)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Proportion de réponses 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="En-tête Retry-After des 429 (s)")
+    parser.add_argument("--cut-after", type=int, default=None, help="Couper chaque flux après N caractères")
+    args = parser.parse_args()
+
+    server = FakeRoutway(args.latency, args.chunk_delay, args.chunk_size, stream=not args.no_stream,
+                         error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                         retry_after=args.retry_after, jitter=args.jitter, cut_after=args.cut_after)
+    print(f"🎴 Faux Routway sur http://{args.host}:{args.port}/v1/chat/completions")
+    web.run_app(server.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,578 @@
+"""Test de charge de bout en bout : trafic Discord simulé contre un faux serveur Routway.
+
+Chaque utilisateur virtuel joue un scénario complet avec des objets Discord simulés :
+`/devinette` (selon --riddle-ratio), `/parler`, plusieurs messages dans la conversation
+(qui passent par `on_message`, le regroupement, la file d'attente et le streaming), puis `/stop`.
+L'API Routway est remplacée par `fake_routway.FakeRoutway` (latence, erreurs 503 et 429
+configurables) ; Discord n'est jamais contacté.
+
+Le rapport JSON contient le débit, les latences p50/p95/p99 (premier fragment affiché et
+réponse complète), la croissance mémoire des conversations et le retard de la boucle asyncio.
+Avec `--baseline`, le rapport est comparé à un rapport précédent et le script sort en erreur
+si le chemin de conversation a régressé (utilisable avant un déploiement).
+
+Utilisation :
+    python tools/loadtest.py --users 500 --turns 3 --latency 0.3 --output rapport.json
+    python tools/loadtest.py --users 500 --baseline rapport.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+from fake_routway import FakeRoutway, start_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PROMPTS = [
+    "Bonjour Audrey, comment allez-vous aujourd'hui ?",
+    "Que pensez-vous des rumeurs sur le Club Tarot ?",
+    "Pouvez-vous me tirer les cartes pour cette semaine ?",
+    "J'ai fait un rêve étrange cette nuit, un miroir qui parlait...",
+    "Quel est votre avis sur la Justice et ses décisions ?",
+    "Racontez-moi une histoire de Backlund sous le brouillard.",
+]
+
+# -----------------------------
+# Objets Discord simulés
+# -----------------------------
+class FakeUser:
+    def __init__(self, user_id: int, bot: bool = False):
+        self.id = user_id
+        self.bot = bot
+        self.name = f"user{user_id}"
+        self.display_name = f"Voyageur {user_id}"
+        self.mention = f"<@{user_id}>"
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int):
+        self.id = guild_id
+        self.name = f"guild{guild_id}"
+
+
+class FakeSentMessage:
+    def __init__(self, channel, content, embed):
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+
+    async def edit(self, content=None, embed=None, **kwargs):
+        await self.channel.api_call()
+        if content is not None:
+            self.content = content
+        self.channel.edits += 1
+
+
+class _Typing:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeChannel:
+    """Salon dont chaque appel à l'API Discord coûte `latency` secondes"""
+
+    def __init__(self, channel_id: int, guild: FakeGuild, latency: float):
+        self.id = channel_id
+        self.guild = guild
+        self.latency = latency
+        self.sent = []
+        self.edits = 0
+        self.on_send = None  # Rappel(content) à chaque message envoyé
+
+    async def api_call(self):
+        if self.latency > 0:
+            await asyncio.sleep(self.latency)
+
+    async def send(self, content=None, embed=None, **kwargs):
+        await self.api_call()
+        message = FakeSentMessage(self, content, embed)
+        self.sent.append(message)
+        if self.on_send is not None:
+            self.on_send(content)
+        return message
+
+    def typing(self):
+        return _Typing()
+
+
+class FakeMessage:
+    def __init__(self, author: FakeUser, channel: FakeChannel, content: str):
+        import discord
+        self.id = random.getrandbits(60)
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.mentions = []
+        self.created_at = discord.utils.utcnow()
+
+
+class _FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def defer(self, **kwargs):
+        await self.interaction.channel.api_call()
+        self.done = True
+
+    async def send_message(self, content=None, embed=None, **kwargs):
+        self.done = True
+        await self.interaction.channel.send(content, embed=embed)
+
+
+class _FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, embed=None, wait=False, **kwargs):
+        return await self.interaction.channel.send(content, embed=embed)
+
+
+class FakeInteraction:
+    def __init__(self, user: FakeUser, channel: FakeChannel):
+        import discord
+        self.user = user
+        self.channel = channel
+        self.guild = channel.guild
+        self.created_at = discord.utils.utcnow()
+        self.extras = {}
+        self.command = None
+        self.namespace = SimpleNamespace()
+        self.response = _FakeResponse(self)
+        self.followup = _FakeFollowup(self)
+
+
+# -----------------------------
+# Mesures
+# -----------------------------
+def percentiles(values) -> dict:
+    if not values:
+        return {"count": 0}
+    ordered = sorted(values)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 4)
+
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": pick(0.50),
+        "p95": pick(0.95),
+        "p99": pick(0.99),
+        "max": round(ordered[-1], 4),
+    }
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LoopLagMonitor:
+    """Mesure le retard de réveil d'une tâche qui dort `interval` secondes.
+
+    Relève au passage le pic de mémoire et de conversations actives (`probe()`).
+    """
+
+    def __init__(self, probe, interval: float = 0.05):
+        self.probe = probe
+        self.interval = interval
+        self.samples = []
+        self.rss_peak = 0
+        self.active_peak = 0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - expected))
+            if len(self.samples) % 20 == 0:
+                self._measure()
+
+    def _measure(self):
+        self.rss_peak = max(self.rss_peak, rss_bytes())
+        self.active_peak = max(self.active_peak, self.probe())
+
+
+class Recorder:
+    def __init__(self):
+        self.first_reply = {}
+        self.complete = {}
+        self.outcomes = {}
+
+    def observe(self, op: str, first=None, complete=None, outcome: str = "ok"):
+        if first is not None:
+            self.first_reply.setdefault(op, []).append(first)
+        if complete is not None:
+            self.complete.setdefault(op, []).append(complete)
+        counts = self.outcomes.setdefault(op, {})
+        counts[outcome] = counts.get(outcome, 0) + 1
+
+    def report(self) -> dict:
+        ops = sorted(set(self.outcomes))
+        return {
+            op: {
+                "outcomes": self.outcomes.get(op, {}),
+                "first_reply_seconds": percentiles(self.first_reply.get(op, [])),
+                "reply_seconds": percentiles(self.complete.get(op, [])),
+            }
+            for op in ops
+        }
+
+
+# -----------------------------
+# Scénario d'un utilisateur virtuel
+# -----------------------------
+class VirtualUser:
+    def __init__(self, harness, user_id: int, channel: FakeChannel):
+        self.harness = harness
+        self.user = FakeUser(user_id)
+        self.channel = channel
+        self.first_at = None
+        self.reply_text = None
+        self._send_waiter = None
+        channel.on_send = self._on_send
+
+    def _on_send(self, content):
+        if self.first_at is None and content is not None:
+            self.first_at = time.perf_counter()
+            self.reply_text = content
+            if self._send_waiter is not None and not self._send_waiter.done():
+                self._send_waiter.set_result(None)
+
+    def _outcome(self) -> str:
+        bot_module = self.harness.bot_module
+        if self.reply_text == bot_module.BUSY_REPLY:
+            return "busy"
+        if self.reply_text == bot_module.EXPIRED_REPLY:
+            return "expired"
+        return "ok"
+
+    async def think(self):
+        delay = self.harness.args.think
+        if delay > 0:
+            await asyncio.sleep(random.uniform(0.5 * delay, 1.5 * delay))
+
+    async def run(self):
+        args = self.harness.args
+        if random.random() < args.riddle_ratio:
+            await self.riddle()
+            await self.think()
+        if not await self.parler():
+            return
+        for _ in range(args.turns):
+            await self.think()
+            await self.message()
+        await self.think()
+        await self.stop()
+
+    async def parler(self) -> bool:
+        self.first_at = None
+        interaction = FakeInteraction(self.user, self.channel)
+        started = time.perf_counter()
+        try:
+            await self.harness.invoke("parler", interaction, message=random.choice(PROMPTS))
+        except Exception as e:
+            self.harness.recorder.observe("parler", outcome=type(e).__name__)
+            return False
+        done = time.perf_counter()
+        outcome = self._outcome()
+        first = self.first_at - started if self.first_at else None
+        self.harness.recorder.observe("parler", first, done - started, outcome)
+        return outcome == "ok"
+
+    async def message(self):
+        self.first_at = None
+        waiter = self.harness.expect_reply(self.user.id)
+        started = time.perf_counter()
+        self.harness.bot.dispatch("message", FakeMessage(self.user, self.channel, random.choice(PROMPTS)))
+        try:
+            await asyncio.wait_for(waiter, self.harness.args.reply_timeout)
+        except asyncio.TimeoutError:
+            self.harness.recorder.observe("message", outcome="timeout")
+            return
+        done = time.perf_counter()
+        first = self.first_at - started if self.first_at else None
+        self.harness.recorder.observe("message", first, done - started, self._outcome())
+
+    async def stop(self):
+        started = time.perf_counter()
+        await self.harness.invoke("stop", FakeInteraction(self.user, self.channel))
+        self.harness.recorder.observe("stop", complete=time.perf_counter() - started)
+
+    async def riddle(self):
+        await self.harness.invoke("devinette", FakeInteraction(self.user, self.channel))
+        await self.think()
+        self.first_at = None
+        self._send_waiter = asyncio.get_running_loop().create_future()
+        started = time.perf_counter()
+        self.harness.bot.dispatch("message", FakeMessage(self.user, self.channel, "Un miroir ?"))
+        try:
+            await asyncio.wait_for(self._send_waiter, self.harness.args.reply_timeout)
+        except asyncio.TimeoutError:
+            self.harness.recorder.observe("devinette", outcome="timeout")
+            return
+        finally:
+            self._send_waiter = None
+        self.harness.recorder.observe("devinette", complete=self.first_at - started)
+
+
+# -----------------------------
+# Orchestration
+# -----------------------------
+class Harness:
+    def __init__(self, args, bot_module):
+        self.args = args
+        self.bot_module = bot_module
+        self.bot = bot_module.bot
+        self.recorder = Recorder()
+        self._reply_waiters = {}
+
+    async def invoke(self, name: str, interaction, **kwargs):
+        command = self.bot.tree.get_command(name)
+        interaction.command = command
+        interaction.namespace = SimpleNamespace(**kwargs)
+        await self.bot.tree.interaction_check(interaction)  # Comme discord.py : chronomètre, enregistrement
+        if command.binding is not None:
+            return await command.callback(command.binding, interaction, **kwargs)
+        return await command.callback(interaction, **kwargs)
+
+    def expect_reply(self, user_id: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._reply_waiters[user_id] = future
+        return future
+
+    def wrap_coalescer(self):
+        # Signaler la fin de chaque réponse regroupée à l'utilisateur virtuel qui l'attend
+        handler = self.bot.coalescer.handler
+
+        async def timed_handler(user_id, messages):
+            try:
+                await handler(user_id, messages)
+            finally:
+                waiter = self._reply_waiters.pop(user_id, None)
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(None)
+
+        self.bot.coalescer.handler = timed_handler
+
+    async def run(self) -> dict:
+        args = self.args
+        bot = self.bot
+        await bot._async_setup_hook()  # Initialisation faite d'ordinaire par bot.login()
+        bot._connection.user = FakeUser(1, bot=True)
+        await bot.start_services()
+        await bot.load_extensions()
+        self.wrap_coalescer()
+
+        guilds = [FakeGuild(10_000 + i) for i in range(max(1, args.guilds))]
+        users = [
+            VirtualUser(self, 100_000 + i, FakeChannel(200_000 + i, guilds[i % len(guilds)], args.discord_latency))
+            for i in range(args.users)
+        ]
+
+        gc.collect()
+        if args.trace_memory:
+            tracemalloc.start()
+        heap_before = tracemalloc.get_traced_memory()[0] if args.trace_memory else None
+        rss_before = rss_bytes()
+        lag = LoopLagMonitor(self.bot_module.conversations.active_count)
+        lag.start()
+
+        async def start_user(index, user):
+            if args.ramp > 0:
+                await asyncio.sleep(args.ramp * index / max(1, len(users)))
+            await user.run()
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(start_user(i, u) for i, u in enumerate(users)), return_exceptions=True)
+        elapsed = time.perf_counter() - started
+        await lag.stop()
+        lag._measure()
+
+        # Mémoire retenue par les conversations terminées (historique en cache, index, tampons)
+        gc.collect()
+        rss_after = rss_bytes()
+        heap_after = tracemalloc.get_traced_memory()[0] if args.trace_memory else None
+        if args.trace_memory:
+            tracemalloc.stop()
+
+        report = self.recorder.report()
+        replies = sum(len(self.recorder.complete.get(op, [])) for op in ("parler", "message"))
+        crashed = [r for r in results if isinstance(r, Exception)]
+        stats = {
+            "scheduler": bot.scheduler.stats(),
+            "coalescer": bot.coalescer.stats(),
+            "outbound": bot.outbound.stats(),
+            "upstream": bot.upstream.stats(),
+            "conversations": self.bot_module.conversations.stats(),
+            "riddles": bot.riddles.stats(),
+            "llm_requests": {"/".join(k): v for k, v in self.bot_module.LLM_REQUESTS.snapshot().items()},
+        }
+        await bot.close()
+        return {
+            "duration_seconds": round(elapsed, 3),
+            "throughput_replies_per_second": round(replies / elapsed, 3) if elapsed else None,
+            "users_crashed": len(crashed),
+            "errors": sorted({f"{type(e).__name__}: {e}" for e in crashed})[:10],
+            "operations": report,
+            "event_loop_lag_seconds": percentiles(lag.samples),
+            "memory": {
+                "rss_before_bytes": rss_before,
+                "rss_peak_growth_bytes": lag.rss_peak - rss_before,
+                "rss_peak_per_active_conversation_bytes": (lag.rss_peak - rss_before) // max(1, lag.active_peak),
+                "rss_growth_after_stop_bytes": rss_after - rss_before,
+                "active_conversations_peak": lag.active_peak,
+                "heap_growth_bytes": heap_after - heap_before if args.trace_memory else None,
+                "conversations_cached": stats["conversations"].get("cached"),
+            },
+            "bot": stats,
+        }
+
+
+# -----------------------------
+# Comparaison avec un rapport de référence
+# -----------------------------
+def compare(report: dict, baseline: dict, tolerance: float) -> list:
+    """Lister les régressions (latence p95/p99 plus haute ou débit plus bas au-delà de la tolérance)"""
+    regressions = []
+    for op in ("parler", "message"):
+        for kind in ("first_reply_seconds", "reply_seconds"):
+            for q in ("p95", "p99"):
+                new = report["operations"].get(op, {}).get(kind, {}).get(q)
+                old = baseline.get("operations", {}).get(op, {}).get(kind, {}).get(q)
+                if new is not None and old and new > old * (1 + tolerance):
+                    regressions.append(f"{op}.{kind}.{q}: {old} -> {new}")
+    new = report.get("throughput_replies_per_second")
+    old = baseline.get("throughput_replies_per_second")
+    if new is not None and old and new < old * (1 - tolerance):
+        regressions.append(f"throughput_replies_per_second: {old} -> {new}")
+    return regressions
+
+
+async def main_async(args) -> dict:
+    server = FakeRoutway(args.latency, args.chunk_delay, args.chunk_size, error_rate=args.error_rate,
+                         rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after, jitter=args.jitter)
+    runner = await start_server(server, port=0)
+    host, port = runner.addresses[0][:2]
+
+    # Le bot lit sa configuration à l'import : l'environnement doit être prêt avant
+    state_dir = tempfile.mkdtemp(prefix="audrey-loadtest-")
+    os.environ.update({
+        "DISCORD_TOKEN": os.getenv("DISCORD_TOKEN", "loadtest"),
+        "ROUTWAY_API_KEY": "loadtest",
+        "ROUTWAY_API_URL": f"http://{host}:{port}/v1/chat/completions",
+        "ROUTWAY_ENDPOINTS": "",
+        "STATE_DIR": state_dir,
+        "CONVERSATION_DB_PATH": os.path.join(state_dir, "conversations.db"),
+        "RESPONSE_CACHE_DB_PATH": os.path.join(state_dir, "response_cache.db"),
+        "CONVERSATION_BACKEND": "sqlite",
+        "WEB_SERVER_ENABLED": "false",
+        "RESPONSE_CACHE_ENABLED": "true" if args.cache else "false",
+        # Le lot des lectures du jour ajouterait ses propres appels à ceux des utilisateurs
+        "DAILY_READINGS_ENABLED": "false",
+        # Les utilisateurs virtuels dépasseraient vite les limites de débit par serveur
+        "RATE_LIMIT_ENABLED": "true" if args.rate_limits else "false",
+    })
+    os.environ.setdefault("COALESCE_WINDOW", str(args.coalesce_window))
+
+    import bot as bot_module
+
+    try:
+        report = await Harness(args, bot_module).run()
+    finally:
+        await runner.cleanup()
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("output", "baseline")}
+    report["fake_routway"] = server.stats()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge d'Audrey (Discord simulé + faux Routway)")
+    parser.add_argument("--users", type=int, default=50, help="Utilisateurs virtuels simultanés")
+    parser.add_argument("--turns", type=int, default=3, help="Messages envoyés par conversation après /parler")
+    parser.add_argument("--think", type=float, default=0.5, help="Pause moyenne entre deux actions (s)")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Durée d'arrivée de tous les utilisateurs (s)")
+    parser.add_argument("--guilds", type=int, default=10, help="Nombre de serveurs simulés")
+    parser.add_argument("--riddle-ratio", type=float, default=0.1, help="Proportion d'utilisateurs jouant /devinette")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="Durée d'un appel à l'API Discord (s)")
+    parser.add_argument("--reply-timeout", type=float, default=120.0, help="Attente max d'une réponse (s)")
+    parser.add_argument("--coalesce-window", type=float, default=0.2,
+                        help="COALESCE_WINDOW utilisé si la variable n'est pas déjà définie (s)")
+    parser.add_argument("--cache", action="store_true", help="Activer le cache des réponses")
+    parser.add_argument("--rate-limits", action="store_true",
+                        help="Garder les limites de débit (messages refusés sans réponse : attente jusqu'au timeout)")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Mesurer le tas Python avec tracemalloc (plus précis, mais ralentit le test)")
+    parser.add_argument("--latency", type=float, default=0.3, help="Latence du faux Routway (s)")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Variation relative de cette latence")
+    parser.add_argument("--chunk-delay", type=float, default=0.02, help="Délai entre deux fragments SSE (s)")
+    parser.add_argument("--chunk-size", type=int, default=12, help="Caractères par fragment SSE")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Proportion de réponses 503")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Proportion de réponses 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="En-tête Retry-After des 429 (s)")
+    parser.add_argument("--seed", type=int, default=None, help="Graine aléatoire (runs reproductibles)")
+    parser.add_argument("--output", help="Fichier JSON du rapport (sinon sortie standard)")
+    parser.add_argument("--baseline", help="Rapport de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Dégradation tolérée face à la référence")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    # Les journaux du bot vont sur stderr : stdout ne contient que le rapport JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(main_async(args))
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if report["users_crashed"]:
+        exit_code = 1
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
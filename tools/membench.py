@@ -0,0 +1,125 @@
+"""Mesure de la mémoire occupée par l'historique des conversations.
+
+Construit N conversations pleines (HISTORY_MAX_MESSAGES messages chacune, textes
+neufs comme s'ils venaient d'être relus sur le disque) et mesure avec tracemalloc
+les octets alloués par utilisateur suivi, pour chaque représentation :
+
+- `dict`       : ancienne représentation, un dict {"role", "content", "tokens"} par message
+- `turn`       : messages `Turn` (slots, rôle interné, tokens précalculés)
+- `turn+zlib`  : idem, anciens messages compressés (HISTORY_COMPRESS=true)
+
+Le temps moyen de build_context est aussi mesuré (la compression le ralentit
+quand des messages compressés entrent dans le contexte). Les textes générés
+reprennent les phrases du faux serveur et se répètent plus que de vraies
+réponses : le gain mesuré pour zlib est donc optimiste.
+
+Utilisation :
+    python tools/membench.py --users 5000
+    python tools/membench.py --users 20000 --history 40 --output memoire.json
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import deque
+
+from fake_routway import REPLIES
+from loadtest import PROMPTS
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def fresh(text: str) -> str:
+    """Copie d'une chaîne (une chaîne relue sur le disque n'est jamais partagée)"""
+    return "".join(list(text))
+
+
+def make_history(length: int) -> list:
+    """[(rôle, texte)] d'une conversation : questions courtes, réponses de quelques phrases"""
+    history = []
+    for i in range(length):
+        if i % 2 == 0:
+            history.append((fresh("user"), " ".join(random.sample(PROMPTS, random.randint(1, 2)))))
+        else:
+            history.append((fresh("assistant"), " ".join(random.choices(REPLIES, k=random.randint(2, 6)))))
+    return history
+
+
+def build(core, variant: str, histories: list) -> list:
+    conversations = []
+    for user_id, history in enumerate(histories):
+        conversation = core.Conversation(user_id, f"{user_id}-bench", 1, history, history_max=len(history))
+        if variant == "dict":
+            conversation.history = deque(
+                ({"role": role, "content": content, "tokens": core.estimate_tokens(content)} for role, content in history),
+                maxlen=len(history))
+        elif variant == "turn+zlib":
+            for turn in list(conversation.history)[:-core.HISTORY_HOT_TURNS]:
+                turn.compress()
+        conversations.append(conversation)
+    return conversations
+
+
+def measure(core, variant: str, users: int, length: int, seed: int) -> dict:
+    random.seed(seed)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    # Textes compris dans la mesure : la compression remplace le texte d'origine
+    histories = [make_history(length) for _ in range(users)]
+    conversations = build(core, variant, histories)
+    del histories
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    context_seconds = None
+    if variant != "dict":  # build_context ne lit que la représentation actuelle
+        started = time.perf_counter()
+        for conversation in conversations[:1000]:
+            core.build_context("Que voyez-vous dans les cartes ?", conversation)
+        context_seconds = (time.perf_counter() - started) / min(1000, len(conversations))
+
+    return {
+        "bytes_per_user": round((after - before) / users),
+        "build_context_us": round(context_seconds * 1e6, 1) if context_seconds is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mémoire de l'historique des conversations par utilisateur")
+    parser.add_argument("--users", type=int, default=5000, help="Conversations pleines à construire")
+    parser.add_argument("--history", type=int, default=40, help="Messages par conversation (HISTORY_MAX_MESSAGES)")
+    parser.add_argument("--seed", type=int, default=1, help="Graine des textes générés")
+    parser.add_argument("--output", help="Écrire le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    os.environ.setdefault("DISCORD_TOKEN", "membench")
+    os.environ.setdefault("STATE_DIR", tempfile.mkdtemp(prefix="audrey-membench-"))
+    os.environ["WEB_SERVER_ENABLED"] = "false"
+    with contextlib.redirect_stdout(sys.stderr):  # stdout ne porte que le rapport JSON
+        import bot as core
+
+    report = {"users": args.users, "history": args.history, "variants": {}}
+    for variant in ("dict", "turn", "turn+zlib"):
+        report["variants"][variant] = measure(core, variant, args.users, args.history, args.seed)
+        gc.collect()
+    baseline = report["variants"]["dict"]["bytes_per_user"]
+    for result in report["variants"].values():
+        result["vs_dict"] = round(result["bytes_per_user"] / baseline, 3)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,532 @@
+"""Rejeu d'un enregistrement de trafic (TRAFFIC_RECORD_PATH) contre une version du bot.
+
+Les messages et commandes slash de l'enregistrement sont rejoués avec les objets
+Discord simulés du test de charge, au rythme enregistré (`--speed 1`), accéléré
+(`--speed 10`) ou aussi vite que possible (`--speed 0`) ; chaque utilisateur attend
+toujours la réponse à sa commande ou à son message avant de continuer, comme lors
+de l'enregistrement. Le texte n'étant pas
+enregistré, chaque message est remplacé par un texte de même longueur qui porte
+le numéro de l'événement (`⟦42⟧`). Le faux Routway lit ce numéro dans le prompt et
+renvoie la réponse enregistrée pour cet événement : même longueur, même durée,
+même délai avant le premier fragment, mêmes erreurs. Les appels qu'il ne sait pas
+rattacher (scène sans thème, lot regroupé autrement) reçoivent la prochaine
+réponse enregistrée non servie.
+
+Le rapport JSON donne le débit et, pour chaque phase, les percentiles des
+histogrammes du bot rejoué (traitement de on_message par chemin, réponse complète,
+commandes, appels à l'API, file de sortie, retard de la boucle...). Avec
+`--baseline`, il est comparé au rapport d'une autre version : écarts par phase
+et sortie en erreur au-delà de la tolérance.
+
+Limites : les réponses aux énigmes et les arguments des commandes `!…` ne sont
+pas enregistrés (rejoués faux ou absents) ; le cache des réponses est désactivé
+(aucun texte ne se répète) ; les lectures du jour ne sont pas générées.
+
+Utilisation :
+    python tools/replay.py samedi.jsonl --speed 1 --output avant.json
+    python tools/replay.py samedi.jsonl --speed 0 --bot ../audrey-branche --baseline avant.json
+    python tools/replay.py --compare avant.json apres.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+from collections import defaultdict, deque
+from types import SimpleNamespace
+
+from aiohttp import web
+
+from fake_routway import REPLIES, FakeRoutway, start_server
+from loadtest import PROMPTS, FakeChannel, FakeGuild, FakeInteraction, FakeMessage, FakeUser, percentiles
+
+MARKER = re.compile(r"⟦(\d+)⟧")
+REPLY_TEXT = " ".join(REPLIES)
+PROMPT_TEXT = " ".join(PROMPTS)
+
+
+def filler(source: str, length: int, prefix: str = "") -> str:
+    """Texte de `length` caractères (au moins le préfixe) tiré de `source`"""
+    length = max(0, length - len(prefix))
+    repeated = source * (length // len(source) + 1)
+    return prefix + repeated[:length]
+
+
+def load_trace(path: str):
+    """(en-tête, événements triés par date) ; un fichier complété sur plusieurs démarrages garde le premier"""
+    header = None
+    events = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            if event["e"] == "trace":
+                if header is not None:
+                    break  # Démarrage suivant : horloge remise à zéro
+                header = event
+            else:
+                events.append(event)
+    if header is None:
+        raise SystemExit(f"{path} : en-tête d'enregistrement absent")
+    events.sort(key=lambda event: event["t"])
+    return header, events
+
+
+# -----------------------------
+# Faux Routway servant les réponses enregistrées
+# -----------------------------
+class ReplayRoutway(FakeRoutway):
+    def __init__(self, calls: list, latency_scale: float = 1.0, chunk_size: int = 12):
+        super().__init__(chunk_size=chunk_size)
+        self.latency_scale = latency_scale
+        self.by_event = defaultdict(deque)  # {événement: appels enregistrés, dans l'ordre}
+        self.queue = deque()  # Tous les appels non servis, dans l'ordre
+        for call in calls:
+            call["served"] = False
+            self.by_event[call.get("id")].append(call)
+            self.queue.append(call)
+        self.failed = set()  # Événements dont l'appel a échoué : les réessais échouent aussi
+        self.matched = 0
+        self.unmatched = 0
+        self.exhausted = 0
+
+    def stats(self) -> dict:
+        return dict(super().stats(), matched=self.matched, unmatched=self.unmatched, exhausted=self.exhausted)
+
+    def _take(self, call: dict) -> dict:
+        call["served"] = True
+        return call
+
+    def match(self, body: dict):
+        """Appel enregistré pour cette requête : (appel ou None, numéro d'événement trouvé dans le prompt)"""
+        messages = body.get("messages") or [{}]
+        ids = [int(found) for found in MARKER.findall(messages[-1].get("content") or "")]
+        for event_id in reversed(ids):
+            calls = self.by_event.get(event_id)
+            while calls and calls[0]["served"]:
+                calls.popleft()
+            if calls:
+                self.matched += 1
+                return self._take(calls.popleft()), event_id
+            if event_id in self.failed:
+                return {"s": "error", "ms": 0}, event_id
+        while self.queue and self.queue[0]["served"]:
+            self.queue.popleft()
+        if self.queue:
+            self.unmatched += 1
+            return self._take(self.queue.popleft()), None
+        self.exhausted += 1
+        return None, None
+
+    async def completions(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        body = await request.json()
+        call, event_id = self.match(body)
+        call = call or {"s": "ok", "ms": 0, "n": len(REPLIES[0])}
+        total = call.get("ms", 0) / 1000 * self.latency_scale
+        first = min(total, call.get("ttfb", call.get("ms", 0)) / 1000 * self.latency_scale)
+        if call["s"] in ("error", "unexpected"):
+            if event_id is not None:
+                self.failed.add(event_id)
+            await asyncio.sleep(total)
+            self.errors += 1
+            return web.json_response({"error": {"message": "Upstream unavailable (rejeu)", "type": "server_error"}},
+                                     status=503)
+
+        reply = filler(REPLY_TEXT, call.get("n", 0)) or REPLIES[0]
+        if body.get("stream"):
+            self.streamed += 1
+            await asyncio.sleep(first)
+            chunks = max(1, -(-len(reply) // self.chunk_size))
+            return await self._stream(request, body, reply, chunk_delay=(total - first) / chunks)
+        await asyncio.sleep(total)
+        return web.json_response({
+            "id": f"replay-{self.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+        })
+
+
+# -----------------------------
+# Mesures par phase (histogrammes du bot rejoué)
+# -----------------------------
+class PhaseRecorder:
+    """Garde chaque valeur observée par les histogrammes du bot, par nom et étiquettes.
+
+    Les histogrammes n'exposent qu'un échantillon récent commun à toutes leurs
+    étiquettes ; on les enveloppe pour obtenir des percentiles exacts par phase,
+    quelle que soit la version du bot (une phase absente d'une version est ignorée).
+    """
+
+    def __init__(self, core):
+        self.values = defaultdict(list)
+        for metric in core.metrics._metrics:
+            if isinstance(metric, core.Histogram):
+                self._wrap(metric)
+
+    def _wrap(self, metric):
+        observe = metric.observe
+        prefix = metric.name[len("audrey_"):] if metric.name.startswith("audrey_") else metric.name
+        values = self.values
+
+        def recorded(value, *labels):
+            observe(value, *labels)
+            values["/".join((prefix,) + tuple(str(label) for label in labels))].append(value)
+
+        metric.observe = recorded
+
+    def report(self) -> dict:
+        return {name: percentiles(values) for name, values in sorted(self.values.items())}
+
+
+# -----------------------------
+# Rejeu
+# -----------------------------
+class Replay:
+    def __init__(self, args, core, header: dict, events: list):
+        self.args = args
+        self.core = core
+        self.bot = core.bot
+        self.header = header
+        self.events = [event for event in events if event["e"] in ("msg", "cmd")]
+        self.guilds = {}
+        self.channels = {}
+        self.users = {}
+        # Serveur de chaque salon, d'après le premier événement qui le cite
+        self.channel_guild = {}
+        for event in self.events:
+            self.channel_guild.setdefault(event.get("c"), event.get("g"))
+        # Messages suivis d'un appel à l'IA : leur auteur attendait la réponse avant de continuer
+        self.answered = {event["id"] for event in events if event["e"] == "llm" and event.get("id") is not None}
+        self._waiters = {}  # {id du message simulé: future résolue quand son lot a reçu sa réponse}
+        self.timeouts = 0
+        self.sent = 0
+        self.outcomes = defaultdict(lambda: defaultdict(int))  # {commande: {issue: nombre}}
+        self.schedule_lag = []
+
+    def user(self, anon: int) -> FakeUser:
+        user = self.users.get(anon)
+        if user is None:
+            user = self.users[anon] = FakeUser(100_000 + anon)
+        return user
+
+    def channel(self, anon: int) -> FakeChannel:
+        channel = self.channels.get(anon)
+        if channel is None:
+            guild_anon = self.channel_guild.get(anon)
+            guild = None
+            if guild_anon is not None:
+                guild = self.guilds.get(guild_anon)
+                if guild is None:
+                    guild = self.guilds[guild_anon] = FakeGuild(10_000 + guild_anon)
+            channel = self.channels[anon] = FakeChannel(200_000 + anon, guild, self.args.discord_latency)
+            channel.on_send = self._on_send
+        return channel
+
+    def _on_send(self, content):
+        self.sent += 1
+
+    def restore_sessions(self):
+        """Rouvrir les conversations et scènes actives au début de l'enregistrement"""
+        for key, channel_anon in self.header.get("active", []):
+            channel_id = self.channel(channel_anon).id
+            if key == "s":
+                self.core.conversations.start(self.core.scene_id(channel_id), channel_id)
+            else:
+                self.core.conversations.start(self.user(key).id, channel_id)
+
+    def wrap_coalescers(self):
+        """Signaler la réponse à chaque lot (conversation ou tour de scène) aux messages qui l'attendent"""
+        for coalescer in (self.bot.coalescer, self.bot.scenes):
+            async def answered(key, messages, handler=coalescer.handler):
+                await handler(key, messages)
+                for message in messages:
+                    waiter = self._waiters.pop(message.id, None)
+                    if waiter is not None and not waiter.done():
+                        waiter.set_result(None)
+
+            coalescer.handler = answered
+
+    def message(self, event: dict):
+        """Envoyer le message ; renvoie une future si son auteur attendait la réponse"""
+        content = event.get("x") or filler(PROMPT_TEXT, event.get("n", 0), f"⟦{event['id']}⟧ ")
+        message = FakeMessage(self.user(event["u"]), self.channel(event["c"]), content)
+        if event.get("b"):
+            message.mentions = [self.bot.user]
+        waiter = None
+        if event["id"] in self.answered:
+            waiter = self._waiters[message.id] = asyncio.get_running_loop().create_future()
+        self.bot.dispatch("message", message)
+        return waiter
+
+    async def command(self, event: dict):
+        name = event["name"]
+        command = self.bot.tree.get_command(name)
+        if command is None:
+            self.outcomes[name]["unknown"] += 1
+            return
+        kwargs = {}
+        for option, value in event.get("o", {}).items():
+            if isinstance(value, dict):
+                if "n" not in value:
+                    self.outcomes[name]["skipped"] += 1  # Option d'un type non enregistré (rôle, membre...)
+                    return
+                value = filler(PROMPT_TEXT, value["n"], f"⟦{event['id']}⟧ ")
+            kwargs[option] = value
+        interaction = FakeInteraction(self.user(event["u"]), self.channel(event["c"]))
+        interaction.command = command
+        interaction.namespace = SimpleNamespace(**kwargs)
+        await self.bot.tree.interaction_check(interaction)  # Chronomètre de la commande
+        try:
+            if command.binding is not None:
+                await command.callback(command.binding, interaction, **kwargs)
+            else:
+                await command.callback(interaction, **kwargs)
+        except Exception as e:
+            self.outcomes[name][type(e).__name__] += 1
+            self.core.record_command_latency(interaction.extras.get("started_at"), name, "error")
+            return
+        self.outcomes[name]["ok"] += 1
+        self.bot.dispatch("app_command_completion", interaction, command)
+
+    async def play(self, events: list, started: float):
+        """Rejouer les événements d'un utilisateur dans l'ordre.
+
+        Une commande, ou un message auquel Audrey a répondu, se termine avant
+        l'événement suivant du même utilisateur (qui attendait la réponse pour
+        continuer) : l'ordre reste causal même à vitesse max.
+        """
+        loop = asyncio.get_running_loop()
+        for event in events:
+            if self.args.speed > 0:
+                planned = started + event["t"] / self.args.speed
+                delay = planned - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.schedule_lag.append(loop.time() - planned)
+            else:
+                await asyncio.sleep(0)
+            if event["e"] == "msg":
+                waiter = self.message(event)
+                if waiter is not None:
+                    try:
+                        await asyncio.wait_for(waiter, self.args.reply_timeout)
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1  # Lot abandonné ou réponse perdue : on continue
+            else:
+                await self.command(event)
+
+    async def drain(self, timeout: float):
+        """Attendre la fin des réponses en cours (lots en attente, appels à l'IA, envois)"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        await asyncio.sleep(0)
+        while self.bot.busy() and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        return self.bot.busy()
+
+    async def run(self) -> dict:
+        args = self.args
+        bot = self.bot
+        core = self.core
+        await bot._async_setup_hook()  # Initialisation faite d'ordinaire par bot.login()
+        bot._connection.user = FakeUser(1, bot=True)
+        await bot.start_services()
+        await bot.load_extensions()
+        phases = PhaseRecorder(core)
+        self.wrap_coalescers()
+        self.restore_sessions()
+
+        by_user = defaultdict(list)
+        for event in self.events:
+            by_user[event["u"]].append(event)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(self.play(events, started) for events in by_user.values()))
+        left = await self.drain(args.drain_timeout)
+        elapsed = loop.time() - started
+
+        stats = {
+            "scheduler": bot.scheduler.stats(),
+            "coalescer": bot.coalescer.stats(),
+            "scenes": bot.scenes.stats(),
+            "outbound": bot.outbound.stats(),
+            "upstream": bot.upstream.stats(),
+            "llm_requests": {"/".join(k): v for k, v in core.LLM_REQUESTS.snapshot().items()},
+        }
+        await bot.close()
+        messages = sum(1 for event in self.events if event["e"] == "msg")
+        return {
+            "duration_seconds": round(elapsed, 3),
+            "unfinished_at_end": left,
+            "throughput": {
+                "events_per_second": round(len(self.events) / elapsed, 3) if elapsed else None,
+                "messages_per_second": round(messages / elapsed, 3) if elapsed else None,
+                "replies_per_second": round(self.sent / elapsed, 3) if elapsed else None,
+            },
+            "replies_sent": self.sent,
+            "reply_timeouts": self.timeouts,
+            "schedule_lag_seconds": percentiles(self.schedule_lag),
+            "phases": phases.report(),
+            "commands": {name: dict(counts) for name, counts in sorted(self.outcomes.items())},
+            "bot": stats,
+        }
+
+
+# -----------------------------
+# Comparaison de deux versions
+# -----------------------------
+def change(old, new):
+    if old is None or new is None:
+        return None
+    if not old:
+        return None if not new else float("inf")
+    return round((new - old) / old * 100, 1)
+
+
+def compare(report: dict, baseline: dict, tolerance: float, min_count: int = 20, min_delta: float = 0.005) -> dict:
+    """Écarts par phase (p50/p95/p99 en %) et par débit ; régressions au-delà de la tolérance.
+
+    Une phase n'est jugée qu'avec `min_count` mesures de chaque côté, et un écart de
+    moins de `min_delta` secondes n'est jamais une régression (bruit sur des durées infimes).
+    """
+    phases = {}
+    regressions = []
+    before_phases = baseline.get("phases", {})
+    after_phases = report.get("phases", {})
+    for name in sorted(set(before_phases) | set(after_phases)):
+        before = before_phases.get(name, {})
+        after = after_phases.get(name, {})
+        entry = {"count": [before.get("count", 0), after.get("count", 0)]}
+        for q in ("p50", "p95", "p99"):
+            entry[q] = [before.get(q), after.get(q), change(before.get(q), after.get(q))]
+        phases[name] = entry
+        if min(entry["count"]) < min_count:
+            continue  # Trop peu de mesures pour conclure
+        for q in ("p95", "p99"):
+            old, new, _ = entry[q]
+            if old and new is not None and new > old * (1 + tolerance) and new - old >= min_delta:
+                regressions.append(f"{name}.{q}: {old} -> {new}")
+    throughput = {}
+    for name, new in report.get("throughput", {}).items():
+        old = baseline.get("throughput", {}).get(name)
+        throughput[name] = [old, new, change(old, new)]
+        if name == "replies_per_second" and old and new is not None and new < old * (1 - tolerance):
+            regressions.append(f"throughput.{name}: {old} -> {new}")
+    return {"phases": phases, "throughput": throughput, "regressions": regressions}
+
+
+async def main_async(args) -> dict:
+    header, events = load_trace(args.trace)
+    calls = [event for event in events if event["e"] == "llm"]
+    server = ReplayRoutway(calls, args.latency_scale, args.chunk_size)
+    runner = await start_server(server, port=0)
+    host, port = runner.addresses[0][:2]
+
+    # Le bot lit sa configuration à l'import : l'environnement doit être prêt avant
+    state_dir = tempfile.mkdtemp(prefix="audrey-replay-")
+    os.environ.update({
+        "DISCORD_TOKEN": os.getenv("DISCORD_TOKEN", "replay"),
+        "ROUTWAY_API_KEY": "replay",
+        "ROUTWAY_API_URL": f"http://{host}:{port}/v1/chat/completions",
+        "ROUTWAY_ENDPOINTS": "",
+        "STATE_DIR": state_dir,
+        "CONVERSATION_DB_PATH": os.path.join(state_dir, "conversations.db"),
+        "RESPONSE_CACHE_DB_PATH": os.path.join(state_dir, "response_cache.db"),
+        "CONVERSATION_BACKEND": "sqlite",
+        "WEB_SERVER_ENABLED": "false",
+        "RESPONSE_CACHE_ENABLED": "false",
+        "DAILY_READINGS_ENABLED": "false",
+        "TRAFFIC_RECORD_PATH": "",
+        "RATE_LIMIT_ENABLED": "true" if args.rate_limits else "false",
+    })
+    # Réglages du bot enregistré, sauf s'ils sont fixés explicitement
+    for name, value in header.get("config", {}).items():
+        os.environ.setdefault(name, str(value).lower() if isinstance(value, bool) else str(value))
+
+    if args.bot:
+        sys.path.insert(0, os.path.abspath(args.bot))
+    import bot as core
+
+    try:
+        report = await Replay(args, core, header, events).run()
+    finally:
+        await runner.cleanup()
+    report["trace"] = {
+        "path": args.trace,
+        "started": header.get("started"),
+        "recorded_seconds": events[-1]["t"] if events else 0,
+        "messages": sum(1 for event in events if event["e"] == "msg"),
+        "commands": sum(1 for event in events if event["e"] == "cmd"),
+        "llm_calls": len(calls),
+    }
+    report["build"] = os.path.dirname(os.path.abspath(core.__file__))
+    report["config"] = {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "compare", "trace")}
+    report["fake_routway"] = server.stats()
+    return report
+
+
+def write_output(data: dict, path: str = None):
+    output = json.dumps(data, ensure_ascii=False, indent=2)
+    if path:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu d'un enregistrement de trafic d'Audrey")
+    parser.add_argument("trace", nargs="?", help="Fichier JSONL enregistré avec TRAFFIC_RECORD_PATH")
+    parser.add_argument("--speed", type=float, default=1.0, help="Vitesse du rejeu (1 = réel, 10 = 10×, 0 = max)")
+    parser.add_argument("--bot", help="Dossier de la version à tester (bot.py, cogs/, data/) ; défaut : ce dépôt")
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Facteur appliqué aux durées enregistrées des appels à l'API")
+    parser.add_argument("--chunk-size", type=int, default=12, help="Caractères par fragment SSE")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="Durée d'un appel à l'API Discord (s)")
+    parser.add_argument("--reply-timeout", type=float, default=60.0,
+                        help="Attente max de la réponse à un message avant l'événement suivant (s)")
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+                        help="Attente max des réponses en cours après le dernier événement (s)")
+    parser.add_argument("--rate-limits", action="store_true", help="Garder les limites de débit")
+    parser.add_argument("--output", help="Fichier JSON du rapport (sinon sortie standard)")
+    parser.add_argument("--baseline", help="Rapport d'une autre version à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Dégradation tolérée face à la référence")
+    parser.add_argument("--compare", nargs=2, metavar=("AVANT", "APRES"),
+                        help="Comparer deux rapports existants sans rien rejouer")
+    args = parser.parse_args()
+
+    if args.compare:
+        reports = []
+        for path in args.compare:
+            with open(path, encoding="utf-8") as f:
+                reports.append(json.load(f))
+        comparison = compare(reports[1], reports[0], args.tolerance)
+        write_output(comparison, args.output)
+        sys.exit(1 if comparison["regressions"] else 0)
+    if not args.trace:
+        parser.error("fichier d'enregistrement manquant")
+
+    # Les journaux du bot vont sur stderr : stdout ne contient que le rapport JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(main_async(args))
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance)
+        exit_code = 1 if report["comparison"]["regressions"] else 0
+    write_output(report, args.output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()